@@ -1,12 +1,19 @@
 import yfinance as yf
 import pandas as pd
-import datetime
-import twstock
 import numpy as np
+import re
 import time
-import random
-import streamlit as st
-from fugle_marketdata import RestClient 
+import ttl_cache
+import signal_engine
+import bar_store
+import fugle_client
+import stream_ingest
+import backtester
+import upstream
+import symbol_resolver
+import bar_pyramid
+import signal_result
+import tracing
 
 # --- 熱門股池 ---
 MARKET_POOL = [
@@ -22,42 +29,156 @@ MARKET_POOL = [
     '2353', '2323', '2352', '3260', '6239'
 ]
 
-# --- 1. 海選部隊：使用 Yahoo ---
-@st.cache_data(ttl=900)
-def screen_hot_stocks(limit=15):
-    screened_list = []
-    print("正在掃描市場熱門股 (Yahoo)...")
-    
-    for symbol_raw in MARKET_POOL:
-        symbol = f"{symbol_raw}.TW" 
-        time.sleep(random.uniform(0.1, 0.25)) 
-        
+# --- 本地倉庫新鮮度 (盤中多久內不必再打上游) ---
+INTRADAY_FRESH_SECONDS = 4
+DAILY_FRESH_SECONDS = 900
+INTRADAY_BATCH = 200        # 全市場批次下載分 K 時每次幾檔
+
+# --- 1. 海選部隊：使用 Yahoo (批次下載 + 向量化) ---
+# 最近一次掃描的各階段耗時 (秒)，供效能觀察
+LAST_SCREEN_TIMINGS = {}
+
+def _yahoo_download(symbols, **kwargs):
+    """多檔一起下載全部空白才算上游失敗 (被限流)；單檔空白可能只是該檔沒資料 (下市、停牌、還沒成交)，照常回空表"""
+    if len(symbols) > 1: return upstream.call("yahoo", upstream.require_rows, yf.download, symbols, **kwargs)
+    return upstream.call("yahoo", yf.download, symbols, **kwargs)
+
+def _refresh_daily(symbols, period="3mo"):
+    """倉庫裡日 K 已過期的代號才批次下載，有舊資料的只補最後幾天"""
+    store = bar_store.get_store()
+    stale = [s for s in symbols if not store.is_current(s, '1d', DAILY_FRESH_SECONDS)]
+    if not stale: return 0
+    lasts = [store.last_daily_ts(s) for s in stale]
+    if all(t is not None for t in lasts):
+        kwargs = {'start': min(lasts).strftime('%Y-%m-%d')}
+    else:
+        kwargs = {'period': period}
+    raw = _yahoo_download(stale, interval="1d", group_by="ticker", auto_adjust=True, threads=True, progress=False, **kwargs)
+    for s in stale:
+        part = raw[s] if isinstance(raw.columns, pd.MultiIndex) else raw
+        store.write_daily(s, part)
+    return len(stale)
+
+def _refresh_intraday(symbols, batch_size=INTRADAY_BATCH):
+    """倉庫裡分 K 已過期的代號，每 batch_size 檔一次 Yahoo 批次下載 (全市場用；單檔畫面走 load_bars)"""
+    store = bar_store.get_store()
+    stale = [s for s in symbols if not store.is_current(s, '1m', INTRADAY_FRESH_SECONDS)]
+    for i in range(0, len(stale), batch_size):
+        batch = stale[i:i + batch_size]
+        lasts = [store.last_intraday_ts(s) for s in batch]
+        if all(t is not None for t in lasts):
+            kwargs = {'start': min(lasts) - pd.Timedelta(minutes=2)}
+        else:
+            kwargs = {'period': '1d'}
         try:
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(period="3mo", interval="1d")
-            if len(hist) < 20: continue
-            
-            ma20 = hist['Close'].rolling(window=20).mean().iloc[-1]
-            current_price = hist['Close'].iloc[-1]
-            if current_price < ma20: continue
-                
-            hist['Range_Pct'] = ((hist['High'] - hist['Low']) / hist['Close']) * 100
-            avg_volatility = hist['Range_Pct'].tail(10).mean()
-            if avg_volatility >= 2.0:
-                screened_list.append({'symbol': symbol, 'volatility': avg_volatility})
-        except: continue
-        
-    screened_list.sort(key=lambda x: x['volatility'], reverse=True)
-    return screened_list[:limit]
+            raw = _yahoo_download(batch, interval="1m", group_by="ticker", auto_adjust=False, threads=True, progress=False, **kwargs)
+        except upstream.EmptyResult:
+            continue    # 已計入閘道；這批沒寫入也沒記抓取時間，下一輪會重抓
+        for s in batch:
+            part = raw[s] if isinstance(raw.columns, pd.MultiIndex) else raw
+            # 多檔一起下載時索引是聯集，沒成交的分鐘整列 NaN，不能寫進倉庫 (會讓累積量變 NaN)
+            store.write_intraday(s, part.dropna(subset=['Close']))
+    return len(stale)
+
+def _load_daily_panel(symbols, months=3):
+    """從本地倉庫組出 (日期 × 代號) 的寬表 dict"""
+    store = bar_store.get_store()
+    frames = {s: store.read_daily(s) for s in symbols}
+    frames = {s: df for s, df in frames.items() if df is not None}
+    if not frames: return None
+    cutoff = pd.Timestamp.now(tz='Asia/Taipei').normalize() - pd.DateOffset(months=months)
+    panel = {}
+    for field in ('High', 'Low', 'Close'):
+        wide = pd.DataFrame({s: df[field] for s, df in frames.items()})
+        panel[field] = wide[wide.index >= cutoff].reindex(columns=symbols)
+    return panel
+
+def _screen_panel(close, high, low, min_volatility=2.0):
+    """對寬表逐欄向量化計算 MA20 濾網與近 10 日平均振幅，回傳 (是否入選, 波動度)"""
+    valid = ~np.isnan(close)
+    n_valid = valid.sum(axis=0)
+    # 各欄有效值往下壓實 (停牌缺值移到最上方)，讓 tail 對齊每檔自己的最後 N 筆
+    order = np.argsort(valid, axis=0, kind='stable')
+    close = np.take_along_axis(close, order, axis=0)
+    high = np.take_along_axis(high, order, axis=0)
+    low = np.take_along_axis(low, order, axis=0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ma20 = close[-20:].mean(axis=0)
+        current_price = close[-1]
+        range_pct = (high[-10:] - low[-10:]) / close[-10:] * 100
+        counts = (~np.isnan(range_pct)).sum(axis=0)
+        volatility = np.where(counts > 0, np.nansum(range_pct, axis=0) / np.maximum(counts, 1), np.nan)
+
+    selected = (n_valid >= 20) & ~(current_price < ma20) & (volatility >= min_volatility)
+    return selected, volatility
+
+@ttl_cache.cache_data(ttl=900)
+def screen_hot_stocks(limit=15):
+    print("正在掃描市場熱門股 (Yahoo 批次)...")
+    symbols = [symbol_resolver.yahoo_symbol(s) for s in MARKET_POOL]
+    timings = {}
+
+    t0 = time.perf_counter()
+    try:
+        _refresh_daily(symbols)
+    except Exception as e:
+        print(f"批次下載失敗: {e}")
+    timings['download'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    panel = _load_daily_panel(symbols)
+    timings['store'] = time.perf_counter() - t0
+    if panel is None:
+        LAST_SCREEN_TIMINGS.clear(); LAST_SCREEN_TIMINGS.update(timings)
+        return []
+
+    t0 = time.perf_counter()
+    close = panel['Close'].to_numpy(dtype=float)
+    high = panel['High'].to_numpy(dtype=float)
+    low = panel['Low'].to_numpy(dtype=float)
+    timings['panel'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    selected, volatility = _screen_panel(close, high, low)
+    timings['compute'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    idx = np.flatnonzero(selected)
+    idx = idx[np.argsort(-volatility[idx], kind='stable')][:limit]
+    screened_list = [{'symbol': symbols[i], 'volatility': float(volatility[i])} for i in idx]
+    timings['rank'] = time.perf_counter() - t0
+
+    timings['total'] = sum(timings.values())
+    LAST_SCREEN_TIMINGS.clear(); LAST_SCREEN_TIMINGS.update(timings)
+    print("掃描耗時: " + ", ".join(f"{k}={v*1000:.1f}ms" for k, v in timings.items()))
+    return screened_list
 
 # --- 2. 特種部隊：富果 API ---
 def get_fugle_kline(symbol_id, api_key):
+    with tracing.span("fugle", symbol=symbol_id) as sp:
+        df, error = _get_fugle_kline(symbol_id, api_key, sp)
+        if error: sp.set(error_msg=error).fail()
+        return df, error
+
+def _get_fugle_kline(symbol_id, api_key, sp):
+    # 串流模式運作中就直接用推播組好的 K 棒，不再輪詢 REST
+    ingest = stream_ingest.get_active()
+    if ingest is not None and ingest.is_live(symbol_id):
+        df = ingest.frame(symbol_id)
+        if df is not None and not df.empty:
+            sp.set(source="stream", cache="hit")
+            return df, None
+
+    store = bar_store.get_store()
+    if store.is_current(symbol_id, '1m', INTRADAY_FRESH_SECONDS):
+        _, cached = store.session_intraday(symbol_id)
+        if cached is not None:
+            sp.set(source="store", cache="hit")
+            return cached, None
+    sp.set(source="rest", cache="miss")
     try:
-        clean_key = api_key.strip()
-        client = RestClient(api_key=clean_key)
-        stock = client.stock
-        
-        candles = stock.intraday.candles(symbol=symbol_id)
+        candles = fugle_client.get_pool().candles(api_key, symbol_id)
         
         if not candles: return None, "回傳資料為空"
         if 'error' in candles: return None, f"API 錯誤: {candles.get('error')}"
@@ -71,36 +192,112 @@ def get_fugle_kline(symbol_id, api_key):
         df['Date'] = pd.to_datetime(df['date'])
         df.set_index('Date', inplace=True)
         df.index = df.index.tz_convert('Asia/Taipei')
-        
-        return df[['Open', 'High', 'Low', 'Close', 'Volume']], None 
+        df = df[['Open', 'High', 'Low', 'Close', 'Volume']]
+
+        store.write_intraday(symbol_id, df)
+        _, stored = store.session_intraday(symbol_id)
+        if stored is None: return None, "今日尚無成交"
+        return stored, None
 
     except Exception as e:
         return None, str(e) 
 
 # --- 3. 備用方案：Yahoo 即時 ---
-@st.cache_data(ttl=30)
+@ttl_cache.cache_data(ttl=30)
 def get_realtime_quote_yahoo(symbol):
+    with tracing.span("yahoo.quote", symbol=symbol, source="yahoo", cache="miss") as sp:
+        try:
+            price = upstream.call("yahoo", lambda: yf.Ticker(symbol).fast_info.last_price)
+            if price and not np.isnan(price): return float(price)
+        except upstream.CircuitOpen as e:
+            sp.fail(e)
+        except Exception as e:
+            sp.fail(e)
+            print(f"Yahoo 即時報價失敗 {symbol}: {e}")
+        return None
+
+# --- 日線 context：昨收與 MA5 趨勢，盤中不會變，存在倉庫一天只算一次 ---
+# day 是分 K 所屬的交易日 (YYYYMMDD)；假日、盤前看的是上一個交易日的 K 棒，昨收要取那天之前的收盤，不能以今天的日期切
+def get_daily_context(symbol_tw, day=None):
+    day = day or bar_store.today_str()
+    with tracing.span("daily_context", symbol=symbol_tw, day=day) as sp:
+        return _get_daily_context(symbol_tw, day, sp)
+
+def _get_daily_context(symbol_tw, day, sp):
+    store = bar_store.get_store()
+    ctx = store.get_context(symbol_tw, day=day)
+    if ctx:
+        sp.set(cache="hit")
+        return ctx['prev_close'], ctx['trend']
+    sp.set(cache="miss")
     try:
-        ticker = yf.Ticker(symbol)
-        price = ticker.fast_info.last_price
-        if price and not np.isnan(price): return float(price)
-    except: pass
-    return None
+        _refresh_daily([symbol_tw])
+    except upstream.CircuitOpen as e:
+        sp.fail(e)
+    except Exception as e:
+        sp.fail(e)
+        print(f"日 K 更新失敗 {symbol_tw}: {e}")
+    df_daily = store.read_daily(symbol_tw)
+    if df_daily is None: return 0, "Unknown"
+    # 只看該交易日以前已收盤的日 K
+    done = df_daily[df_daily.index < pd.Timestamp(day, tz=bar_store.TZ)]
+    if len(done) < 1: return 0, "Unknown"
+    prev_close = done['Close'].iloc[-1]
+    ma5 = done['Close'].rolling(5).mean().iloc[-1]
+    trend = "Bullish" if done['Close'].iloc[-1] > ma5 else "Bearish"
+    # 日 K 沒更新成功 (上游失敗，或單檔回空表時不會記抓取時間) 時舊資料可能少了最近幾天：
+    # 確定有前一個交易日才存，否則這次照用、下次再重抓
+    if store.is_current(symbol_tw, '1d', DAILY_FRESH_SECONDS) or bar_store.day_of(done.index[-1]) == bar_store.prev_trading_day(day):
+        store.put_context(symbol_tw, prev_close, trend, day=day)
+    return prev_close, trend
 
-# --- 工具：K 線重取樣 ---
+# --- 工具：K 線重取樣 (一次性的整段 resample；盤中更新走 bar_pyramid) ---
 def resample_data(df, timeframe_str):
     if timeframe_str == '1T': return df
     ohlc_dict = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
-    df_resampled = df.resample(timeframe_str).apply(ohlc_dict)
+    # 畫面上的週期代號沿用 '5T'，pandas 3 已拿掉 'T'，換成 'min'
+    rule = re.sub(r'^(\d+)T$', r'\1min', timeframe_str)
+    df_resampled = df.resample(rule).apply(ohlc_dict)
     df_resampled = df_resampled.dropna(subset=['Close'])
     return df_resampled
 
-# --- 🔥 主邏輯：策略訊號產生器 (含接刀策略) ---
-# 參數 sentiment_score 用來決定策略
-@st.cache_data(ttl=5)
-def get_orb_signals(symbol_input, fugle_api_key=None, timeframe='1T', sentiment_score=50):
+def _columns_from(df, start):
+    """第 start 根之後的 Open/High/Low/Close/Volume 陣列"""
+    tail = df.iloc[start:]
+    return [tail[k].to_numpy(dtype=float) for k in ('Open', 'High', 'Low', 'Close', 'Volume')]
+
+def _update_signal_state(symbol_id, timeframe, df, prev_close, sentiment_score, params=signal_engine.DEFAULT_PARAMS):
+    # 時間軸是索引的視圖；OHLCV 只轉提交點之後的幾根，刷新成本跟新進 K 棒數成正比，不跟整天的長度
+    state = signal_engine.get_signal_state(symbol_id, timeframe)
+    ts = df.index.as_unit('ns').asi8
+    start = state.resume_at(ts, prev_close, params)
+    sig = state.update(ts, *_columns_from(df, start), prev_close, sentiment_score, params, start=start)
+    if sig is None:   # 兩次呼叫之間狀態被別的執行緒重置，改給整段
+        sig = state.update(ts, *_columns_from(df, 0), prev_close, sentiment_score, params)
+    return sig
+
+# --- 串流模式：每收一根 1 分 K 就推進該檔的訊號狀態 ---
+def on_stream_bar(symbol_id):
+    ingest = stream_ingest.get_active()
+    if ingest is None: return
+    df = ingest.frame(symbol_id)
+    if df is None or df.empty: return
+    prev_close, _ = get_daily_context(symbol_resolver.yahoo_symbol(symbol_id), bar_store.day_of(df.index[-1]))
+    if prev_close == 0: prev_close = df['Open'].iloc[0]
+    _update_signal_state(symbol_id, '1T', df, prev_close, 50)
+
+# --- 資料來源：富果 → Yahoo ---
+def load_bars(symbol_input, fugle_api_key=None):
+    """取得當日 1 分 K：富果優先，失敗退回 Yahoo。回傳 (df, source, fugle_error_msg)，沒資料時 df 為 None"""
+    with tracing.span("load_bars", symbol=symbol_input) as sp:
+        df, source, error = _load_bars(symbol_input, fugle_api_key)
+        sp.set(source=source)
+        if df is None: sp.fail()
+        return df, source, error
+
+def _load_bars(symbol_input, fugle_api_key=None):
     symbol_id = symbol_input.split('.')[0]
-    symbol_tw = f"{symbol_id}.TW"
+    symbol_tw = symbol_resolver.yahoo_symbol(symbol_id)
     
     df = None
     source = "Yahoo (延遲/模擬)"
@@ -114,115 +311,88 @@ def get_orb_signals(symbol_input, fugle_api_key=None, timeframe='1T', sentiment_
         else:
             fugle_error_msg = error
     
-    # B. 降級使用 Yahoo
+    # B. 降級使用 Yahoo (富果失敗或斷路中)；Yahoo 也限流/斷路時沿用倉庫裡的舊資料
+    yahoo_error_msg = None
     if df is None or df.empty:
-        try:
-            ticker = yf.Ticker(symbol_tw)
-            df = ticker.history(period="1d", interval="1m")
-            realtime_price = get_realtime_quote_yahoo(symbol_tw)
-            if not df.empty and realtime_price:
-                last_time = df.index[-1]
-                now = pd.Timestamp.now(tz='Asia/Taipei')
-                if (now - last_time).total_seconds() > 120:
-                    new_row = pd.DataFrame({'Open': [realtime_price], 'High': [realtime_price], 'Low': [realtime_price], 'Close': [realtime_price], 'Volume': [0]}, index=[now])
-                    df = pd.concat([df, new_row])
-        except: pass
+        store = bar_store.get_store()
+        with tracing.span("yahoo.history", symbol=symbol_tw, source="yahoo") as sp:
+            try:
+                if not store.is_current(symbol_tw, '1m', INTRADAY_FRESH_SECONDS):
+                    sp.set(cache="miss")
+                    ticker = yf.Ticker(symbol_tw)
+                    last = store.last_intraday_ts(symbol_tw)
+                    if last is not None:
+                        hist = upstream.call("yahoo", ticker.history, start=last - pd.Timedelta(minutes=2), interval="1m")
+                    else:
+                        hist = upstream.call("yahoo", ticker.history, period="1d", interval="1m")
+                    store.write_intraday(symbol_tw, hist)
+                else:
+                    sp.set(cache="hit")
+            except Exception as e:
+                sp.fail(e)
+                yahoo_error_msg = f"Yahoo: {e}"
+            _, df = store.session_intraday(symbol_tw)
+        realtime_price = get_realtime_quote_yahoo(symbol_tw)
+        if df is not None and not df.empty and realtime_price:
+            last_time = df.index[-1]
+            now = pd.Timestamp.now(tz='Asia/Taipei')
+            if (now - last_time).total_seconds() > 120:
+                new_row = pd.DataFrame({'Open': [realtime_price], 'High': [realtime_price], 'Low': [realtime_price], 'Close': [realtime_price], 'Volume': [0]}, index=[now])
+                df = pd.concat([df, new_row])
 
-    if df is None or df.empty:
-        return None, {"error": "無法取得數據", "source": "None"}
+    if df is None or df.empty: return None, "None", fugle_error_msg or yahoo_error_msg
+    return df, source, fugle_error_msg
+
+def build_signals(symbol_input, df, source, fugle_error_msg=None, timeframe='1T', sentiment_score=50, params=None):
+    """load_bars 的結果 → SignalResult；df 只讀不改 (可能是倉庫 memmap 或快取共用的那一份)"""
+    params = params or signal_engine.DEFAULT_PARAMS
+    symbol_id = symbol_input.split('.')[0]
+    symbol_tw = symbol_resolver.yahoo_symbol(symbol_id)
 
-    # 週期轉換
+    # 週期轉換：金字塔只重聚合新進分鐘所在的那根，各週期結果共用
     if timeframe != '1T':
-        df = resample_data(df, timeframe)
+        with tracing.span("resample", symbol=symbol_id, timeframe=timeframe):
+            df = bar_pyramid.get_pyramid(symbol_id).update(df).frame(timeframe)
+
+    # --- 取得昨日收盤價 (每個交易日只算一次；以 K 棒所屬的交易日為準) ---
+    prev_close, trend = get_daily_context(symbol_tw, bar_store.day_of(df.index[-1]))
 
-    # --- 取得昨日收盤價 ---
-    prev_close = 0
-    trend = "Unknown"
-    try:
-        ticker_d = yf.Ticker(symbol_tw)
-        df_daily = ticker_d.history(period="5d", interval="1d")
-        if len(df_daily) >= 2:
-            prev_close = df_daily['Close'].iloc[-2] # 昨天收盤
-            ma5 = df_daily['Close'].rolling(5).mean().iloc[-1]
-            trend = "Bullish" if df_daily['Close'].iloc[-1] > ma5 else "Bearish"
-    except: pass
-    
     if prev_close == 0:
         prev_close = df['Open'].iloc[0]
 
-    # --- 計算 VWAP ---
-    df['Cum_Vol'] = df['Volume'].cumsum()
-    df['Cum_Vol_Price'] = (df['Close'] * df['Volume']).cumsum()
-    df['VWAP'] = df['Cum_Vol_Price'] / df['Cum_Vol']
+    # --- 計算 VWAP 與策略分流 (串流增量狀態，只重算新進/修正的 K 棒) ---
+    with tracing.span("signals", symbol=symbol_id, timeframe=timeframe, bars=len(df)):
+        sig = _update_signal_state(symbol_id, timeframe, df, prev_close, sentiment_score, params)
+    return signal_result.SignalResult(
+        symbol=symbol_input, timeframe=timeframe, segments=sig['segments'],
+        signal=sig['signal'], signal_price=float(sig['signal_price']),
+        pct_change=float(sig['pct_change']), strategy_name=sig['strategy_name'],
+        entry_idx=sig['entry_idx'], entry_price=sig['entry_price'],
+        exit_idx=sig['exit_idx'], exit_price=sig['exit_price'],
+        source=source, trend=trend, fugle_error=fugle_error_msg,
+    )
 
-    # --- 策略分流邏輯 ---
-    entry_time, entry_price = None, None
-    exit_time, exit_price = None, None
-    signal_status = "等待訊號"
-    strategy_name = "右側 VWAP"
+# 快取只包抓資料這段，key 只有代號與 Key：AI 分數、策略參數、週期不影響抓到的 K 棒，不該拆成多份。
+# cache_resource (或無頭模式的 ttl_cache) 不做 pickle 複製，各 session 共用同一份 df，所以 build_signals 不能改它。
+@ttl_cache.cache_resource(ttl=5, show_spinner=False)
+def _cached_bars(symbol_input, fugle_api_key=None):
+    return load_bars(symbol_input, fugle_api_key)
 
-    current_price = df['Close'].iloc[-1]
-    pct_change = (current_price - prev_close) / prev_close
-    
-    # 🔥 策略 A: 左側接刀 (熱度 > 80)
-    if sentiment_score > 80:
-        strategy_name = "🔥 左側接刀"
-        # 條件：跌超過 3% 且有 AI 高分背書
-        if pct_change <= -0.03:
-            for t, row in df.iterrows():
-                row_change = (row['Close'] - prev_close) / prev_close
-                if row_change <= -0.03:
-                    entry_time = t
-                    entry_price = row['Close']
-                    break
-        else:
-            signal_status = f"未達接刀點 (-3%)"
+# --- 🔥 主邏輯：策略訊號產生器 (含接刀策略) ---
+# 參數 sentiment_score 用來決定策略；params 為策略門檻 (signal_engine.StrategyParams)
+# 回傳 SignalResult，抓不到資料時回傳 None
+def get_orb_signals(symbol_input, fugle_api_key=None, timeframe='1T', sentiment_score=50, params=None):
+    with tracing.span("get_orb_signals", symbol=symbol_input, timeframe=timeframe) as sp:
+        df, source, fugle_error_msg = _cached_bars(symbol_input, fugle_api_key)
+        if df is None:
+            sp.fail()
+            return None
+        return build_signals(symbol_input, df, source, fugle_error_msg, timeframe, sentiment_score, params)
 
-    # ⚖️ 策略 B: 右側 VWAP (熱度 <= 80)
-    else:
-        strategy_name = "⚖️ 右側 VWAP"
-        market_open = df.index[0]
-        scan_data = df
-        max_dev = 0.0
-        high_h = 0.0
-        
-        for t, row in scan_data.iterrows():
-            if pd.isna(row['VWAP']): continue
-            if row['High'] > high_h: high_h = row['High']
-            dev = (row['Close'] - row['VWAP']) / row['VWAP']
-            if dev > max_dev: max_dev = dev
-                
-            if not entry_time:
-                if max_dev >= 0.006:
-                    if high_h > 0 and row['Close'] < high_h * 0.994:
-                        if row['Low'] <= row['VWAP'] * 1.015:
-                            if row['Close'] > row['Open'] and row['Close'] >= row['VWAP']:
-                                entry_time = t
-                                entry_price = row['Close']
-
-    # 模擬出場
-    if entry_time:
-        scan_exit = df[df.index > entry_time]
-        for t, row in scan_exit.iterrows():
-            if row['High'] >= entry_price * 1.02:
-                exit_time = t; exit_price = entry_price * 1.02; break
-            if row['Low'] <= entry_price * 0.985:
-                exit_time = t; exit_price = entry_price * 0.985; break
-        
-        if exit_time: signal_status = "已出場"
-        else: signal_status = f"持有中 {((current_price-entry_price)/entry_price)*100:.2f}%"
-
-    stats = {
-        "signal": signal_status, "signal_price": current_price,
-        "entry_time": entry_time, "entry_price": entry_price,
-        "exit_time": exit_time, "exit_price": exit_price,
-        "vwap_data": df['VWAP'], "source": source,
-        "context": {"trend": trend}, "is_realtime": (source == "Fugle (真即時 API)"),
-        "fugle_error": fugle_error_msg,
-        "strategy_name": strategy_name,
-        "pct_change": pct_change
-    }
-    return df, stats
-
-def backtest_strategy(symbol): return None
-def backtest_past_week(symbol): return []
\ No newline at end of file
+# --- 回測：重播本地倉庫的 1 分 K (見 backtester.py) ---
+def backtest_strategy(symbol, strategy='vwap', days=None, params=None):
+    result = backtester.run_backtest([symbol], strategy=strategy, workers=1, last_n_days=days, params=params)
+    return result['summary'] if result['trades'] else None
+
+def backtest_past_week(symbol, strategy='vwap', params=None):
+    return backtester.run_backtest([symbol], strategy=strategy, workers=1, last_n_days=5, params=params)['trades']
\ No newline at end of file
@@ -2,10 +2,19 @@ import streamlit as st
 import plotly.graph_objects as go
 import pandas as pd
 import analyzer
+import fugle_client
+import stream_ingest
+import sentiment_cache
+import signal_engine
+import watchlist
+import market_poller
+import upstream
+import tracing
 from analyzer import get_orb_signals, screen_hot_stocks
-import twstock
+import symbol_resolver
 import time
 import asyncio
+import threading
 
 # 🔥 嘗試匯入爬蟲模組
 HAS_HEAT_MODULE = False
@@ -19,6 +28,14 @@ except Exception as e:
 # 1. 頁面設定
 st.set_page_config(page_title="戰情室", layout="wide", page_icon="🛡️")
 
+# 爬蟲模組的依賴檢查 / 延遲載入丟到背景，不擋第一次畫面
+@st.cache_resource
+def warmup_heat_module():
+    threading.Thread(target=heat.warmup, name="heat-warmup", daemon=True).start()
+    return True
+
+if HAS_HEAT_MODULE: warmup_heat_module()
+
 # 2. 注入 CSS
 st.markdown("""
     <style>
@@ -55,23 +72,13 @@ def reset_monitor():
         st.session_state['auto_refresh_state'] = False 
         st.session_state['pending_restart'] = True    
 
-# 🚀 自動查詢中文名稱
+# 🚀 代號 / 名稱索引 (整個行程建一次)
+@st.cache_resource
+def get_symbol_resolver():
+    return symbol_resolver.get_resolver()
+
 def get_stock_code(user_input):
-    s = str(user_input).strip().upper()
-    raw_code = s.replace('.TW', '')
-    
-    # 情況 1: 輸入的是代號 (如 2330)
-    if raw_code.isdigit():
-        if raw_code in twstock.codes:
-            return f"{raw_code}.TW", twstock.codes[raw_code].name
-        return f"{raw_code}.TW", raw_code 
-    
-    # 情況 2: 輸入的是中文名稱 (如 台積電)
-    for code, info in twstock.codes.items():
-        if info.name == s:
-            return f"{code}.TW", info.name
-    
-    return None, None
+    return get_symbol_resolver().resolve(user_input)
 
 def update_symbol(symbol):
     st.session_state['target_symbol'] = symbol
@@ -85,7 +92,8 @@ def run_sentiment_analysis_debug(stock_code):
         return None
     
     try:
-        results = asyncio.run(heat.run_analysis(stock_code.split('.')[0]))
+        status = {}
+        results = asyncio.run(heat.run_analysis(stock_code.split('.')[0], status=status))
         all_news = []
         for res in results:
             if isinstance(res, list): all_news.extend(res)
@@ -97,12 +105,19 @@ def run_sentiment_analysis_debug(stock_code):
             return None
 
         score = None
-        if is_ai_ready:
+        # 只對準時交付的來源算指紋，逾時或失敗的來源不影響比對
+        fingerprint = sentiment_cache.source_fingerprints(status.get('delivered', {}))
+        cached = sentiment_cache.get_cache().get(stock_code, fingerprint)
+        if cached is not None:
+            score = cached['score']
+            st.toast(f"♻️ 新聞沒有變化，沿用上次 AI 分數: {score}")
+        elif is_ai_ready:
             st.toast("🧠 AI 正在閱讀新聞並進行戰略分析...")
             ai_score, ai_report, model = heat.analyze_with_gemini_requests(GEMINI_API_KEY, stock_code, all_news)
             
             if ai_score is not None:
                 score = ai_score
+                sentiment_cache.get_cache().put(stock_code, fingerprint, score, ai_report, model)
                 st.toast(f"✅ AI 分析完成！分數: {score}")
             else:
                 st.error(f"❌ AI 分析失敗: {ai_report}")
@@ -141,10 +156,71 @@ if user_input_val:
     code, name = get_stock_code(user_input_val)
     if code and code != st.session_state['target_symbol']:
         st.session_state['target_symbol'] = code
+    elif not code:
+        # 部分名稱 (如「台積」)：列出建議
+        suggestions = get_symbol_resolver().suggest(user_input_val, limit=6)
+        if suggestions:
+            for col, e in zip(st.columns(len(suggestions)), suggestions):
+                col.button(f"{e.code} {e.name}", key=f"sug_{e.code}", on_click=update_symbol, args=(e.symbol,), use_container_width=True)
+        else:
+            st.caption(f"找不到「{user_input_val}」")
 
 resolved_code, resolved_name = get_stock_code(st.session_state['target_symbol'])
+
+# ⚡ 串流模式：WebSocket 推播組 K，斷線時 get_fugle_kline 自動退回輪詢
+@st.cache_resource
+def get_stream_ingest(api_key):
+    ingest = stream_ingest.StreamIngest(api_key, [], on_bar=analyzer.on_stream_bar)
+    ingest.start()
+    stream_ingest.set_active(ingest)
+    return ingest
+
+STREAM_ERROR = ""
+if st.session_state.get('stream_mode') and is_key_loaded and resolved_code:
+    try:
+        ingest = get_stream_ingest(FUGLE_KEY)
+        stream_symbol = resolved_code.split('.')[0]
+        if stream_symbol not in ingest.builders:
+            analyzer.get_fugle_kline(stream_symbol, FUGLE_KEY)  # 先用 REST 回補盤中已過的 K 棒
+            ingest.add_symbol(stream_symbol)
+    except Exception as e:
+        STREAM_ERROR = str(e)
+if resolved_code and resolved_code not in st.session_state['sentiment_cache']:
+    # 新 session 先帶入磁碟快取中最近一次的分數
+    cached = sentiment_cache.get_cache().latest(resolved_code)
+    if cached is not None: st.session_state['sentiment_cache'][resolved_code] = cached['score']
 current_sentiment = st.session_state['sentiment_cache'].get(resolved_code, None)
 
+# ⏱️ 背景輪詢：每把 Key 一條執行緒抓資料並發布快照 (所有看過的週期一起算)，畫面只讀快照
+@st.cache_resource
+def get_market_poller(api_key):
+    return market_poller.MarketPoller(watchlist.WatchlistScheduler(api_key)).start()
+
+# K 線圖 (蠟燭 + VWAP + 進出場點)
+def build_chart(result, uirevision=None):
+    df = result.frame()
+    fig = go.Figure()
+    fig.add_trace(go.Candlestick(x=df.index, open=df['Open'], high=df['High'], low=df['Low'], close=df['Close'], name="價格"))
+    fig.add_trace(go.Scatter(x=df.index, y=result.vwap, mode='lines', line=dict(color='yellow', width=2), name="VWAP"))
+
+    if result.entry_time is not None:
+        fig.add_trace(go.Scatter(x=[result.entry_time], y=[result.entry_price], mode='markers', marker=dict(size=15, color='#FFD700', symbol='circle'), name="買進訊號"))
+    if result.exit_time is not None:
+        fig.add_trace(go.Scatter(x=[result.exit_time], y=[result.exit_price], mode='markers', marker=dict(size=15, color='#FF5252', symbol='x', line=dict(width=2, color='white')), name="出場訊號"))
+
+    fig.update_layout(
+        height=450, 
+        template="plotly_dark", 
+        plot_bgcolor='#0E1117', paper_bgcolor='#0E1117', font=dict(color='white'),
+        xaxis=dict(showgrid=True, gridcolor='#333', type='category'),
+        yaxis=dict(showgrid=True, gridcolor='#333'),
+        margin=dict(l=0, r=0, t=10, b=0), 
+        uirevision=uirevision, 
+        transition={'duration': 0},
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1, font=dict(size=10), bgcolor="rgba(0,0,0,0)")
+    )
+    return fig
+
 # 8. Fragment 儀表板 (手機滑動優化版)
 @st.fragment(run_every=5 if auto_refresh else None)
 def display_dashboard():
@@ -153,31 +229,41 @@ def display_dashboard():
     with st.container(height=650, border=False):
         temp_score = current_sentiment if current_sentiment is not None else 50
         
-        df, stats = get_orb_signals(
-            resolved_code, 
-            FUGLE_KEY, 
-            timeframe=selected_tf_code,
-            sentiment_score=temp_score
-        )
+        poller = get_market_poller(FUGLE_KEY)
+        poller.watch([resolved_code], {resolved_code: current_sentiment}, selected_tf_code)
+        with tracing.span("dashboard.data", symbol=resolved_code, timeframe=selected_tf_code) as sp:
+            snap = poller.latest()
+            # 快照以 (代號, 週期, 策略) 為 key，只拿用這個 session 的 AI 分數所選策略算的結果
+            result = snap.get(resolved_code, selected_tf_code, current_sentiment)
+            if result is not None:
+                sp.set(source="snapshot", cache="hit")
+            else:
+                # 剛切換週期/策略 (快照裡已有 1 分 K，倉庫是新的、週期從金字塔取，不重抓) 或冷啟動 (先同步抓一次)
+                warm = snap.has_bars(resolved_code)
+                sp.set(source="pyramid" if warm else "fetch", cache="hit" if warm else "miss")
+                result = get_orb_signals(
+                    resolved_code, 
+                    FUGLE_KEY, 
+                    timeframe=selected_tf_code,
+                    sentiment_score=temp_score
+                )
+            if result is None: sp.fail()
         
-        if df is not None:
+        if result is not None:
             if current_sentiment is None:
-                stats['entry_time'] = None
-                stats['exit_time'] = None
-                stats['signal'] = "等待 AI 指揮..."
-                stats['strategy_name'] = "尚未啟動戰略"
+                result = result.without_signal("等待 AI 指揮...", "尚未啟動戰略")
                 sentiment_display = "未分析"
                 sentiment_color = "#757575"
                 strat_color = "#757575"
             else:
                 sentiment_display = str(current_sentiment)
                 sentiment_color = "#FF5252" if current_sentiment > 60 else ("#00E676" if current_sentiment < 40 else "#888")
-                strat_color = "#FFD700" if "接刀" in stats['strategy_name'] else "#00BFFF"
+                strat_color = "#FFD700" if "接刀" in result.strategy_name else "#00BFFF"
 
-            current_price = stats['signal_price']
-            last_vwap = df['VWAP'].iloc[-1] if not df.empty and 'VWAP' in df.columns else 0
+            current_price = result.signal_price
+            last_vwap = result.last_vwap
             price_color = "#FF5252" if current_price > last_vwap else "#00E676"
-            pct_change = stats.get('pct_change', 0) * 100
+            pct_change = result.pct_change * 100
             
             # HUD (含中文名稱)
             hud_html = f"""
@@ -191,12 +277,12 @@ def display_dashboard():
                     <div style="font-size: 0.9rem; color: #AAA; margin-top: 5px;">
                         AI 情緒: <span style="color: {sentiment_color}; font-weight:bold; font-size: 1.1rem;">{sentiment_display}</span> 
                         <span style="margin: 0 5px;">|</span>
-                        戰略: <span style="color: {strat_color}; font-weight:bold;">{stats['strategy_name']}</span>
+                        戰略: <span style="color: {strat_color}; font-weight:bold;">{result.strategy_name}</span>
                     </div>
                 </div>
                 <div style="text-align: right;">
                     <div style="font-size: 0.8rem; color: #CCC;">VWAP <span style="color: yellow; font-weight: bold;">{last_vwap:.2f}</span></div>
-                    <div style="font-size: 0.9rem; color: #888; margin-top: 5px;">{stats['signal']}</div>
+                    <div style="font-size: 0.9rem; color: #888; margin-top: 5px;">{result.signal}</div>
                 </div>
             </div>
             """
@@ -208,29 +294,9 @@ def display_dashboard():
             with c_tog:
                 enable_touch = st.toggle("🖐️ 解鎖圖表 (縮放/移動)", value=False)
 
-            fig = go.Figure()
-            fig.add_trace(go.Candlestick(x=df.index, open=df['Open'], high=df['High'], low=df['Low'], close=df['Close'], name="價格"))
-            
-            if 'vwap_data' in stats:
-                fig.add_trace(go.Scatter(x=df.index, y=stats['vwap_data'], mode='lines', line=dict(color='yellow', width=2), name="VWAP"))
-            
-            if stats.get('entry_time'):
-                fig.add_trace(go.Scatter(x=[stats['entry_time']], y=[stats['entry_price']], mode='markers', marker=dict(size=15, color='#FFD700', symbol='circle'), name="買進訊號"))
-            if stats.get('exit_time'):
-                 fig.add_trace(go.Scatter(x=[stats['exit_time']], y=[stats['exit_price']], mode='markers', marker=dict(size=15, color='#FF5252', symbol='x', line=dict(width=2, color='white')), name="出場訊號"))
-
-            fig.update_layout(
-                height=450, 
-                template="plotly_dark", 
-                plot_bgcolor='#0E1117', paper_bgcolor='#0E1117', font=dict(color='white'),
-                xaxis=dict(showgrid=True, gridcolor='#333', type='category'),
-                yaxis=dict(showgrid=True, gridcolor='#333'),
-                margin=dict(l=0, r=0, t=10, b=0), 
-                uirevision=resolved_code, 
-                transition={'duration': 0},
-                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1, font=dict(size=10), bgcolor="rgba(0,0,0,0)")
-            )
-            
+            with tracing.span("dashboard.figure", symbol=resolved_code, timeframe=selected_tf_code, bars=len(result)):
+                fig = build_chart(result, uirevision=resolved_code)
+
             # 🔥 關鍵設定：根據開關決定是否鎖定圖表
             chart_config = {
                 'displayModeBar': False, 
@@ -238,10 +304,41 @@ def display_dashboard():
                 'scrollZoom': enable_touch
             }
             
-            st.plotly_chart(fig, use_container_width=True, key="live_chart_fragment", config=chart_config)
+            with tracing.span("dashboard.render", symbol=resolved_code, timeframe=selected_tf_code):
+                st.plotly_chart(fig, use_container_width=True, key="live_chart_fragment", config=chart_config)
         else:
             st.error("無法取得數據，請檢查代號或網路連線")
 
+# 📋 觀察清單：背景輪詢批次抓資料，只有選中的代號畫完整 K 線
+@st.fragment(run_every=5 if auto_refresh else None)
+def display_watchlist(symbols):
+    poller = get_market_poller(FUGLE_KEY)
+    poller.watch(symbols, st.session_state['sentiment_cache'], selected_tf_code)
+    snap = poller.latest()
+    rows = snap.table(symbols, selected_tf_code, st.session_state['sentiment_cache'])
+    if not rows:
+        st.caption("觀察清單載入中...")
+        return
+    grid = pd.DataFrame([{
+        "代號": r['symbol'].split('.')[0],
+        "價格": r.get('price'), "漲跌%": r.get('pct_change'), "VWAP 乖離%": r.get('vwap_dist'),
+        "策略": r.get('strategy', ''), "訊號": r.get('signal', r.get('error', '')),
+    } for r in rows])
+    st.dataframe(grid, hide_index=True, use_container_width=True,
+                 column_config={k: st.column_config.NumberColumn(format="%.2f") for k in ("價格", "漲跌%", "VWAP 乖離%")})
+    ws = poller.scheduler.stats
+    st.caption(f"快照 v{snap.version} ({snap.age:.0f}s 前) | 排程 {ws['ticks']} 次 | 抓取 {ws['fetches']} | 重算 {ws['recomputed']} | 未變動 {ws['unchanged']} | 錯誤 {ws['errors']} | 上次 {snap.tick_ms:.0f}ms")
+
+if st.toggle("📋 觀察清單模式", key="watchlist_mode"):
+    wl_input = st.text_input("觀察清單", value="2330, 2317, 2454, 2603", key="watchlist_input", label_visibility="collapsed", placeholder="以逗號分隔的代號或名稱")
+    wl_symbols = [c for c, _ in (get_stock_code(x) for x in wl_input.replace('，', ',').split(',') if x.strip()) if c]
+    wl_symbols = list(dict.fromkeys(wl_symbols))
+    if wl_symbols:
+        display_watchlist(wl_symbols)
+        for col, sym in zip(st.columns(len(wl_symbols)), wl_symbols):
+            col.button(sym.split('.')[0], key=f"wl_{sym}", on_click=update_symbol, args=(sym,), use_container_width=True,
+                       type="primary" if sym == resolved_code else "secondary")
+
 if resolved_code:
     display_dashboard()
     
@@ -256,7 +353,7 @@ if resolved_code:
             
         if st.button(btn_text, type=btn_type, use_container_width=True):
             if resolved_code:
-                with st.spinner("🚀 AI 指揮官正在分析戰場情報 (約 10 秒)..."):
+                with st.spinner("🚀 AI 指揮官正在分析戰場情報..."):
                     s = run_sentiment_analysis_debug(resolved_code)
                     if s is not None:
                         st.success(f"分析完成！戰略已更新。")
@@ -276,15 +373,78 @@ with st.expander("🛠️ 系統狀態檢查"):
     else: st.error("❌ FUGLE_KEY: 未設定")
     if is_ai_ready: st.success("✅ GEMINI_API_KEY: 連線正常")
     else: st.error("❌ GEMINI_API_KEY: 未設定")
-    if HAS_HEAT_MODULE: st.success("✅ 爬蟲模組: 運作中")
+    if HAS_HEAT_MODULE: st.success(f"✅ 爬蟲模組: 運作中 (載入 {heat.IMPORT_SECONDS*1000:.0f}ms)")
     else: st.error(f"❌ 爬蟲模組: 故障. {HEAT_ERROR}")
+    st.toggle("⚡ WebSocket 串流模式", key="stream_mode", disabled=not is_key_loaded)
+    active_ingest = stream_ingest.get_active()
+    if STREAM_ERROR: st.error(f"❌ 串流: {STREAM_ERROR} (已退回輪詢)")
+    elif active_ingest is not None:
+        ss = active_ingest.stats
+        status = "即時" if active_ingest.is_live() else "中斷 (輪詢中)"
+        st.caption(f"串流 {status} | 訊息 {ss['messages']} | 成交 {ss['trades']} | 收 K {ss['bars']} | 錯誤 {ss['errors']}")
+    fs = fugle_client.get_pool().snapshot_stats()
+    st.caption(f"富果上游呼叫 {fs['upstream_calls']} 次 | 快取命中 {fs['cache_hits']} | 合併請求 {fs['coalesced']} | 錯誤 {fs['errors']} | 命中率 {fs['hit_rate']:.0%}")
+    state_label = {"closed": "🟢 正常", "half_open": "🟡 試探中", "open": "🔴 斷路"}
+    for name, us in upstream.snapshot_stats().items():
+        st.caption(f"上游 {name} {state_label[us['state']]} (斷路 {us['trips']} 次) | {us['per_min']:.0f} 次/分 | 錯誤率 {us['error_rate']:.0%} | "
+                   f"重試 {us['retries']} | 拒絕 {us['rejected']} | 限速等待 {us['throttled_s']:.1f}s")
+    cs = sentiment_cache.get_cache().snapshot_stats()
+    st.caption(f"情緒快取 {cs['entries']} 檔 | 命中 {cs['hits']} | 未命中 {cs['misses']} (新聞變動 {cs['changed']}) | 過期 {cs['expired']} | 淘汰 {cs['evictions']} | 命中率 {cs['hit_rate']:.0%}")
+    if HAS_HEAT_MODULE:
+        ps = heat.pool_stats()
+        bs, hs, ns = ps["browser"], ps["http"], ps["news"]
+        if bs:
+            st.caption(f"瀏覽器池 {'運作中' if bs['alive'] else '閒置'} | 啟動 {bs['launches']} 次 | 崩潰 {bs['crashes']} | 頁面 {bs['pages']} | "
+                       f"等待 context p50 {bs['wait_p50_ms']:.0f}ms / p95 {bs['wait_p95_ms']:.0f}ms | 載入 p50 {bs['load_p50_ms']:.0f}ms / p95 {bs['load_p95_ms']:.0f}ms")
+        gt = heat.LAST_GEMINI_TIMINGS
+        if gt:
+            st.caption(f"Gemini 模型解析 {gt['discovery']*1000:.0f}ms | 生成 {gt['generation']*1000:.0f}ms")
+        if hs:
+            st.caption(f"HTTP 池 {'HTTP/2' if hs['http2_enabled'] else 'HTTP/1.1'} | 請求 {hs['requests']} (HTTP/2 {hs['http2']}) | 錯誤 {hs['errors']} | "
+                       f"{hs['bytes'] / 1024:.0f} KB | 304 {hs['not_modified']} | p50 {hs['p50_ms']:.0f}ms / p95 {hs['p95_ms']:.0f}ms")
+        if ns:
+            st.caption(f"新聞快取 {ns['entries']} 筆 | 新鮮命中 {ns['fresh']} | 重抓 {ns['fetched']} | 未變動 {ns['not_modified']} | "
+                       f"逾時 {ns['late']} (沿用舊資料 {ns['stale']}) | 錯誤 {ns['errors']} | 重複 {ns['duplicates']}")
+
+    # 各階段延遲 (tracing 的滾動分位數)
+    tracing.set_enabled(st.toggle("⏱️ 延遲追蹤", value=tracing.ENABLED, key="tracing_enabled"))
+    trace_stats = tracing.get_tracer().snapshot()
+    if trace_stats:
+        st.dataframe(pd.DataFrame([{
+            "階段": name, "次數": t['count'], "p50 ms": t['p50_ms'], "p95 ms": t['p95_ms'], "p99 ms": t['p99_ms'],
+            "錯誤率": t['error_rate'] * 100, "命中率": t['hit_rate'] * 100 if t['hit_rate'] is not None else None,
+        } for name, t in trace_stats.items()]), hide_index=True, use_container_width=True,
+            column_config={k: st.column_config.NumberColumn(format="%.1f") for k in ("p50 ms", "p95 ms", "p99 ms", "錯誤率", "命中率")})
+        c_jsonl, c_prom = st.columns(2)
+        c_jsonl.download_button("匯出 JSON lines", tracing.get_tracer().export_jsonl(), file_name="trace.jsonl", use_container_width=True)
+        c_prom.download_button("匯出 Prometheus", tracing.get_tracer().prometheus_text(), file_name="metrics.prom", use_container_width=True)
 
 if st.session_state['scan_results']:
     st.divider()
     st.markdown("##### 🔥 熱門潛力股掃描")
+    if analyzer.LAST_SCREEN_TIMINGS:
+        st.caption("掃描耗時: " + " | ".join(f"{k} {v*1000:.0f}ms" for k, v in analyzer.LAST_SCREEN_TIMINGS.items()))
+    if HAS_HEAT_MODULE and st.button("🧠 全部 AI 評分", use_container_width=True):
+        with st.spinner("🧠 批次爬新聞並評分中..."):
+            symbols = [item['symbol'] for item in st.session_state['scan_results']]
+            resolver = get_symbol_resolver()
+            names = {s: resolver.lookup(s.split('.')[0]).name for s in symbols if resolver.lookup(s.split('.')[0])}
+            batch = heat.score_symbols(GEMINI_API_KEY if is_ai_ready else None, symbols, names)
+            for s, r in batch.items(): st.session_state['sentiment_cache'][s] = r['score']
+            st.session_state['batch_sources'] = {s: r['source'] for s, r in batch.items()}
+    if HAS_HEAT_MODULE and heat.LAST_BATCH_STATS:
+        bt = heat.LAST_BATCH_STATS
+        st.caption(f"批次評分 {bt['symbols']} 檔 | AI {bt['ai']} / 快取 {bt['cache']} / 關鍵字 {bt['keyword']} | Gemini {bt['gemini_calls']} 次 | "
+                   f"新聞 {bt['news']:.1f}s | 生成 {bt['generation']:.1f}s | 總計 {bt['total']:.1f}s")
+    batch_sources = st.session_state.get('batch_sources', {})
     for item in st.session_state['scan_results']:
         c1, c2, c3 = st.columns([2, 2, 1])
+        score = st.session_state['sentiment_cache'].get(item['symbol'])
         c1.write(f"**{item['symbol']}**")
-        c2.write(f"波動: {item['volatility']:.1f}%")
-        target = item['symbol'].split('.')[0]
-        c3.button("查看", key=f"btn_{item['symbol']}", on_click=update_symbol, args=(f"{target}.TW",))
\ No newline at end of file
+        if score is None:
+            c2.write(f"波動: {item['volatility']:.1f}%")
+        else:
+            mode = "🔥 接刀" if signal_engine.strategy_mode(score) == 'knife' else "⚖️ VWAP"
+            tag = " (關鍵字)" if batch_sources.get(item['symbol']) == 'keyword' else ""
+            c2.write(f"波動: {item['volatility']:.1f}% | {score}分{tag} {mode}")
+        c3.button("查看", key=f"btn_{item['symbol']}", on_click=update_symbol, args=(item['symbol'],))
\ No newline at end of file
@@ -0,0 +1,32 @@
+import asyncio
+import threading
+
+# --- 共用背景事件迴圈 ---
+# Streamlit 每次 asyncio.run 都是新的 loop，而 Playwright 瀏覽器、HTTP 連線池這類長壽物件
+# 綁在建立它的 loop 上。長壽資源一律放在這條背景 loop，呼叫端從任何 loop 都能 await。
+
+_LOOP = None
+_LOCK = threading.Lock()
+
+def get_loop():
+    global _LOOP
+    with _LOCK:
+        if _LOOP is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="async-runtime", daemon=True).start()
+            _LOOP = loop
+        return _LOOP
+
+def submit(coro):
+    """從任何執行緒丟進背景 loop，回傳 concurrent.futures.Future"""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+async def run_on_loop(coro):
+    """在背景 loop 上執行並等待結果 (已在背景 loop 上則直接 await)"""
+    loop = get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop: return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
@@ -0,0 +1,142 @@
+import os
+import argparse
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import bar_store
+import signal_engine
+import symbol_resolver
+
+# --- 多檔多日回測：重播本地倉庫的 1 分 K，套用與 get_orb_signals 相同的進出場規則 ---
+# 以 (代號, 一批交易日) 為單位分給 process pool，不需要網路。
+# 回測是逐根重播：接刀在第一根跌破 -3% 的 K 棒進場 (當下價格即觸發條件)，
+# 收盤前未觸及停利停損則以最後一根收盤價平倉。
+
+DAYS_PER_TASK = 20
+
+def store_key(store, symbol):
+    """倉庫裡富果用純代號、Yahoo 用 .TW / .TWO，哪個有分 K 就用哪個"""
+    symbol_id = symbol.split('.')[0]
+    for key in (symbol, symbol_id, symbol_resolver.yahoo_symbol(symbol_id)):
+        if store.intraday_days(key): return key
+    return None
+
+def prev_close_lookup(store, symbol):
+    """昨收優先用日 K (今天以前最後一根收盤)"""
+    daily = store.read_daily(symbol_resolver.yahoo_symbol(symbol))
+    if daily is None: return lambda day: None
+    dates = daily.index.asi8
+    closes = daily['Close'].to_numpy()
+    def lookup(day):
+        i = int(np.searchsorted(dates, pd.Timestamp(day, tz=bar_store.TZ).value)) - 1
+        return float(closes[i]) if i >= 0 else None
+    return lookup
+
+def backtest_day(ts, open_, high, low, close, volume, prev_close, strategy, params=signal_engine.DEFAULT_PARAMS):
+    """單日重播，回傳 (進場位置, 進場價, 出場位置, 出場價, 原因) 或 None"""
+    if len(ts) == 0: return None
+    if not prev_close: prev_close = open_[0]
+    if strategy == 'knife':
+        entry = signal_engine.scan_knife_entry(close, prev_close, params)
+    else:
+        _, _, vwap = signal_engine.compute_vwap(close, volume)
+        entry = signal_engine.scan_vwap_entry(open_, high, low, close, vwap, params)
+    if entry == signal_engine.NO_SIGNAL: return None
+    entry_price = close[entry]
+    exit_idx, exit_price = signal_engine.scan_exit(ts, high, low, entry, entry_price, params)
+    if exit_idx != signal_engine.NO_SIGNAL:
+        reason = 'take_profit' if exit_price > entry_price else 'stop_loss'
+    else:
+        exit_idx, exit_price, reason = len(ts) - 1, close[-1], 'close'
+    return entry, entry_price, exit_idx, exit_price, reason
+
+def _run_task(args):
+    root, symbol, key, days, prev_day, strategy, params = args
+    store = bar_store.BarStore(root)
+    daily_prev = prev_close_lookup(store, symbol)
+    # 沒有日 K 時用前一個交易日分 K 的最後一筆當昨收
+    last_close = None
+    if prev_day:
+        ts, ohlcv = store.read_intraday_arrays(key, prev_day)
+        if len(ts): last_close = float(ohlcv[-1, 3])
+    trades = []
+    for day in days:
+        ts, ohlcv = store.read_intraday_arrays(key, day)
+        if len(ts) == 0: continue
+        o, h, l, c, v = (np.asarray(ohlcv[:, k]) for k in range(5))
+        prev_close = daily_prev(day) or last_close
+        last_close = float(c[-1])
+        result = backtest_day(np.asarray(ts), o, h, l, c, v, prev_close, strategy, params)
+        if result is None: continue
+        entry, entry_price, exit_idx, exit_price, reason = result
+        trades.append({
+            "symbol": symbol, "day": day, "strategy": strategy,
+            "entry_time": pd.Timestamp(int(ts[entry]), tz='UTC').tz_convert(bar_store.TZ),
+            "entry_price": float(entry_price),
+            "exit_time": pd.Timestamp(int(ts[exit_idx]), tz='UTC').tz_convert(bar_store.TZ),
+            "exit_price": float(exit_price), "exit_reason": reason,
+            "pnl_pct": float((exit_price - entry_price) / entry_price * 100),
+        })
+    return trades
+
+def summarize(trades):
+    if not trades:
+        return {"trades": 0, "wins": 0, "win_rate": 0.0, "total_pnl_pct": 0.0, "avg_pnl_pct": 0.0}
+    pnl = np.array([t["pnl_pct"] for t in trades])
+    wins = int((pnl > 0).sum())
+    return {
+        "trades": len(trades), "wins": wins, "win_rate": wins / len(trades),
+        "total_pnl_pct": float(pnl.sum()), "avg_pnl_pct": float(pnl.mean()),
+        "max_loss_pct": float(pnl.min()), "max_gain_pct": float(pnl.max()),
+    }
+
+def run_backtest(symbols, days=None, strategy='vwap', workers=None, root=None, last_n_days=None, params=None):
+    """回傳 {'trades': [...], 'summary': {...}, 'by_symbol': {...}}；days 為 None 時用倉庫中所有交易日"""
+    store = bar_store.BarStore(root or bar_store.BAR_STORE_DIR)
+    params = params or signal_engine.DEFAULT_PARAMS
+    wanted = set(days) if days is not None else None
+    tasks = []
+    for symbol in symbols:
+        key = store_key(store, symbol)
+        if key is None: continue
+        all_days = store.intraday_days(key)
+        sym_days = [d for d in all_days if wanted is None or d in wanted]
+        if last_n_days: sym_days = sym_days[-last_n_days:]
+        for i in range(0, len(sym_days), DAYS_PER_TASK):
+            chunk = sym_days[i:i + DAYS_PER_TASK]
+            pos = all_days.index(chunk[0])
+            prev_day = all_days[pos - 1] if pos > 0 else None
+            tasks.append((store.root, symbol, key, chunk, prev_day, strategy, params))
+
+    trades = []
+    if workers == 1 or len(tasks) <= 1:
+        for t in tasks: trades.extend(_run_task(t))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for result in pool.map(_run_task, tasks, chunksize=max(1, len(tasks) // ((workers or os.cpu_count() or 1) * 4))):
+                trades.extend(result)
+
+    trades.sort(key=lambda t: (t["entry_time"], t["symbol"]))
+    by_symbol = {}
+    for t in trades: by_symbol.setdefault(t["symbol"], []).append(t)
+    return {
+        "trades": trades,
+        "summary": summarize(trades),
+        "by_symbol": {s: summarize(ts) for s, ts in by_symbol.items()},
+    }
+
+if __name__ == "__main__":
+    import time
+    from analyzer import MARKET_POOL
+    parser = argparse.ArgumentParser(description="本地 1 分 K 多檔回測")
+    parser.add_argument("--symbols", help="以逗號分隔，預設 MARKET_POOL")
+    parser.add_argument("--days", type=int, help="只測最近 N 個交易日")
+    parser.add_argument("--strategy", choices=["vwap", "knife"], default="vwap")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--root", default=bar_store.BAR_STORE_DIR)
+    args = parser.parse_args()
+    symbols = args.symbols.split(",") if args.symbols else MARKET_POOL
+    t0 = time.perf_counter()
+    result = run_backtest(symbols, strategy=args.strategy, workers=args.workers, root=args.root, last_n_days=args.days)
+    s = result["summary"]
+    print(f"{len(symbols)} 檔, {s['trades']} 筆交易, 勝率 {s['win_rate']:.1%}, 累計 {s['total_pnl_pct']:+.2f}%, 耗時 {time.perf_counter() - t0:.2f}s")
@@ -0,0 +1,123 @@
+import threading
+import numpy as np
+import pandas as pd
+
+# --- 多週期 K 棒金字塔：由 1 分 K 一次聚合出 5/15/30/60 分 ---
+# 每檔一座金字塔，所有週期放在一起；新分鐘進來只重算它落在的那一根 (未收盤的) 高週期 K 棒，
+# 切換圖表週期直接取現成結果，不必重抓也不必重新 resample。
+# 分桶與 pandas resample 預設相同 (左閉、以當日 00:00 為起點)，台北時區整點偏移不影響 5~60 分的切法。
+
+TIMEFRAMES = {'5T': 5, '15T': 15, '30T': 30, '60T': 60}
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+MINUTE_NS = 60_000_000_000
+
+class _Level:
+    """單一週期的聚合結果：桶起點 (UTC 奈秒) 與 OHLCV"""
+    def __init__(self, minutes):
+        self.width = minutes * MINUTE_NS
+        self.n = 0
+        self.ts = np.empty(0, dtype=np.int64)
+        self.ohlcv = np.empty((0, len(COLUMNS)))
+
+    def _ensure_capacity(self, n):
+        cap = len(self.ts)
+        if n <= cap: return
+        new_cap = max(n, cap * 2, 64)
+        ts = np.empty(new_cap, dtype=np.int64); ts[:cap] = self.ts
+        ohlcv = np.empty((new_cap, len(COLUMNS))); ohlcv[:cap] = self.ohlcv
+        self.ts, self.ohlcv = ts, ohlcv
+
+    def rebuild_from(self, base_ts, base_ohlcv, start):
+        """base 從第 start 根起有變動：丟掉涵蓋它之後的桶，只重聚合這一段"""
+        if len(base_ts) == 0:
+            self.n = 0
+            return
+        # start 落在尾端之外 (資料被截短) 時，最後一根所在的桶也可能少了 K 棒，一併重算
+        pivot = base_ts[min(start, len(base_ts) - 1)]
+        first_bucket = pivot - pivot % self.width
+        k = int(np.searchsorted(self.ts[:self.n], first_bucket))
+        b0 = int(np.searchsorted(base_ts, first_bucket))
+        ts, px = base_ts[b0:], base_ohlcv[b0:]
+        buckets = ts - ts % self.width
+        starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+        ends = np.concatenate((starts[1:], [len(ts)])) - 1
+        m = len(starts)
+        self._ensure_capacity(k + m)
+        self.ts[k:k + m] = buckets[starts]
+        out = self.ohlcv[k:k + m]
+        out[:, 0] = px[starts, 0]
+        out[:, 1] = np.fmax.reduceat(px[:, 1], starts)
+        out[:, 2] = np.fmin.reduceat(px[:, 2], starts)
+        out[:, 3] = px[ends, 3]
+        out[:, 4] = np.add.reduceat(np.nan_to_num(px[:, 4]), starts)
+        self.n = k + m
+
+class BarPyramid:
+    # 與 bar_store / SignalState 相同：最後幾根 1 分 K 可能被上游修正，每次從這裡往後重算
+    REVISE_WINDOW = 2
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.lock = threading.Lock()
+        self.stats = {"updates": 0, "rebuilds": 0, "bars_aggregated": 0}
+        self._reset()
+
+    def _reset(self):
+        self.n = 0
+        self._ts = np.empty(0, dtype=np.int64)
+        self._ohlcv = np.empty((0, len(COLUMNS)))
+        self.levels = {tf: _Level(m) for tf, m in TIMEFRAMES.items()}
+        self._frames = {}
+
+    def update(self, df):
+        """同步當日 1 分 K (時間遞增)，只重聚合新進/修正的分鐘所在的高週期 K 棒"""
+        if df is None or df.empty: return self
+        index = df.index.tz_convert('UTC') if df.index.tz is not None else df.index
+        ts = index.as_unit('ns').asi8
+        values = df[COLUMNS].to_numpy(dtype=float)
+        with self.lock:
+            n, old_n = len(ts), self.n
+            start = max(0, old_n - self.REVISE_WINDOW)
+            if start > n or (start > 0 and (ts[0] != self._ts[0] or ts[start - 1] != self._ts[start - 1])):
+                self._reset()
+                self.stats["rebuilds"] += 1
+                start = 0
+            elif n == old_n and np.array_equal(ts[start:], self._ts[start:n]) \
+                    and np.array_equal(values[start:], self._ohlcv[start:n]):
+                return self
+            if n > len(self._ts):
+                cap = max(n, len(self._ts) * 2, 512)
+                grown_ts = np.empty(cap, dtype=np.int64); grown_ts[:self.n] = self._ts[:self.n]
+                grown = np.empty((cap, len(COLUMNS))); grown[:self.n] = self._ohlcv[:self.n]
+                self._ts, self._ohlcv = grown_ts, grown
+            self._ts[start:n] = ts[start:]
+            self._ohlcv[start:n] = values[start:]
+            self.n = n
+            for level in self.levels.values():
+                level.rebuild_from(self._ts[:n], self._ohlcv[:n], start)
+            self._frames = {}
+            self.stats["updates"] += 1
+            self.stats["bars_aggregated"] += n - start
+        return self
+
+    def frame(self, timeframe):
+        """該週期的 K 棒 DataFrame (與 resample_data 同形)；同一版資料只組一次，各呼叫端共用，不可修改"""
+        with self.lock:
+            cached = self._frames.get(timeframe)
+            if cached is None:
+                level = self.levels[timeframe]
+                index = pd.DatetimeIndex(level.ts[:level.n].view('M8[ns]')).tz_localize('UTC').tz_convert('Asia/Taipei')
+                index.name = 'Date'
+                cached = self._frames[timeframe] = pd.DataFrame(level.ohlcv[:level.n].copy(), index=index, columns=COLUMNS)
+        return cached
+
+_PYRAMIDS = {}
+_PYRAMIDS_LOCK = threading.Lock()
+
+def get_pyramid(symbol):
+    """取得代號的金字塔，整個行程共用"""
+    with _PYRAMIDS_LOCK:
+        pyramid = _PYRAMIDS.get(symbol)
+        if pyramid is None:
+            pyramid = _PYRAMIDS[symbol] = BarPyramid(symbol)
+        return pyramid
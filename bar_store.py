@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import datetime
+import threading
+import numpy as np
+import pandas as pd
+
+# --- 本地 K 線倉庫 (欄式 memmap) ---
+# 每檔股票一個目錄：
+#   1m/YYYYMMDD.ts      int64  UTC 奈秒時間戳
+#   1m/YYYYMMDD.ohlcv   float64 (n, 5) Open/High/Low/Close/Volume
+#   1d.ts / 1d.ohlcv    日 K，同格式
+#   meta.json           最後抓取時間、當日 prev_close/trend
+# 只做附加寫入；最後 REVISE_WINDOW 根允許被上游修正時原地覆寫。
+
+BAR_STORE_DIR = os.environ.get("BAR_STORE_DIR", ".bar_store")
+TZ = 'Asia/Taipei'
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+REVISE_WINDOW = 2
+MARKET_OPEN = datetime.time(9, 0)
+MARKET_CLOSE = datetime.time(13, 30)
+# 收盤後留幾分鐘給最後一盤與收盤價定案
+SETTLE_DELAY = pd.Timedelta(minutes=5)
+
+def today_str(now=None):
+    now = now or pd.Timestamp.now(tz=TZ)
+    return now.strftime('%Y%m%d')
+
+def day_of(ts):
+    """K 棒時間 → 所屬交易日 YYYYMMDD (台北時間)"""
+    return pd.Timestamp(ts).tz_convert(TZ).strftime('%Y%m%d')
+
+def prev_trading_day(day):
+    """YYYYMMDD 的前一個平日 (不認國定假日)"""
+    t = pd.Timestamp(day) - pd.Timedelta(days=1)
+    while t.weekday() >= 5: t -= pd.Timedelta(days=1)
+    return t.strftime('%Y%m%d')
+
+def in_session(now=None):
+    now = now or pd.Timestamp.now(tz=TZ)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+def last_settled_close(now=None):
+    """最近一次已定案的收盤時刻 (平日 13:35)"""
+    now = now or pd.Timestamp.now(tz=TZ)
+    t = now.normalize() + pd.Timedelta(hours=MARKET_CLOSE.hour, minutes=MARKET_CLOSE.minute) + SETTLE_DELAY
+    while t > now or t.weekday() >= 5:
+        t -= pd.Timedelta(days=1)
+    return t
+
+class BarStore:
+    def __init__(self, root=BAR_STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+    # --- 路徑 ---
+    def _dir(self, symbol, *parts):
+        path = os.path.join(self.root, symbol, *parts)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _intraday_base(self, symbol, day):
+        return os.path.join(self._dir(symbol, '1m'), day)
+
+    def _daily_base(self, symbol):
+        return os.path.join(self._dir(symbol), '1d')
+
+    # --- 底層讀寫 ---
+    @staticmethod
+    def _map(base):
+        """以 memmap 唯讀映射，回傳 (ts, ohlcv)；檔案不存在回傳空陣列"""
+        try:
+            n_ts = os.path.getsize(base + '.ts') // 8
+            n_px = os.path.getsize(base + '.ohlcv') // (8 * len(COLUMNS))
+        except OSError:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(COLUMNS)))
+        n = min(n_ts, n_px)  # 寫到一半中斷時以較短者為準
+        if n == 0:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(COLUMNS)))
+        ts = np.memmap(base + '.ts', dtype=np.int64, mode='r', shape=(n,))
+        ohlcv = np.memmap(base + '.ohlcv', dtype=np.float64, mode='r', shape=(n, len(COLUMNS)))
+        return ts, ohlcv
+
+    def _append(self, base, df):
+        """把 df 合併進檔案：只寫入比倉庫新的 K 棒，最後幾根可覆寫"""
+        if df is None or df.empty: return 0
+        index = df.index.tz_convert('UTC') if df.index.tz is not None else df.index
+        new_ts = index.as_unit('ns').asi8
+        with self._lock:
+            ts, _ = self._map(base)
+            n = len(ts)
+            cut = ts[max(0, n - REVISE_WINDOW)] if n else np.iinfo(np.int64).min
+            keep = new_ts >= cut
+            if not keep.any(): return 0
+            new_ts = new_ts[keep]
+            pos = int(np.searchsorted(ts, new_ts[0])) if n else 0
+            if pos + len(new_ts) < n: return 0  # 不縮短既有資料
+            values = df.loc[keep, COLUMNS].to_numpy(dtype=np.float64)
+            del ts
+            for suffix, arr in (('.ts', new_ts.astype(np.int64)), ('.ohlcv', values)):
+                mode = 'r+b' if os.path.exists(base + suffix) else 'wb'
+                with open(base + suffix, mode) as f:
+                    f.seek(pos * arr[0].nbytes)
+                    f.write(np.ascontiguousarray(arr).tobytes())
+            return len(new_ts)
+
+    @staticmethod
+    def _to_frame(ts, ohlcv):
+        """零拷貝：欄位直接包住 memmap"""
+        index = pd.DatetimeIndex(ts.view('M8[ns]')).tz_localize('UTC').tz_convert(TZ)
+        index.name = 'Date'
+        return pd.DataFrame(ohlcv, index=index, columns=COLUMNS, copy=False)
+
+    # --- 分 K ---
+    # 上游有回 K 棒才記抓取時間：空表 (限流、該檔沒資料) 若也記，is_current 會以為已抓過而不再重抓
+    def write_intraday(self, symbol, df):
+        if df is None or df.empty: return 0
+        df = df.dropna(subset=['Close'])
+        if df.empty: return 0
+        days = df.index.tz_convert(TZ).strftime('%Y%m%d')
+        written = 0
+        for day in np.unique(days):
+            written += self._append(self._intraday_base(symbol, day), df[days == day])
+        self._touch(symbol, '1m')
+        return written
+
+    def read_intraday_arrays(self, symbol, day=None):
+        """(ts, ohlcv) 的 memmap 本體，給回測等不需要 DataFrame 的批次運算"""
+        return self._map(self._intraday_base(symbol, day or today_str()))
+
+    def read_intraday(self, symbol, day=None):
+        ts, ohlcv = self._map(self._intraday_base(symbol, day or today_str()))
+        if len(ts) == 0: return None
+        return self._to_frame(ts, ohlcv)
+
+    def intraday_days(self, symbol):
+        path = os.path.join(self.root, symbol, '1m')
+        if not os.path.isdir(path): return []
+        return sorted(f[:-3] for f in os.listdir(path) if f.endswith('.ts'))
+
+    def latest_intraday(self, symbol):
+        """最近一個有資料的交易日 (day, DataFrame)"""
+        days = self.intraday_days(symbol)
+        if not days: return None, None
+        return days[-1], self.read_intraday(symbol, days[-1])
+
+    def session_intraday(self, symbol, now=None):
+        """畫面要顯示的分 K：盤中只認今天 (今天還沒成交就是沒有，不拿上一個交易日充數)，盤後/盤前/假日取最近一個交易日"""
+        now = now or pd.Timestamp.now(tz=TZ)
+        if in_session(now):
+            day = today_str(now)
+            return day, self.read_intraday(symbol, day)
+        return self.latest_intraday(symbol)
+
+    def last_intraday_ts(self, symbol, day=None):
+        ts, _ = self._map(self._intraday_base(symbol, day or today_str()))
+        return pd.Timestamp(int(ts[-1]), tz='UTC').tz_convert(TZ) if len(ts) else None
+
+    # --- 日 K ---
+    def write_daily(self, symbol, df):
+        if df is None or df.empty: return 0
+        df = df.dropna(subset=['Close'])
+        if df.empty: return 0
+        if df.index.tz is None: df = df.tz_localize(TZ)
+        written = self._append(self._daily_base(symbol), df)
+        self._touch(symbol, '1d')
+        return written
+
+    def last_daily_ts(self, symbol):
+        ts, _ = self._map(self._daily_base(symbol))
+        return pd.Timestamp(int(ts[-1]), tz='UTC').tz_convert(TZ) if len(ts) else None
+
+    def read_daily(self, symbol):
+        ts, ohlcv = self._map(self._daily_base(symbol))
+        if len(ts) == 0: return None
+        return self._to_frame(ts, ohlcv)
+
+    # --- meta：抓取時間與當日 context ---
+    def _meta_path(self, symbol):
+        return os.path.join(self._dir(symbol), 'meta.json')
+
+    def _load_meta(self, symbol):
+        try:
+            with open(self._meta_path(symbol), encoding='utf-8') as f: return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_meta(self, symbol, meta):
+        tmp = self._meta_path(symbol) + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f: json.dump(meta, f)
+        os.replace(tmp, self._meta_path(symbol))
+
+    def _touch(self, symbol, kind):
+        with self._lock:
+            meta = self._load_meta(symbol)
+            meta[f'{kind}_fetched_at'] = time.time()
+            self._save_meta(symbol, meta)
+
+    def fetched_at(self, symbol, kind):
+        return self._load_meta(symbol).get(f'{kind}_fetched_at', 0.0)
+
+    def is_current(self, symbol, kind, fresh_seconds):
+        """倉庫資料是否已涵蓋上游所有 K 棒：盤中看新鮮度，盤後看是否在收盤定案後抓過"""
+        now = pd.Timestamp.now(tz=TZ)
+        fetched = self.fetched_at(symbol, kind)
+        if in_session(now): return now.timestamp() - fetched < fresh_seconds
+        return fetched >= last_settled_close(now).timestamp()
+
+    def get_context(self, symbol, day=None):
+        """當日 prev_close / trend，一天只算一次"""
+        ctx = self._load_meta(symbol).get('context')
+        if ctx and ctx.get('day') == (day or today_str()): return ctx
+        return None
+
+    def put_context(self, symbol, prev_close, trend, day=None):
+        with self._lock:
+            meta = self._load_meta(symbol)
+            meta['context'] = {'day': day or today_str(), 'prev_close': float(prev_close), 'trend': trend}
+            self._save_meta(symbol, meta)
+        return meta['context']
+
+_STORE = None
+
+def get_store():
+    """整個行程共用一個倉庫實例"""
+    global _STORE
+    if _STORE is None: _STORE = BarStore()
+    return _STORE
@@ -0,0 +1,311 @@
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import platform
+import tempfile
+import argparse
+import tracemalloc
+import importlib.util
+import numpy as np
+
+# --- 離線基準測試 ---
+# 合成行情 (synthetic_market) + 錄製回應的假上游 (stub_upstream)，不碰真的 Yahoo / 富果 / Google News / Gemini。
+# 每個案例回報延遲分位數、吞吐量與單次呼叫的峰值記憶體 (tracemalloc，另跑一次，不影響計時)。
+# 用法：
+#   python bench.py --save bench_baseline.json             建立基準
+#   python bench.py --compare bench_baseline.json          與基準比較，退步超過門檻時 exit 1
+#   python bench.py --only signals,resample --repeat 200
+
+DEFAULT_REPEAT = 30
+REGRESSION_THRESHOLD = 0.25      # p50 / 峰值記憶體 比基準多 25% 視為退步
+SEED = 7
+GROUPS = {}
+
+def group(name):
+    def register(fn):
+        GROUPS[name] = fn
+        return fn
+    return register
+
+class Skip(Exception):
+    """環境缺少依賴，整組略過"""
+
+# --- 量測 ---
+def measure(fn, repeat=DEFAULT_REPEAT, warmup=2, items=1):
+    for _ in range(warmup): fn()
+    gc.collect()
+    lat = np.empty(repeat)
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        lat[i] = time.perf_counter() - t0
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    p50, p95, p99 = np.percentile(lat, [50, 95, 99]) * 1000
+    return {"calls": repeat, "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99),
+            "mean_ms": float(lat.mean() * 1000), "throughput": float(items * repeat / lat.sum()), "peak_kb": peak / 1024}
+
+# --- 環境：假上游 + 暫存倉庫，必須在 import analyzer / stock_heat_analyzer 之前建好 ---
+class BenchEnv:
+    def __init__(self, seed=SEED, latency=0.0, real_limits=False, browser=False):
+        import stub_upstream
+        self.seed = seed
+        self.browser = browser
+        self.tmp = tempfile.mkdtemp(prefix="vwap-bench-")
+        self.stub = stub_upstream.StubUpstream(
+            {}, latency={p: latency for p in ("/fugle", "/yahoo", "/gnews", "/anue", "/tw-yahoo", "/v1beta")} if latency else None,
+        ).start()
+        os.environ.update(self.stub.env())
+        os.environ["BAR_STORE_DIR"] = os.path.join(self.tmp, "store")
+        os.environ["SENTIMENT_CACHE_PATH"] = os.path.join(self.tmp, "sentiment.json")
+        os.environ["HEAT_RUNTIME_MARKER"] = os.path.join(self.tmp, "heat_runtime.json")
+        os.environ["TRACING"] = "0"
+
+        import analyzer
+        import upstream
+        analyzer.yf = stub_upstream.YahooStub(self.stub.url)
+        if not real_limits:
+            # 量的是自己的程式，不是上游額度
+            for p in upstream.PROVIDERS.values(): p.bucket = upstream.TokenBucket(rate=1e9, burst=1e9)
+        self.analyzer = analyzer
+        self.codes = list(analyzer.MARKET_POOL)
+        self.stub.recording.update(stub_upstream.synthetic_recording(self.codes, seed))
+
+    def fresh_store(self):
+        """換一個空倉庫 (冷啟動案例用)"""
+        import bar_store
+        root = tempfile.mkdtemp(dir=self.tmp)
+        bar_store._STORE = bar_store.BarStore(root)
+        return bar_store._STORE
+
+    def close(self):
+        self.stub.stop()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+# --- 案例 (每組 yield (名稱, 零參數函式, 每次處理的項目數, 單位)) ---
+@group("signals")
+def signals_cases(env):
+    import signal_engine
+    import synthetic_market
+    for kind in synthetic_market.KINDS:
+        for minutes in (60, synthetic_market.SESSION_MINUTES):
+            df = synthetic_market.make_session(kind, minutes, env.seed)
+            ts = df.index.asi8
+            o, h, l, c, v = (df[k].to_numpy() for k in synthetic_market.COLUMNS)
+            score = 90 if kind == 'crash' else 50
+
+            def full(ts=ts, o=o, h=h, l=l, c=c, v=v, score=score):
+                _, _, vwap = signal_engine.compute_vwap(c, v)
+                return signal_engine.evaluate_signals(ts, o, h, l, c, vwap, 100.0, score)
+            yield f"signals.vectorized/{kind}-{minutes}", full, minutes, "bars"
+
+        df = synthetic_market.make_session(kind, synthetic_market.SESSION_MINUTES, env.seed)
+        arrays = [df.index.asi8] + [df[k].to_numpy() for k in synthetic_market.COLUMNS]
+
+        def streaming(arrays=arrays, kind=kind):
+            # 逐根推進：模擬整天每分鐘一次 update
+            state = signal_engine.SignalState(kind, '1T')
+            for n in range(1, len(arrays[0]) + 1):
+                state.update(*(a[:n] for a in arrays), 100.0, 50)
+        yield f"signals.incremental/{kind}", streaming, synthetic_market.SESSION_MINUTES, "bars"
+
+@group("resample")
+def resample_cases(env):
+    import bar_pyramid
+    import synthetic_market
+    analyzer = env.analyzer
+    df = synthetic_market.make_session('trend', synthetic_market.SESSION_MINUTES, env.seed)
+    for tf in bar_pyramid.TIMEFRAMES:
+        yield f"resample.pandas/{tf}", lambda tf=tf: analyzer.resample_data(df, tf), 1, "calls"
+
+    def pyramid_session():
+        # 整天逐分鐘更新金字塔，每分鐘取一次 5 分 K
+        p = bar_pyramid.BarPyramid('bench')
+        for n in range(1, len(df) + 1):
+            p.update(df.iloc[:n]).frame('5T')
+    yield "resample.pyramid/session", pyramid_session, len(df), "bars"
+
+@group("orb")
+def orb_cases(env):
+    analyzer = env.analyzer
+    import fugle_client
+    import signal_engine
+    symbol = "2330.TW"
+
+    def orb(api_key, tf='1T'):
+        # 與 get_orb_signals 相同的兩步 (不經 st.cache_data)
+        df, source, err = analyzer.load_bars(symbol, api_key)
+        return analyzer.build_signals(symbol, df, source, err, tf, 50)
+
+    def cold(api_key):
+        env.fresh_store()
+        fugle_client.get_pool()._results.clear()
+        analyzer.get_realtime_quote_yahoo.clear()
+        signal_engine._STATES.clear()
+        return orb(api_key)
+
+    yield "get_orb_signals.cold/fugle", lambda: cold("stub-key"), 1, "calls"
+    yield "get_orb_signals.cold/yahoo", lambda: cold(None), 1, "calls"
+    env.fresh_store()
+    yield "get_orb_signals.warm/fugle-1T", lambda: orb("stub-key"), 1, "calls"
+    yield "get_orb_signals.warm/fugle-15T", lambda: orb("stub-key", '15T'), 1, "calls"
+
+@group("screen")
+def screen_cases(env):
+    analyzer = env.analyzer
+    n = len(analyzer.MARKET_POOL)
+
+    def cold():
+        env.fresh_store()
+        analyzer.screen_hot_stocks.clear()
+        return analyzer.screen_hot_stocks(limit=15)
+
+    def warm():
+        analyzer.screen_hot_stocks.clear()
+        return analyzer.screen_hot_stocks(limit=15)
+
+    yield "screen_hot_stocks.cold", cold, n, "symbols"
+    env.fresh_store()
+    yield "screen_hot_stocks.warm", warm, n, "symbols"
+
+@group("news")
+def news_cases(env):
+    if importlib.util.find_spec("httpx") is None or importlib.util.find_spec("google.generativeai") is None:
+        raise Skip("需要 httpx 與 google-generativeai")
+    import asyncio
+    import news_feed
+    import stock_heat_analyzer as heat
+    # Yahoo 新聞頁要 Chromium，沒有 --browser 時只測 HTTP 來源
+    sources = heat.NEWS_SOURCES if env.browser else [s for s in heat.NEWS_SOURCES if s.name != "Yahoo"]
+    codes = env.codes[:10]
+
+    def cold():
+        heat._NEWS = news_feed.NewsAggregator(sources)
+        return asyncio.run(heat.run_analysis(codes[0]))
+
+    def repeat():
+        return asyncio.run(heat.run_analysis(codes[0]))
+
+    def batch():
+        heat._NEWS = news_feed.NewsAggregator(sources)
+        return asyncio.run(heat.gather_news_batch(codes))
+
+    yield "run_analysis.cold", cold, 1, "calls"
+    heat._NEWS = news_feed.NewsAggregator(sources)
+    yield "run_analysis.repeat", repeat, 1, "calls"
+    yield "gather_news_batch.cold", batch, len(codes), "symbols"
+
+@group("gemini")
+def gemini_cases(env):
+    if importlib.util.find_spec("google.generativeai") is None:
+        raise Skip("需要 google-generativeai")
+    import stock_heat_analyzer as heat
+    import synthetic_market
+    news = synthetic_market.make_headlines(15, env.seed)
+    yield "analyze_with_gemini", lambda: heat.analyze_with_gemini_requests("stub-key", "2330", news), 1, "calls"
+
+@group("keyword")
+def keyword_cases(env):
+    import stock_heat_analyzer as heat
+    import synthetic_market
+    import lexicon
+    for n in (15, 1000):
+        news = synthetic_market.make_headlines(n, env.seed)
+        yield f"keyword_fallback/{n}", lambda news=news: heat.calculate_score_keyword_fallback(news), n, "headlines"
+    # 全市場備用評分：200 檔各 15 則一次評完
+    groups = [synthetic_market.make_headlines(15, env.seed + k) for k in range(200)]
+    yield "keyword_batch/200x15", lambda: lexicon.get_lexicon().score_batch(groups), 200 * 15, "headlines"
+
+# --- 執行 / 基準 ---
+def run(env, groups, repeat=DEFAULT_REPEAT, log=print):
+    """回傳 (結果, 略過的組別, 失敗的案例)；單一案例出錯只記下來，其他案例與組別照跑"""
+    results, skipped, errors = {}, {}, {}
+    for name in groups:
+        cases = GROUPS[name](env)
+        while True:
+            try:
+                case, fn, items, unit = next(cases)
+            except StopIteration:
+                break
+            except (Skip, ImportError) as e:
+                skipped[name] = str(e)
+                log(f"{name:<40} 略過: {e}")
+                break
+            except Exception as e:
+                # 準備案例時就壞了，這組後面的案例拿不到
+                errors[name] = f"{type(e).__name__}: {e}"
+                log(f"{name:<40} 失敗: {errors[name]}")
+                break
+            try:
+                r = measure(fn, repeat, items=items)
+            except Exception as e:
+                errors[case] = f"{type(e).__name__}: {e}"
+                log(f"{case:<40} 失敗: {errors[case]}")
+                continue
+            r.update(group=name, unit=unit, items=items)
+            results[case] = r
+            log(f"{case:<40} p50 {r['p50_ms']:9.3f}ms  p95 {r['p95_ms']:9.3f}ms  p99 {r['p99_ms']:9.3f}ms  "
+                f"{r['throughput']:12.1f} {unit}/s  peak {r['peak_kb']:9.1f}KB")
+    return results, skipped, errors
+
+def metadata(seed, repeat):
+    import pandas
+    return {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "numpy": np.__version__, "pandas": pandas.__version__, "machine": platform.machine(),
+            "platform": platform.platform(), "seed": seed, "repeat": repeat}
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """回傳 [(案例, 指標, 基準值, 目前值, 變化比例)]，只列出退步超過門檻的"""
+    regressions = []
+    for case, r in results.items():
+        base = baseline.get("cases", {}).get(case)
+        if base is None: continue
+        for metric in ("p50_ms", "p95_ms", "peak_kb"):
+            # p95 抖動大，門檻加倍
+            limit = threshold * (2 if metric == "p95_ms" else 1)
+            if base[metric] > 0 and r[metric] > base[metric] * (1 + limit):
+                regressions.append((case, metric, base[metric], r[metric], r[metric] / base[metric] - 1))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="離線基準測試 (合成行情 + 假上游)")
+    parser.add_argument("--only", help=f"以逗號分隔的組別 ({','.join(GROUPS)})")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--latency", type=float, default=0.0, help="假上游每個請求的固定延遲 (秒)")
+    parser.add_argument("--real-limits", action="store_true", help="保留 upstream 的限速 (預設關閉)")
+    parser.add_argument("--browser", action="store_true", help="新聞案例包含需要 Chromium 的 Yahoo 新聞頁")
+    parser.add_argument("--save", help="結果存成基準檔")
+    parser.add_argument("--compare", help="與基準檔比較")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    groups = args.only.split(",") if args.only else list(GROUPS)
+    unknown = [g for g in groups if g not in GROUPS]
+    if unknown: sys.exit(f"未知組別: {', '.join(unknown)}")
+    env = BenchEnv(args.seed, args.latency, args.real_limits, args.browser)
+    try:
+        results, skipped, errors = run(env, groups, args.repeat)
+    finally:
+        env.close()
+
+    if errors: print(f"{len(errors)} 個案例失敗: {', '.join(errors)}")
+    report = {"meta": metadata(args.seed, args.repeat), "cases": results, "skipped": skipped, "errors": errors}
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f: json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"基準已存到 {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f: baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for case, metric, base, now, change in regressions:
+            print(f"⚠️ 退步 {case} {metric}: {base:.3f} → {now:.3f} ({change:+.0%})")
+        # 基準裡有、這次卻出錯的案例也算退步
+        broken = [c for c in errors if c in baseline.get("cases", {})]
+        for case in broken: print(f"⚠️ 失敗 {case}: {errors[case]}")
+        if regressions or broken: sys.exit(1)
+        print(f"與 {args.compare} 相比沒有超過 {args.threshold:.0%} 的退步")
@@ -0,0 +1,176 @@
+import time
+import asyncio
+import threading
+from collections import deque
+import numpy as np
+from playwright.async_api import async_playwright, Error as PlaywrightError
+import async_runtime
+
+# --- 共用無頭瀏覽器池 ---
+# 整個行程只保留一個 Chromium，配上有上限、可重複使用的 context。
+# 閒置超過 idle_seconds 自動關閉，瀏覽器崩潰 (disconnected) 時下次取用自動重啟。
+# 所有 Playwright 物件都活在 async_runtime 的背景 loop 上。
+
+class BrowserPool:
+    def __init__(self, max_contexts=2, idle_seconds=120, user_agent=None, history=500):
+        self.max_contexts = max_contexts
+        self.idle_seconds = idle_seconds
+        self.user_agent = user_agent          # 可呼叫物件，每個新 context 取一次 UA
+        self._playwright = None
+        self._browser = None
+        self._free = []
+        self._sem = None
+        self._launch_lock = None
+        self._active = 0
+        self._leases = 0                      # 還在取用途中 (確認瀏覽器 → 等名額 → 開 context) 的呼叫端
+        self._last_used = time.monotonic()
+        self._reaper = None
+        self.waits = deque(maxlen=history)
+        self.loads = deque(maxlen=history)
+        self.counters = {"launches": 0, "crashes": 0, "restarts": 0, "pages": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+
+    # --- 瀏覽器生命週期 (只在背景 loop 上呼叫) ---
+    async def _ensure_browser(self):
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_contexts)
+            self._launch_lock = asyncio.Lock()
+        async with self._launch_lock:
+            if self._browser is not None and self._browser.is_connected(): return self._browser
+            if self._browser is not None:
+                self.counters["restarts"] += 1
+            self._free = []
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self._browser.on("disconnected", self._on_disconnected)
+            self.counters["launches"] += 1
+            if self._reaper is None or self._reaper.done():
+                self._reaper = asyncio.get_running_loop().create_task(self._reap_idle())
+            return self._browser
+
+    def _on_disconnected(self, browser):
+        if browser is self._browser:
+            self.counters["crashes"] += 1
+            self._browser = None
+            self._free = []
+
+    async def _reap_idle(self):
+        while True:
+            await asyncio.sleep(min(30, self.idle_seconds))
+            if self._browser is None: return
+            if self._active == 0 and self._leases == 0 and time.monotonic() - self._last_used > self.idle_seconds:
+                await self._shutdown()
+                return
+
+    async def _shutdown(self):
+        browser, self._browser, self._free = self._browser, None, []
+        if browser is not None:
+            try: await browser.close()
+            except PlaywrightError: pass
+
+    # --- 取用 context ---
+    async def _acquire(self):
+        t0 = time.perf_counter()
+        # 租約期間閒置回收不會關瀏覽器，確認瀏覽器與開 context 之間不會被收掉
+        self._leases += 1
+        try:
+            await self._ensure_browser()
+            await self._sem.acquire()
+            with self._stats_lock: self.waits.append(time.perf_counter() - t0)
+            self._active += 1
+            try:
+                if self._free: return self._free.pop()
+                return await self._new_context()
+            except Exception:
+                self._active -= 1
+                self._sem.release()
+                raise
+        finally:
+            self._leases -= 1
+
+    async def _new_context(self):
+        kwargs = {"user_agent": self.user_agent()} if self.user_agent else {}
+        for attempt in range(2):
+            # 等名額期間瀏覽器可能崩潰被換掉：用當下的那個，開 context 時剛好斷線就重啟再試一次
+            browser = await self._ensure_browser()
+            try:
+                return await browser.new_context(**kwargs)
+            except PlaywrightError:
+                if attempt or browser.is_connected(): raise
+
+    async def _release(self, context, broken):
+        self._active -= 1
+        self._last_used = time.monotonic()
+        if broken or self._browser is None or not self._browser.is_connected():
+            try: await context.close()
+            except PlaywrightError: pass
+        else:
+            self._free.append(context)
+        self._sem.release()
+
+    async def _run(self, fn, retries=1):
+        for attempt in range(retries + 1):
+            context = await self._acquire()
+            broken = False
+            page = None
+            try:
+                page = await context.new_page()
+                self.counters["pages"] += 1
+                return await fn(page)
+            except PlaywrightError:
+                # 瀏覽器崩潰時重啟後重試一次
+                broken = True
+                self.counters["errors"] += 1
+                if attempt < retries and (self._browser is None or not self._browser.is_connected()):
+                    continue
+                raise
+            finally:
+                if page is not None:
+                    try: await page.close()
+                    except PlaywrightError: broken = True
+                await self._release(context, broken)
+
+    async def run(self, fn):
+        """fn(page) 是 coroutine function；在共用瀏覽器的一個 page 上執行並回傳結果"""
+        return await async_runtime.run_on_loop(self._run(fn))
+
+    async def goto(self, page, url, **kwargs):
+        """page.goto 並記錄載入耗時"""
+        t0 = time.perf_counter()
+        try:
+            return await page.goto(url, **kwargs)
+        finally:
+            with self._stats_lock: self.loads.append(time.perf_counter() - t0)
+
+    def start(self):
+        """先把瀏覽器開起來 (warm-up 用)"""
+        async_runtime.submit(self._ensure_browser()).result(timeout=60)
+        return self
+
+    def close(self):
+        if self._browser is not None:
+            async_runtime.submit(self._shutdown()).result(timeout=10)
+
+    def snapshot_stats(self):
+        with self._stats_lock:
+            waits, loads = np.array(self.waits), np.array(self.loads)
+        pct = lambda a, q: float(np.percentile(a, q) * 1000) if len(a) else 0.0
+        return {
+            **self.counters,
+            "alive": self._browser is not None,
+            "active": self._active,
+            "idle_contexts": len(self._free),
+            "wait_p50_ms": pct(waits, 50), "wait_p95_ms": pct(waits, 95),
+            "load_p50_ms": pct(loads, 50), "load_p95_ms": pct(loads, 95),
+        }
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def get_pool(**kwargs):
+    """行程層級單例 (第一次呼叫的參數生效)"""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None: _POOL = BrowserPool(**kwargs)
+        return _POOL
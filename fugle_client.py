@@ -0,0 +1,121 @@
+import os
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from fugle_marketdata import RestClient
+import upstream
+
+# --- 富果連線池：整個行程共用 ---
+# 1. 每把 key 只建一次 RestClient (用來解析 base_url 版本)，HTTP 走共用 Session 保持長連線
+# 2. 同一 tick 內對同一 (代號, 週期) 的請求合併成一次上游呼叫 (single-flight)
+# 3. 統計上游呼叫與快取命中次數，富果限流是主要瓶頸
+# 4. 實際打上游經過 upstream 閘道 (限速、429/5xx 退避重試、斷路)
+# FUGLE_REST_URL 可指向 stub_upstream.py 的本地假伺服器做離線基準測試。
+
+FUGLE_REST_URL = os.environ.get("FUGLE_REST_URL")
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class FuglePool:
+    def __init__(self, tick_seconds=4, pool_size=16, timeout=5):
+        self.tick_seconds = tick_seconds
+        self.timeout = timeout
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._base_urls = {}
+        self._results = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {"upstream_calls": 0, "cache_hits": 0, "coalesced": 0, "errors": 0}
+
+    def _base_url(self, api_key):
+        if api_key not in self._base_urls:
+            self._base_urls[api_key] = FUGLE_REST_URL or RestClient(api_key=api_key).stock.base_url
+        return self._base_urls[api_key]
+
+    def _get(self, api_key, path, **params):
+        url = f"{self._base_url(api_key)}/{path}"
+        res = self._session.get(url, params=params, headers={"X-API-KEY": api_key}, timeout=self.timeout)
+        if res.status_code >= 400:
+            try: message = res.json().get('message', f"HTTP {res.status_code}")
+            except ValueError: message = f"HTTP {res.status_code}"
+            raise upstream.UpstreamError(f"HTTP {res.status_code}: {message}", status=res.status_code)
+        return res.json()
+
+    def leader_budget(self):
+        """帶頭請求最久要多久：每次嘗試的連線逾時 + 閘道各次退避上限，再留一個 tick 給排隊等 token"""
+        p = upstream.get("fugle")
+        backoff = sum(min(p.max_delay, p.base_delay * 2 ** a) for a in range(p.max_retries))
+        return (p.max_retries + 1) * self.timeout + backoff + self.tick_seconds
+
+    def _single_flight(self, key, fetch):
+        """同 key 在 tick_seconds 內只打一次上游，其餘等待共用結果"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._results.get(key)
+            if cached and now - cached[0] < self.tick_seconds:
+                self.stats["cache_hits"] += 1
+                return cached[1]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.stats["upstream_calls"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            # 帶頭的還在重試/退避就繼續等；真的等不到要報錯，不能回 None 讓呼叫端當成沒資料
+            if not flight.done.wait(self.leader_budget()):
+                raise TimeoutError(f"等待同一請求逾時 ({key[2]})")
+            if flight.error: raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fetch()
+            with self._lock:
+                now = time.monotonic()
+                # 過了 tick 的結果不會再被用到，順手清掉，免得每個 (代號, 週期) 常駐
+                for k in [k for k, (t, _) in self._results.items() if now - t >= self.tick_seconds]:
+                    del self._results[k]
+                self._results[key] = (now, flight.result)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            with self._lock: self.stats["errors"] += 1
+            raise
+        finally:
+            with self._lock: self._inflight.pop(key, None)
+            flight.done.set()
+
+    def candles(self, api_key, symbol, timeframe='1'):
+        key = api_key.strip()
+        params = {} if timeframe == '1' else {"timeframe": timeframe}
+        return self._single_flight(
+            ("candles", key, symbol, timeframe),
+            lambda: upstream.call("fugle", self._get, key, f"intraday/candles/{symbol}", **params)
+        )
+
+    def snapshot_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        total = stats["upstream_calls"] + stats["cache_hits"] + stats["coalesced"]
+        stats["hit_rate"] = (stats["cache_hits"] + stats["coalesced"]) / total if total else 0.0
+        return stats
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def get_pool():
+    """行程層級單例，所有 Streamlit session 共用"""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None: _POOL = FuglePool()
+        return _POOL
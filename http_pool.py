@@ -0,0 +1,88 @@
+import time
+import json
+import threading
+import importlib.util
+from collections import deque
+import numpy as np
+import httpx
+import async_runtime
+
+# --- 共用非同步 HTTP 連線池 ---
+# 一個行程一個 httpx.AsyncClient (keep-alive，伺服器支援時走 HTTP/2)，
+# 跟 browser_pool 一樣活在 async_runtime 的背景 loop 上，RSS / JSON 來源不需要開瀏覽器。
+
+HAS_HTTP2 = importlib.util.find_spec("h2") is not None
+
+class HttpPool:
+    def __init__(self, max_connections=20, max_keepalive=10, timeout=10, http2=True, history=500):
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.timeout = timeout
+        self.http2 = http2 and HAS_HTTP2
+        self._client = None
+        self.latencies = deque(maxlen=history)
+        self.counters = {"requests": 0, "http2": 0, "errors": 0, "bytes": 0, "not_modified": 0}
+        self._stats_lock = threading.Lock()
+
+    def _get_client(self):
+        """只在背景 loop 上呼叫"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=self.http2, timeout=self.timeout, follow_redirects=True,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_keepalive))
+        return self._client
+
+    def _record(self, t0, response=None, error=False):
+        with self._stats_lock:
+            self.latencies.append(time.perf_counter() - t0)
+            self.counters["requests"] += 1
+            if error: self.counters["errors"] += 1
+            if response is not None and response.http_version == "HTTP/2": self.counters["http2"] += 1
+
+    async def _stream(self, url, consume, headers, timeout):
+        t0 = time.perf_counter()
+        response = None
+        try:
+            async with self._get_client().stream("GET", url, headers=headers, timeout=timeout or self.timeout) as response:
+                # 條件請求的 304 交給 consume 處理 (沿用呼叫端的快取)
+                if response.status_code == 304:
+                    with self._stats_lock: self.counters["not_modified"] += 1
+                else:
+                    response.raise_for_status()
+                result = await consume(response)
+                with self._stats_lock: self.counters["bytes"] += response.num_bytes_downloaded
+        except Exception:
+            self._record(t0, response, error=True)
+            raise
+        self._record(t0, response)
+        return result
+
+    async def stream(self, url, consume, headers=None, timeout=None):
+        """consume(response) 是 coroutine function，邊下載邊處理 (可提早 return 結束下載)"""
+        return await async_runtime.run_on_loop(self._stream(url, consume, headers, timeout))
+
+    async def get_json(self, url, headers=None, timeout=None):
+        async def read(response):
+            return json.loads(await response.aread())
+        return await self.stream(url, read, headers, timeout)
+
+    def close(self):
+        if self._client is not None:
+            async_runtime.submit(self._client.aclose()).result(timeout=10)
+
+    def snapshot_stats(self):
+        with self._stats_lock:
+            lat = np.array(self.latencies)
+            counters = dict(self.counters)
+        pct = lambda q: float(np.percentile(lat, q) * 1000) if len(lat) else 0.0
+        return {**counters, "http2_enabled": self.http2, "p50_ms": pct(50), "p95_ms": pct(95)}
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def get_pool(**kwargs):
+    """行程層級單例 (第一次呼叫的參數生效)"""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None: _POOL = HttpPool(**kwargs)
+        return _POOL
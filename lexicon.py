@@ -0,0 +1,169 @@
+import os
+import re
+import json
+import threading
+
+# --- 關鍵字情緒詞庫 (Gemini 不可用或大批評分時的備用) ---
+# 詞庫只編譯一次：所有詞、"否定詞+詞" 組合與例外詞排成前綴樹，轉成一個 regex (同一位置自然取最長的詞)，
+# 掃過的字不再重複計分 ("外資賣超" 不會再算一次 "賣")；"不看好"、"未能獲利" 的分數乘上 negation_factor，
+# "不斷"、"未來" 這類例外詞本身也是一個 token，會把後面的字吃掉，不算否定。英數詞 (如 AI) 以整個字比對，不分大小寫。
+# 同一則新聞同一個詞只算一次。大批評分時所有標題接成一個字串，一次 findall 掃完。
+# 詞庫可從 JSON 檔載入 (LEXICON_PATH，或 python lexicon.py --dump 匯出預設值來改)，不必改程式。
+
+LEXICON_PATH = os.environ.get("LEXICON_PATH")
+SEP = "\n"     # 批次接字串用的分隔字元
+
+DEFAULT_TERMS = {
+    # 偏多
+    "漲停": 8, "大漲": 8, "創高": 8, "攻頂": 6, "飆": 6, "強勢": 5, "利多": 5, "買超": 5, "外資買超": 6,
+    "上漲": 5, "翻紅": 5, "受惠": 5, "看好": 5, "驚艷": 5, "擴產": 5, "獲利": 4, "成長": 4, "旺": 3, "AI": 3,
+    # 偏空
+    "跌停": -8, "大跌": -8, "重挫": -8, "崩": -7, "利空": -5, "示警": -5, "虧損": -6, "衰退": -5, "外資賣超": -6,
+    "外資賣": -5, "下跌": -5, "翻黑": -5, "疲軟": -5, "縮減": -4, "砍": -4, "賣": -3, "修正": -3, "觀望": -2, "保守": -2,
+}
+# 否定詞需緊接在詞前；兩個字的否定 ("未能"、"不會") 直接列進來
+DEFAULT_NEGATIONS = ("不", "未", "未能", "沒", "沒有", "沒能", "不會", "不再", "無法", "難以", "並非")
+DEFAULT_NEGATION_EXCEPTIONS = ("不斷", "不少", "不僅", "不但", "不過", "未來", "沒想到")
+
+def _trie_regex(words, extra=()):
+    """字串集合 → 前綴樹形狀的 regex；有詞在此結束的節點後面接 (...)?，貪婪匹配即最長匹配。
+    extra 是額外放在根節點的分支；每個分支都要以固定字元開頭，re 才能依首字快速跳過不可能的位置"""
+    trie = {}
+    for w in words:
+        node = trie
+        for ch in w: node = node.setdefault(ch, {})
+        node[""] = True
+
+    def alts(node):
+        return [re.escape(ch) + build(sub) for ch, sub in sorted(node.items()) if ch]
+
+    def build(node):
+        branches = alts(node)
+        if not branches: return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+    return "|".join(alts(trie) + list(extra))
+
+class Lexicon:
+    def __init__(self, terms=None, negations=DEFAULT_NEGATIONS, negation_exceptions=DEFAULT_NEGATION_EXCEPTIONS,
+                 negation_factor=-1.0, base=50, lo=0, hi=100):
+        self.terms = dict(DEFAULT_TERMS if terms is None else terms)
+        self.negations = tuple(negations)
+        self.negation_exceptions = tuple(negation_exceptions)
+        self.negation_factor = float(negation_factor)
+        self.base, self.lo, self.hi = base, lo, hi
+        self._compile()
+
+    def _compile(self):
+        # token (大寫) → (詞, 是否否定, 權重)；例外詞對應 None
+        kinds = {}
+        cjk = [t for t in self.terms if t and not t.isascii()]
+        for n in self.negations:
+            for t in cjk: kinds[(n + t).upper()] = (t, True, self.terms[t] * self.negation_factor)
+        for e in self.negation_exceptions: kinds[e.upper()] = None
+        for t, w in self.terms.items():
+            if t: kinds[t.upper()] = (t, False, float(w))
+        self._kinds = kinds
+        # 中文走前綴樹；英數詞以整個字為 token (首字母之後才檢查左邊界，分支仍以固定字元開頭)
+        literals = [k for k in kinds if not k.isascii()] + [SEP]
+        heads = sorted({k[0] for k in kinds if k.isascii() and k[:1].isalnum()})
+        words = [f"{re.escape(c)}(?<![A-Z0-9]{re.escape(c)})[A-Z0-9]*" for c in heads]
+        self.pattern = re.compile(_trie_regex(literals, words))
+
+    # --- 檔案 ---
+    def to_dict(self):
+        return {"base": self.base, "lo": self.lo, "hi": self.hi, "terms": self.terms,
+                "negations": list(self.negations), "negation_exceptions": list(self.negation_exceptions),
+                "negation_factor": self.negation_factor}
+
+    @classmethod
+    def from_dict(cls, data):
+        """沒寫到的欄位用預設值"""
+        keys = ("terms", "negations", "negation_exceptions", "negation_factor", "base", "lo", "hi")
+        return cls(**{k: data[k] for k in keys if k in data})
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f: return cls.from_dict(json.load(f))
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f: json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    # --- 評分 ---
+    def _tokens(self, text):
+        return self.pattern.findall(text.upper())
+
+    def matches(self, text):
+        """[(詞, 權重, 是否被否定)]，調詞庫時看命中了什麼"""
+        hits = (self._kinds.get(tok) for tok in self._tokens(text.replace(SEP, " ")))
+        return [(t, w, negated) for t, negated, w in filter(None, hits)]
+
+    def text_scores(self, texts):
+        """每段文字的加減分 (不含基準分)；整批接成一個字串只跑一次 regex"""
+        if not texts: return []
+        kinds = self._kinds
+        scores, cur, seen = [], 0.0, set()
+        for tok in self._tokens(SEP.join(t.replace(SEP, " ") for t in texts)):
+            if tok == SEP:
+                scores.append(cur)
+                cur = 0.0
+                seen.clear()
+                continue
+            hit = kinds.get(tok)
+            if hit is None or hit in seen: continue
+            seen.add(hit)
+            cur += hit[2]
+        scores.append(cur)
+        return scores
+
+    def _clamp(self, raw):
+        return int(max(self.lo, min(self.hi, round(self.base + raw))))
+
+    def score(self, news_list):
+        """一檔的新聞 list → 0~100 分；沒有新聞給基準分"""
+        return self.score_batch([news_list])[0]
+
+    def score_batch(self, news_lists):
+        """多檔一起評分：[[新聞, ...], ...] → [分數, ...]，所有標題一次掃完"""
+        owners, texts = [], []
+        for k, news in enumerate(news_lists):
+            for n in news or ():
+                owners.append(k)
+                texts.append(news_text(n))
+        raw = [0.0] * len(news_lists)
+        for k, s in zip(owners, self.text_scores(texts)): raw[k] += s
+        return [self._clamp(r) for r in raw]
+
+def news_text(n):
+    return n.get('title', '') + str(n.get('snippet', ''))
+
+_LEXICON = None
+_LEXICON_LOCK = threading.Lock()
+
+def get_lexicon():
+    """行程層級單例：有 LEXICON_PATH 就從檔案載入，否則用內建詞庫"""
+    global _LEXICON
+    with _LEXICON_LOCK:
+        if _LEXICON is None: _LEXICON = Lexicon.load(LEXICON_PATH) if LEXICON_PATH else Lexicon()
+        return _LEXICON
+
+def reload_lexicon(path=None):
+    """改完詞庫檔後重新載入 (不必重啟)"""
+    global _LEXICON
+    lex = Lexicon.load(path or LEXICON_PATH) if (path or LEXICON_PATH) else Lexicon()
+    with _LEXICON_LOCK: _LEXICON = lex
+    return lex
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="關鍵字情緒詞庫")
+    parser.add_argument("texts", nargs="*", help="要試評的標題")
+    parser.add_argument("--lexicon", help="詞庫 JSON (預設 LEXICON_PATH 或內建)")
+    parser.add_argument("--dump", help="把目前詞庫寫成 JSON 檔，之後改這個檔即可")
+    args = parser.parse_args()
+    lex = Lexicon.load(args.lexicon) if args.lexicon else get_lexicon()
+    if args.dump:
+        lex.save(args.dump)
+        print(f"已寫入 {args.dump} ({len(lex.terms)} 個詞)")
+    for text in args.texts:
+        print(f"{lex.score([{'title': text}]):>3}  {text}  {lex.matches(text)}")
@@ -0,0 +1,86 @@
+import time
+import threading
+from dataclasses import dataclass, field
+from types import MappingProxyType
+import bar_store
+import watchlist
+
+# --- 背景行情輪詢：抓資料跟 Streamlit rerun 脫鉤 ---
+# 背景執行緒依自己的節奏呼叫 WatchlistScheduler.tick()，每輪發布一份不可變快照；
+# 畫面只讀最新快照，rerun 與使用者操作都不會卡在網路上。
+
+IN_SESSION_INTERVAL = 5     # 盤中每 5 秒一輪
+OFF_SESSION_INTERVAL = 60   # 盤後資料不會變，放慢
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: int = 0
+    taken_at: float = 0.0
+    tick_ms: float = 0.0
+    rows: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))      # (symbol, timeframe, 策略) -> 表格列
+    results: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))   # (symbol, timeframe, 策略) -> SignalResult
+
+    def get(self, symbol, timeframe='1T', sentiment=None):
+        """用這個 AI 分數對應的策略算出的 SignalResult (不可變，直接共用)，沒有則 None"""
+        return self.results.get((symbol, timeframe, watchlist.mode_of(sentiment)))
+
+    def has_bars(self, symbol):
+        """快照裡有沒有這檔任何週期/策略的結果 (代表倉庫裡 1 分 K 是新的)"""
+        return any(k[0] == symbol for k in self.results)
+
+    def table(self, symbols, timeframe='1T', sentiments=None):
+        keys = [(s, timeframe, watchlist.mode_of(sentiments.get(s) if sentiments else None)) for s in symbols]
+        return [self.rows[k] for k in keys if k in self.rows]
+
+    @property
+    def age(self):
+        return time.time() - self.taken_at if self.taken_at else float('inf')
+
+class MarketPoller:
+    def __init__(self, scheduler, in_session_interval=IN_SESSION_INTERVAL, off_session_interval=OFF_SESSION_INTERVAL):
+        self.scheduler = scheduler
+        self.in_session_interval = in_session_interval
+        self.off_session_interval = off_session_interval
+        self._snapshot = Snapshot()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.errors = 0
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="market-poller", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def watch(self, symbols, sentiments=None, timeframe=None):
+        """登記代號與週期；有新代號、新週期或新策略就提早跑下一輪"""
+        if self.scheduler.watch(symbols, sentiments, timeframe): self._wake.set()
+
+    def latest(self):
+        return self._snapshot
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            if self.scheduler.symbols():
+                try:
+                    self.scheduler.tick()
+                    self._publish()
+                except Exception:
+                    self.errors += 1
+            interval = self.in_session_interval if bar_store.in_session() else self.off_session_interval
+            self._wake.wait(interval)
+
+    def _publish(self):
+        s = self.scheduler
+        self._snapshot = Snapshot(
+            version=self._snapshot.version + 1, taken_at=time.time(), tick_ms=s.stats["last_tick_ms"],
+            rows=MappingProxyType({k: MappingProxyType(dict(v)) for k, v in s.rows.items()}),
+            results=MappingProxyType(s.results()),
+        )
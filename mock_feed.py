@@ -0,0 +1,101 @@
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import pandas as pd
+from websockets.asyncio.server import serve
+
+# --- 本地行情回放伺服器 (模擬富果 WebSocket) ---
+# 用法：
+#   python mock_feed.py ticks.jsonl --speed 60        回放 StreamIngest(record_path=...) 錄下的訊息
+#   python mock_feed.py --synthetic 2330,2317          產生隨機漫步成交
+# 再以 FUGLE_WS_URL=ws://127.0.0.1:8765/marketdata 啟動 app 或 StreamIngest。
+
+def load_recording(path):
+    """只取逐筆成交的 data 訊息"""
+    messages = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line: continue
+            try: msg = json.loads(line)
+            except ValueError: continue
+            if msg.get("event") == "data" and msg.get("channel") == "trades":
+                messages.append(msg)
+    messages.sort(key=lambda m: m["data"]["time"])
+    return messages
+
+def synthetic_ticks(symbols, minutes=270, trades_per_minute=20, seed=0):
+    """從今天 09:00 開始的隨機漫步成交，格式與富果 trades 頻道相同"""
+    rng = random.Random(seed)
+    start = pd.Timestamp.now(tz="Asia/Taipei").normalize() + pd.Timedelta(hours=9)
+    start_us = start.value // 1000
+    prices = {s: 100.0 + rng.random() * 500 for s in symbols}
+    messages, serial = [], 0
+    for i in range(minutes * trades_per_minute):
+        t = start_us + int(i * 60_000_000 / trades_per_minute)
+        for s in symbols:
+            prices[s] = round(prices[s] * (1 + rng.gauss(0, 0.0015)), 2)
+            serial += 1
+            messages.append({"event": "data", "channel": "trades", "id": f"mock-{s}",
+                             "data": {"symbol": s, "type": "EQUITY", "price": prices[s],
+                                      "size": rng.randint(1, 20), "time": t, "serial": serial}})
+    return messages
+
+class MockFeed:
+    def __init__(self, messages, speed=1.0):
+        self.messages = messages
+        self.speed = speed
+
+    async def handler(self, ws):
+        subscribed = set()
+        replay = None
+        try:
+            async for raw in ws:
+                msg = json.loads(raw)
+                event = msg.get("event")
+                data = msg.get("data") or {}
+                if event == "auth":
+                    await ws.send(json.dumps({"event": "authenticated", "data": {"message": "Authenticated successfully"}}))
+                elif event == "subscribe":
+                    symbols = data.get("symbols") or [data.get("symbol")]
+                    for s in symbols:
+                        subscribed.add(s)
+                        await ws.send(json.dumps({"event": "subscribed", "data": {"id": f"mock-{s}", "channel": data.get("channel"), "symbol": s}}))
+                    if replay is None: replay = asyncio.create_task(self.replay(ws, subscribed))
+                elif event == "ping":
+                    await ws.send(json.dumps({"event": "pong", "data": {"time": int(time.time() * 1e6), "state": data.get("state", "")}}))
+        finally:
+            if replay: replay.cancel()
+
+    async def replay(self, ws, subscribed):
+        """依錄製時間差 / speed 送出訊息"""
+        prev = None
+        for msg in self.messages:
+            t = msg["data"]["time"]
+            if prev is not None and self.speed > 0:
+                await asyncio.sleep((t - prev) / 1e6 / self.speed)
+            prev = t
+            if msg["data"]["symbol"] in subscribed:
+                await ws.send(json.dumps(msg))
+
+async def run_server(messages, host="127.0.0.1", port=8765, speed=1.0):
+    feed = MockFeed(messages, speed)
+    async with serve(feed.handler, host, port):
+        print(f"mock feed: ws://{host}:{port}/marketdata  ({len(messages)} 筆成交, speed x{speed})")
+        await asyncio.Future()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="富果 WebSocket 本地回放伺服器")
+    parser.add_argument("recording", nargs="?", help="StreamIngest 錄下的 JSONL")
+    parser.add_argument("--synthetic", help="以逗號分隔的代號，產生隨機成交")
+    parser.add_argument("--speed", type=float, default=60.0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    if args.recording: msgs = load_recording(args.recording)
+    elif args.synthetic: msgs = synthetic_ticks(args.synthetic.split(","))
+    else: sys.exit("需要錄製檔或 --synthetic")
+    asyncio.run(run_server(msgs, args.host, args.port, args.speed))
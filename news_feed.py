@@ -0,0 +1,173 @@
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import async_runtime
+
+# --- 新聞聚合：各來源各自快取，先完成的先交付 ---
+# 每個 (來源, 代號) 一筆快取，各來源有自己的 TTL；過期才重抓，HTTP 來源帶 ETag / If-Modified-Since 做條件請求。
+# 抓取一律丟到 async_runtime 的背景 loop：超過整體期限就先拿已到的新聞開始評分，
+# 還沒回來的來源繼續在背景跑完並寫進快取，下一次分析直接命中。
+# 哪些來源趕得上期限每次不同：傳入 status dict 會填 complete (所有來源都交付了新的內容)
+# 與 delivered ({來源: 未去重的新聞}，只含準時交付的來源)，情緒快取依此逐來源比對指紋。
+
+DEADLINE_SECONDS = 4.0
+MAX_ENTRIES = 2000
+NOT_MODIFIED = object()   # 來源回 304 時 fetch 回傳這個，沿用快取內容
+
+@dataclass(frozen=True)
+class NewsSource:
+    """fetch(code, validators) 是 coroutine function，回傳 (新聞 list 或 NOT_MODIFIED, 新的 validators)"""
+    name: str
+    fetch: object
+    ttl: float = 300
+
+@dataclass
+class Entry:
+    items: list
+    fetched_at: float
+    validators: dict = field(default_factory=dict)   # {'etag', 'last_modified'}
+
+def news_key(n):
+    """與 sentiment_cache.news_fingerprint 相同：連結優先，沒有連結用標題"""
+    return n.get('link') or n.get('title', '')
+
+class NewsAggregator:
+    def __init__(self, sources, deadline=DEADLINE_SECONDS, max_entries=MAX_ENTRIES):
+        self.sources = list(sources)
+        self.deadline = deadline
+        self.max_entries = max_entries
+        self._cache = OrderedDict()   # (來源, 代號) -> Entry，最久沒用的在前面
+        self._inflight = {}           # (來源, 代號) -> concurrent.futures.Future
+        self._lock = threading.Lock()
+        self.stats = {"fresh": 0, "fetched": 0, "not_modified": 0, "stale": 0, "errors": 0, "late": 0, "duplicates": 0}
+
+    def _count(self, key):
+        # 各來源在背景 loop 與呼叫端執行緒同時回來，計數一律在鎖內加
+        with self._lock: self.stats[key] += 1
+
+    # --- 快取 ---
+    def _fresh(self, source, code):
+        with self._lock:
+            entry = self._cache.get((source.name, code))
+            if entry is None or time.time() - entry.fetched_at > source.ttl: return None
+            self._cache.move_to_end((source.name, code))
+            return entry
+
+    def cached(self, source_name, code):
+        """不論新舊，快取中最近一次的新聞 (沒有則 None)"""
+        with self._lock:
+            entry = self._cache.get((source_name, code))
+            return list(entry.items) if entry else None
+
+    def _put(self, source, code, entry):
+        with self._lock:
+            self._cache[(source.name, code)] = entry
+            self._cache.move_to_end((source.name, code))
+            while len(self._cache) > self.max_entries: self._cache.popitem(last=False)
+
+    # --- 抓取 (背景 loop) ---
+    async def _refresh(self, source, code):
+        key = (source.name, code)
+        with self._lock:
+            old = self._cache.get(key)
+        try:
+            items, validators = await source.fetch(code, dict(old.validators) if old else {})
+        except Exception:
+            self._count("errors")
+            raise
+        if items is NOT_MODIFIED:
+            self._count("not_modified")
+            items = old.items if old else []
+        else:
+            self._count("fetched")
+        entry = Entry(list(items), time.time(), {k: v for k, v in (validators or {}).items() if v})
+        self._put(source, code, entry)
+        return entry
+
+    def _start(self, source, code):
+        """同一 (來源, 代號) 同時只抓一次，後到的呼叫端共用同一個 future"""
+        key = (source.name, code)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._inflight[key] = async_runtime.submit(self._refresh(source, code))
+                future.add_done_callback(lambda f, key=key: self._done(key, f))
+            return future
+
+    def _done(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future: del self._inflight[key]
+
+    # --- 交付 ---
+    async def stream(self, code, deadline=None, status=None):
+        """依完成先後 yield (來源名稱, 新聞 list)，已交付過的連結不再重複；超過 deadline 秒就結束。
+        status 給 dict 時填入 complete (有來源逾時或失敗改用舊快取就是 False) 與 delivered"""
+        status = {} if status is None else status
+        status["complete"] = True
+        delivered = status["delivered"] = {}
+        loop = asyncio.get_running_loop()
+        done = asyncio.Queue()
+        seen = set()
+        pending = {}
+
+        def dedup(items):
+            fresh = []
+            for n in items:
+                k = news_key(n)
+                if k in seen:
+                    self._count("duplicates")
+                    continue
+                seen.add(k)
+                fresh.append(n)
+            return fresh
+
+        def notify(name, future):
+            # 呼叫端的 loop 可能已經結束 (逾時返回)，背景抓取照樣寫進快取
+            try: loop.call_soon_threadsafe(done.put_nowait, (name, future))
+            except RuntimeError: pass
+
+        for source in self.sources:
+            entry = self._fresh(source, code)
+            if entry is not None:
+                self._count("fresh")
+                delivered[source.name] = entry.items
+                yield source.name, dedup(entry.items)
+                continue
+            pending[source.name] = source
+            self._start(source, code).add_done_callback(lambda f, name=source.name: notify(name, f))
+
+        end = loop.time() + (self.deadline if deadline is None else deadline)
+        while pending:
+            try:
+                name, future = await asyncio.wait_for(done.get(), max(0.0, end - loop.time()))
+            except asyncio.TimeoutError:
+                break
+            if name not in pending: continue
+            del pending[name]
+            if future.cancelled() or future.exception() is not None:
+                status["complete"] = False
+                stale = self.cached(name, code)
+                if stale: self._count("stale")
+                yield name, dedup(stale or [])
+            else:
+                delivered[name] = future.result().items
+                yield name, dedup(delivered[name])
+
+        # 逾時：還沒回來的來源先用舊快取頂著
+        if pending: status["complete"] = False
+        for name in pending:
+            self._count("late")
+            stale = self.cached(name, code)
+            if stale:
+                self._count("stale")
+                yield name, dedup(stale)
+
+    async def collect(self, code, deadline=None, status=None):
+        """{來源名稱: 新聞 list}，期限內到的才算"""
+        return {name: items async for name, items in self.stream(code, deadline, status)}
+
+    def snapshot_stats(self):
+        with self._lock:
+            return {**self.stats, "entries": len(self._cache), "inflight": len(self._inflight)}
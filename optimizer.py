@@ -0,0 +1,196 @@
+import argparse
+import itertools
+from dataclasses import fields, asdict
+import numpy as np
+import pandas as pd
+import bar_store
+import backtester
+from signal_engine import StrategyParams, DEFAULT_PARAMS
+
+# --- 參數掃描：整個參數網格一次廣播到 (參數 × 交易日 × K 棒) 陣列上計算 ---
+# 每個 (代號, 交易日) 是面板的一列，不足的 K 棒補 NaN。
+# 與 backtester 相同的逐根重播語意 (收盤前未出場以最後一根平倉)。
+# knife_sentiment 取決於當下 AI 分數，沒有歷史資料可掃，固定為預設值。
+
+SWEEP_FIELDS = [f.name for f in fields(StrategyParams) if f.name != 'knife_sentiment']
+METRICS = ['total_pnl_pct', 'avg_pnl_pct', 'win_rate', 'trades']
+
+def load_panel(symbols, root=None, last_n_days=None):
+    """從本地倉庫組出 (代號-交易日 × 分鐘) 的 NaN 補齊面板"""
+    store = bar_store.BarStore(root or bar_store.BAR_STORE_DIR)
+    rows, labels, prev_closes = [], [], []
+    for symbol in symbols:
+        key = backtester.store_key(store, symbol)
+        if key is None: continue
+        daily_prev = backtester.prev_close_lookup(store, symbol)
+        days = store.intraday_days(key)
+        last_close = None
+        for i, day in enumerate(days):
+            ts, ohlcv = store.read_intraday_arrays(key, day)
+            if len(ts) == 0: continue
+            prev = daily_prev(day) or last_close or float(ohlcv[0, 0])
+            last_close = float(ohlcv[-1, 3])
+            if last_n_days and i < len(days) - last_n_days: continue
+            rows.append(np.asarray(ohlcv))
+            labels.append((symbol, day))
+            prev_closes.append(prev)
+    if not rows: return None
+    T = max(len(r) for r in rows)
+    data = np.full((5, len(rows), T), np.nan)
+    n_bars = np.array([len(r) for r in rows])
+    for d, r in enumerate(rows): data[:, d, :len(r)] = r.T
+    return {"open": data[0], "high": data[1], "low": data[2], "close": data[3], "volume": data[4],
+            "n_bars": n_bars, "prev_close": np.array(prev_closes), "labels": labels}
+
+def make_grid(**axes):
+    """make_grid(max_dev=[...], take_profit=[...]) → 每個欄位一個 (P,) 陣列，未指定的用預設值"""
+    names = [k for k in SWEEP_FIELDS if k in axes]
+    unknown = set(axes) - set(SWEEP_FIELDS)
+    if unknown: raise ValueError(f"未知參數: {sorted(unknown)}")
+    combos = list(itertools.product(*[axes[k] for k in names])) or [()]
+    grid = {k: np.full(len(combos), getattr(DEFAULT_PARAMS, k), dtype=float) for k in SWEEP_FIELDS}
+    for j, k in enumerate(names):
+        grid[k] = np.array([c[j] for c in combos], dtype=float)
+    return grid
+
+def _first_true(mask):
+    """沿最後一軸找第一個 True，回傳 (位置, 是否存在)"""
+    idx = mask.argmax(axis=-1)
+    found = np.take_along_axis(mask, idx[..., None], axis=-1)[..., 0]
+    return idx, found
+
+def _prepare(panel):
+    """與參數無關的部分只算一次：VWAP、滾動高點、最大乖離"""
+    o, h, l, c, v = (panel[k] for k in ("open", "high", "low", "close", "volume"))
+    t = np.arange(c.shape[1])
+    in_day = t[None, :] < panel["n_bars"][:, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vwap = np.cumsum(c * v, axis=1) / np.cumsum(v, axis=1)
+        valid = ~np.isnan(vwap) & in_day
+        dev = (c - vwap) / vwap
+    zeros = np.zeros((c.shape[0], 1))
+    high_h = np.fmax.accumulate(np.concatenate([zeros, np.where(valid, h, 0.0)], axis=1), axis=1)[:, 1:]
+    max_dev = np.fmax.accumulate(np.concatenate([zeros, np.where(valid, dev, 0.0)], axis=1), axis=1)[:, 1:]
+    with np.errstate(invalid='ignore'):
+        base = valid & (high_h > 0) & (c > o) & (c >= vwap)
+    return {"vwap": vwap, "high_h": high_h, "max_dev": max_dev, "base": base, "in_day": in_day, "t": t}
+
+def _evaluate_chunk(panel, prep, g, strategy):
+    """g 中每個欄位是 (Pc,) 陣列；回傳每個 (參數, 交易日) 的報酬 % (無交易為 NaN)"""
+    h, l, c = panel["high"], panel["low"], panel["close"]
+    col = lambda k: g[k][:, None, None]
+    with np.errstate(invalid='ignore'):
+        if strategy == 'knife':
+            pc = panel["prev_close"][:, None]
+            change = (c - pc) / pc
+            entry_mask = prep["in_day"][None] & (change[None] <= col('knife_trigger'))
+        else:
+            entry_mask = (prep["base"][None]
+                          & (prep["max_dev"][None] >= col('max_dev'))
+                          & (c[None] < prep["high_h"][None] * col('pullback'))
+                          & (l[None] <= prep["vwap"][None] * col('vwap_proximity')))
+    entry_idx, has_entry = _first_true(entry_mask)                        # (Pc, D)
+    D = c.shape[0]
+    rows = np.arange(D)[None, :]
+    entry_price = c[rows, entry_idx]
+    take = entry_price * g['take_profit'][:, None]
+    stop = entry_price * g['stop_loss'][:, None]
+    with np.errstate(invalid='ignore'):
+        after = prep["t"][None, None, :] > entry_idx[..., None]
+        hit = after & prep["in_day"][None] & ((h[None] >= take[..., None]) | (l[None] <= stop[..., None]))
+    exit_idx, has_exit = _first_true(hit)
+    exit_price = np.where(h[rows, exit_idx] >= take, take, stop)
+    eod_price = c[np.arange(D), panel["n_bars"] - 1][None, :]
+    exit_price = np.where(has_exit, exit_price, eod_price)
+    pnl = (exit_price - entry_price) / entry_price * 100
+    return np.where(has_entry, pnl, np.nan)
+
+def sweep_pnl(panel, grid, strategy='vwap', max_elements=30_000_000):
+    """整個網格的 (P, D) 報酬矩陣，依記憶體上限切塊批次計算"""
+    prep = _prepare(panel)
+    P = len(next(iter(grid.values())))
+    D, T = panel["close"].shape
+    step = max(1, max_elements // max(1, D * T))
+    out = np.empty((P, D))
+    for s in range(0, P, step):
+        g = {k: v[s:s + step] for k, v in grid.items()}
+        out[s:s + step] = _evaluate_chunk(panel, prep, g, strategy)
+    return out
+
+def _aggregate(pnl):
+    traded = ~np.isnan(pnl)
+    trades = traded.sum(axis=1)
+    wins = (np.nan_to_num(pnl) > 0).sum(axis=1)
+    total = np.nansum(pnl, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {"trades": trades, "win_rate": np.where(trades > 0, wins / np.maximum(trades, 1), 0.0),
+                "total_pnl_pct": total, "avg_pnl_pct": np.where(trades > 0, total / np.maximum(trades, 1), 0.0)}
+
+def results_table(grid, pnl, metric='total_pnl_pct'):
+    """每組參數一列，依 metric 由高到低排名"""
+    df = pd.DataFrame({k: grid[k] for k in SWEEP_FIELDS})
+    for k, v in _aggregate(pnl).items(): df[k] = v
+    df = df.sort_values([metric, 'trades'], ascending=[False, False], kind='stable').reset_index(drop=True)
+    df.index.name = 'rank'
+    return df
+
+def sweep(symbols, grid, strategy='vwap', root=None, last_n_days=None, metric='total_pnl_pct'):
+    panel = load_panel(symbols, root, last_n_days)
+    if panel is None: return None
+    return results_table(grid, sweep_pnl(panel, grid, strategy), metric)
+
+def walk_forward(panel, grid, n_splits=4, strategy='vwap', metric='total_pnl_pct', train_days=None):
+    """依交易日切成 n_splits+1 段：每段用之前的資料 (或最近 train_days 天) 選參數，下一段驗證"""
+    pnl = sweep_pnl(panel, grid, strategy)
+    row_days = np.array([d for _, d in panel["labels"]])
+    days = np.unique(row_days)
+    bounds = np.linspace(0, len(days), n_splits + 2).astype(int)
+    records = []
+    for k in range(1, n_splits + 1):
+        test_days = days[bounds[k]:bounds[k + 1]]
+        train = days[:bounds[k]] if train_days is None else days[max(0, bounds[k] - train_days):bounds[k]]
+        if len(train) == 0 or len(test_days) == 0: continue
+        train_stats = _aggregate(pnl[:, np.isin(row_days, train)])
+        best = int(np.argmax(train_stats[metric]))
+        test_stats = _aggregate(pnl[best:best + 1, np.isin(row_days, test_days)])
+        records.append({
+            "fold": k, "train_from": train[0], "train_to": train[-1],
+            "test_from": test_days[0], "test_to": test_days[-1],
+            **{f: grid[f][best] for f in SWEEP_FIELDS},
+            f"train_{metric}": train_stats[metric][best],
+            **{f"test_{m}": test_stats[m][0] for m in METRICS},
+        })
+    return pd.DataFrame(records)
+
+def to_params(row):
+    """結果表的一列 → StrategyParams，可直接傳給 get_orb_signals(params=...)"""
+    values = {k: float(row[k]) for k in SWEEP_FIELDS}
+    return StrategyParams(**{**asdict(DEFAULT_PARAMS), **values})
+
+if __name__ == "__main__":
+    import time
+    from analyzer import MARKET_POOL
+    parser = argparse.ArgumentParser(description="策略門檻網格掃描")
+    parser.add_argument("--symbols", help="以逗號分隔，預設 MARKET_POOL")
+    parser.add_argument("--days", type=int, help="只用最近 N 個交易日")
+    parser.add_argument("--strategy", choices=["vwap", "knife"], default="vwap")
+    parser.add_argument("--metric", choices=METRICS, default="total_pnl_pct")
+    parser.add_argument("--walk-forward", type=int, default=0, help="walk-forward 折數")
+    parser.add_argument("--root", default=bar_store.BAR_STORE_DIR)
+    args = parser.parse_args()
+    symbols = args.symbols.split(",") if args.symbols else MARKET_POOL
+    if args.strategy == 'knife':
+        grid = make_grid(knife_trigger=[-0.02, -0.025, -0.03, -0.035, -0.04],
+                         take_profit=[1.01, 1.015, 1.02, 1.03], stop_loss=[0.98, 0.985, 0.99])
+    else:
+        grid = make_grid(max_dev=[0.004, 0.006, 0.008, 0.01], pullback=[0.99, 0.992, 0.994, 0.996],
+                         vwap_proximity=[1.005, 1.01, 1.015], take_profit=[1.01, 1.015, 1.02, 1.03],
+                         stop_loss=[0.98, 0.985, 0.99])
+    t0 = time.perf_counter()
+    panel = load_panel(symbols, args.root, args.days)
+    if panel is None: raise SystemExit("倉庫中沒有分 K 資料")
+    if args.walk_forward:
+        print(walk_forward(panel, grid, args.walk_forward, args.strategy, args.metric).to_string())
+    else:
+        print(results_table(grid, sweep_pnl(panel, grid, args.strategy), args.metric).head(20).to_string())
+    print(f"{len(grid['take_profit'])} 組參數 × {len(panel['labels'])} 個交易日, 耗時 {time.perf_counter() - t0:.2f}s")
@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# --- 跨 session 的 AI 情緒分數快取 ---
+# 以代號為 key 存在磁碟上，每筆附上新聞指紋 (去重後的連結 + 標題)。
+# 重新分析時新聞沒變就沿用上次 Gemini 的分數與總結，不再呼叫 API。
+# 指紋可以是 {來源: 指紋}：只比對這次準時交付的來源，一直逾時或失敗的來源不會讓快取永遠比對不上。
+
+SENTIMENT_CACHE_PATH = os.environ.get("SENTIMENT_CACHE_PATH", ".sentiment_cache.json")
+TTL_SECONDS = 6 * 3600
+MAX_ENTRIES = 500
+
+def news_fingerprint(news_list):
+    """去重後 (依連結，沒有連結用標題) 排序再雜湊，來源回傳順序不影響結果"""
+    seen = {}
+    for n in news_list:
+        key = n.get('link') or n.get('title', '')
+        if key and key not in seen: seen[key] = n.get('title', '')
+    payload = "\n".join(f"{k}\t{seen[k]}" for k in sorted(seen))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def source_fingerprints(news_by_source):
+    """{來源: 指紋}，給 news_feed 的 status['delivered']"""
+    return {name: news_fingerprint(items) for name, items in news_by_source.items()}
+
+def _matches(stored, fingerprint):
+    """逐來源指紋：這次交付的來源都在上次的組合裡且沒變才算相同 (這次沒交付的來源沒有新消息)"""
+    if isinstance(fingerprint, dict):
+        return isinstance(stored, dict) and all(stored.get(k) == v for k, v in fingerprint.items())
+    return stored == fingerprint
+
+class SentimentCache:
+    def __init__(self, path=SENTIMENT_CACHE_PATH, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # 最舊 (最久沒用) 的在前面
+        self.stats = {"hits": 0, "misses": 0, "changed": 0, "expired": 0, "evictions": 0}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for symbol, entry in data.items():
+            if now - entry.get("created_at", 0) <= self.ttl: self._entries[symbol] = entry
+
+    def _save(self):
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def _live(self, symbol):
+        entry = self._entries.get(symbol)
+        if entry is None: return None
+        if time.time() - entry["created_at"] > self.ttl:
+            del self._entries[symbol]
+            self.stats["expired"] += 1
+            return None
+        return entry
+
+    def get(self, symbol, fingerprint):
+        """指紋相符且未過期才算命中，回傳 {'score', 'summary', 'model', 'created_at', ...}"""
+        with self._lock:
+            entry = self._live(symbol)
+            if entry is None or not _matches(entry["fingerprint"], fingerprint):
+                self.stats["misses"] += 1
+                if entry is not None: self.stats["changed"] += 1
+                return None
+            self._entries.move_to_end(symbol)
+            self.stats["hits"] += 1
+            return dict(entry)
+
+    def latest(self, symbol):
+        """不比對指紋，取最近一次的分數 (新 session 開頁時直接顯示用)"""
+        with self._lock:
+            entry = self._live(symbol)
+            return dict(entry) if entry else None
+
+    def put(self, symbol, fingerprint, score, summary, model):
+        with self._lock:
+            self._entries[symbol] = {"fingerprint": fingerprint, "score": score, "summary": summary,
+                                     "model": model, "created_at": time.time()}
+            self._entries.move_to_end(symbol)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+            self._save()
+
+    def snapshot_stats(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {**self.stats, "entries": len(self._entries),
+                    "hit_rate": self.stats["hits"] / lookups if lookups else 0.0}
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+def get_cache():
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None: _CACHE = SentimentCache()
+        return _CACHE
@@ -0,0 +1,298 @@
+import threading
+from dataclasses import dataclass
+import numpy as np
+
+# --- 向量化訊號引擎 ---
+# 與 analyzer.get_orb_signals 原本三段 iterrows 迴圈逐筆等價，
+# 只吃 NumPy 陣列，不依賴 Streamlit，可直接用在多日 1 分 K 與回測。
+
+NO_SIGNAL = -1
+
+@dataclass(frozen=True)
+class StrategyParams:
+    """策略門檻 (預設值即原本寫死的數字)"""
+    max_dev: float = 0.006          # VWAP 最大乖離需達到
+    pullback: float = 0.994         # 收盤需低於日內高點 × pullback
+    vwap_proximity: float = 1.015   # 低點需回到 VWAP × proximity 以內
+    take_profit: float = 1.02       # 停利倍數
+    stop_loss: float = 0.985        # 停損倍數
+    knife_trigger: float = -0.03    # 接刀：相對昨收跌幅
+    knife_sentiment: float = 80     # AI 熱度高於此值改用接刀策略
+
+DEFAULT_PARAMS = StrategyParams()
+
+def _first_true(mask):
+    """回傳第一個 True 的位置，全 False 時回傳 NO_SIGNAL"""
+    if mask.size == 0: return NO_SIGNAL
+    i = int(np.argmax(mask))
+    return i if mask[i] else NO_SIGNAL
+
+def compute_vwap(close, volume):
+    """累積量、累積價量與 VWAP (與 cumsum 版本相同)"""
+    cum_vol = np.cumsum(volume)
+    cum_vol_price = np.cumsum(close * volume)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vwap = cum_vol_price / cum_vol
+    return cum_vol, cum_vol_price, vwap
+
+def running_high_and_dev(high, close, vwap):
+    """VWAP 有值的 K 棒上，滾動最高價 high_h 與最大乖離 max_dev (起始皆為 0)"""
+    valid = ~np.isnan(vwap)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dev = (close - vwap) / vwap
+    h = np.where(valid, high, 0.0)
+    d = np.where(valid, dev, 0.0)
+    # fmax 會略過 NaN，等同迴圈中 NaN 比較為 False 不更新
+    high_h = np.fmax.accumulate(np.concatenate(([0.0], h)))[1:]
+    max_dev = np.fmax.accumulate(np.concatenate(([0.0], d)))[1:]
+    return high_h, max_dev, valid
+
+def scan_knife_entry(close, prev_close, params=DEFAULT_PARAMS):
+    """左側接刀：第一根相對昨收跌幅 <= knife_trigger 的 K 棒"""
+    row_change = (close - prev_close) / prev_close
+    return _first_true(row_change <= params.knife_trigger)
+
+def scan_vwap_entry(open_, high, low, close, vwap, params=DEFAULT_PARAMS):
+    """右側 VWAP：乖離曾達 max_dev、自高點拉回、回測 VWAP 附近收紅站上"""
+    high_h, max_dev, valid = running_high_and_dev(high, close, vwap)
+    mask = (valid
+            & (max_dev >= params.max_dev)
+            & (high_h > 0) & (close < high_h * params.pullback)
+            & (low <= vwap * params.vwap_proximity)
+            & (close > open_) & (close >= vwap))
+    return _first_true(mask)
+
+def scan_exit(ts, high, low, entry_idx, entry_price, params=DEFAULT_PARAMS):
+    """模擬出場：進場時間之後第一根觸及停利或停損的 K 棒 (同根先判停利)"""
+    after = ts > ts[entry_idx]
+    take = entry_price * params.take_profit
+    stop = entry_price * params.stop_loss
+    hit = after & ((high >= take) | (low <= stop))
+    i = _first_true(hit)
+    if i == NO_SIGNAL: return NO_SIGNAL, None
+    return i, (take if high[i] >= take else stop)
+
+def strategy_mode(sentiment_score, params=DEFAULT_PARAMS):
+    """依 AI 熱度決定策略：'knife' (左側接刀) 或 'vwap' (右側 VWAP)"""
+    return 'knife' if sentiment_score > params.knife_sentiment else 'vwap'
+
+def evaluate_signals(ts, open_, high, low, close, vwap, prev_close, sentiment_score=50, params=DEFAULT_PARAMS):
+    """執行策略分流並回傳進出場位置與狀態，欄位對應 get_orb_signals 的 stats"""
+    entry_idx, entry_price = NO_SIGNAL, None
+    exit_idx, exit_price = NO_SIGNAL, None
+    signal_status = "等待訊號"
+
+    current_price = close[-1]
+    pct_change = (current_price - prev_close) / prev_close
+
+    # 🔥 策略 A: 左側接刀 (熱度 > knife_sentiment)
+    if strategy_mode(sentiment_score, params) == 'knife':
+        strategy_name = "🔥 左側接刀"
+        if pct_change <= params.knife_trigger:
+            entry_idx = scan_knife_entry(close, prev_close, params)
+        else:
+            signal_status = f"未達接刀點 ({params.knife_trigger:.0%})"
+    # ⚖️ 策略 B: 右側 VWAP
+    else:
+        strategy_name = "⚖️ 右側 VWAP"
+        entry_idx = scan_vwap_entry(open_, high, low, close, vwap, params)
+
+    if entry_idx != NO_SIGNAL:
+        entry_price = close[entry_idx]
+        exit_idx, exit_price = scan_exit(ts, high, low, entry_idx, entry_price, params)
+        if exit_idx != NO_SIGNAL: signal_status = "已出場"
+        else: signal_status = f"持有中 {((current_price-entry_price)/entry_price)*100:.2f}%"
+
+    return {
+        "entry_idx": entry_idx, "entry_price": entry_price,
+        "exit_idx": exit_idx, "exit_price": exit_price,
+        "signal": signal_status, "signal_price": current_price,
+        "strategy_name": strategy_name, "pct_change": pct_change,
+    }
+
+
+# --- 串流增量狀態：每個 (代號, 週期) 只處理新進或被修正的 K 棒 ---
+# 呼叫端先用 resume_at 問從第幾根開始給，只把那之後的列轉成陣列傳進 update。
+# 結果的 K 棒區塊分兩段：已提交的部分直接是緩衝區的唯讀視圖 (提交後不再改寫，換日/擴容都換新緩衝區)，
+# 只有最後幾根未提交的複製下來；要整塊時才由 signal_result 接起來。
+
+class SignalState:
+    # 最後幾根 K 棒可能被上游修正，保留不提交，修正時從提交點重算
+    REVISE_WINDOW = 2
+
+    def __init__(self, symbol, timeframe):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.lock = threading.Lock()
+        self._reset(None, DEFAULT_PARAMS)
+
+    def _reset(self, prev_close, params):
+        self.prev_close = prev_close
+        self.params = params
+        self.n = 0
+        self.n_committed = 0
+        self._ts = np.empty(0, dtype=np.int64)
+        # 欄位：Open, High, Low, Close, Volume, Cum_Vol, Cum_Vol_Price, VWAP
+        self._bars = np.empty((0, 8), dtype=float)
+        # 結果用的 Open/High/Low/Close/Volume/VWAP float32 區塊，與 _bars 同步寫入
+        self._block = np.empty((0, 6), dtype=np.float32)
+        self._committed = self._empty_checkpoint()
+        self._tip = dict(self._committed)
+
+    @staticmethod
+    def _empty_checkpoint():
+        return {"cum_vol": 0.0, "cum_pv": 0.0, "high_h": 0.0, "max_dev": 0.0,
+                "knife_idx": NO_SIGNAL, "knife_exit": (NO_SIGNAL, None),
+                "vwap_idx": NO_SIGNAL, "vwap_exit": (NO_SIGNAL, None)}
+
+    def _ensure_capacity(self, n):
+        # 一律搬到新緩衝區，已交出去的視圖還指著舊的那塊
+        cap = len(self._ts)
+        if n <= cap: return
+        new_cap = max(n, cap * 2, 512)
+        ts = np.empty(new_cap, dtype=np.int64); ts[:cap] = self._ts
+        bars = np.empty((new_cap, 8), dtype=float); bars[:cap] = self._bars
+        block = np.empty((new_cap, 6), dtype=np.float32); block[:cap] = self._block
+        self._ts, self._bars, self._block = ts, bars, block
+
+    def _step(self, s, i):
+        """把第 i 根 K 棒的貢獻套用到狀態 s 上 (與向量化引擎逐筆等價)"""
+        o, h, l, c, v = self._bars[i, :5]
+        p = self.params
+        s['cum_vol'] += v
+        s['cum_pv'] += c * v
+        vwap = s['cum_pv'] / s['cum_vol'] if s['cum_vol'] != 0 else np.nan
+        self._bars[i, 5:] = (s['cum_vol'], s['cum_pv'], vwap)
+        self._block[i] = (o, h, l, c, v, vwap)
+
+        if not np.isnan(vwap):
+            if h > s['high_h']: s['high_h'] = h
+            dev = (c - vwap) / vwap
+            if dev > s['max_dev']: s['max_dev'] = dev
+            if (s['vwap_idx'] == NO_SIGNAL and s['max_dev'] >= p.max_dev
+                    and s['high_h'] > 0 and c < s['high_h'] * p.pullback
+                    and l <= vwap * p.vwap_proximity and c > o and c >= vwap):
+                s['vwap_idx'] = i
+
+        if s['knife_idx'] == NO_SIGNAL and (c - self.prev_close) / self.prev_close <= p.knife_trigger:
+            s['knife_idx'] = i
+
+        for key in ('vwap', 'knife'):
+            entry = s[f'{key}_idx']
+            if entry == NO_SIGNAL or entry >= i or s[f'{key}_exit'][0] != NO_SIGNAL: continue
+            entry_price = self._bars[entry, 3]
+            if h >= entry_price * p.take_profit: s[f'{key}_exit'] = (i, entry_price * p.take_profit)
+            elif l <= entry_price * p.stop_loss: s[f'{key}_exit'] = (i, entry_price * p.stop_loss)
+
+    def _bootstrap(self, n_commit):
+        """狀態失效時 (換日/資料不連續)，用向量化引擎一次建出提交點"""
+        s = self._empty_checkpoint()
+        if n_commit > 0:
+            ts = self._ts[:n_commit]
+            o, h, l, c, v = (self._bars[:n_commit, k] for k in range(5))
+            cum_vol, cum_pv, vwap = compute_vwap(c, v)
+            self._bars[:n_commit, 5] = cum_vol
+            self._bars[:n_commit, 6] = cum_pv
+            self._bars[:n_commit, 7] = vwap
+            self._block[:n_commit, :5] = self._bars[:n_commit, :5]
+            self._block[:n_commit, 5] = vwap
+            high_h, max_dev, _ = running_high_and_dev(h, c, vwap)
+            s.update(cum_vol=cum_vol[-1], cum_pv=cum_pv[-1], high_h=high_h[-1], max_dev=max_dev[-1])
+            for key, idx in (('knife', scan_knife_entry(c, self.prev_close, self.params)),
+                             ('vwap', scan_vwap_entry(o, h, l, c, vwap, self.params))):
+                s[f'{key}_idx'] = idx
+                if idx != NO_SIGNAL: s[f'{key}_exit'] = scan_exit(ts, h, l, idx, c[idx], self.params)
+        return s
+
+    def _stale(self, ts, prev_close, params):
+        """換日、換參數或提交過的 K 棒對不上時，狀態要整個重建 (只看 ts 的頭與提交點，O(1))"""
+        nc = self.n_committed
+        return (prev_close != self.prev_close or params != self.params or len(ts) < nc
+                or (nc > 0 and (ts[0] != self._ts[0] or ts[nc - 1] != self._ts[nc - 1])))
+
+    def resume_at(self, ts, prev_close, params=DEFAULT_PARAMS):
+        """update 的 OHLCV 只需從這一根開始給：狀態可沿用時是提交點，要重建時是 0"""
+        with self.lock:
+            return 0 if self._stale(ts, prev_close, params) else self.n_committed
+
+    def update(self, ts, open_, high, low, close, volume, prev_close, sentiment_score=50, params=DEFAULT_PARAMS, start=0):
+        """同步整段 K 棒 (只重算新進/修正的部分)，回傳策略結果與 K 棒/VWAP 區塊 (見 signal_result)。
+        ts 是整段時間軸；open_ ~ volume 可以只給第 start 根之後 (start 由 resume_at 取得)。
+        狀態在 resume_at 之後被別的呼叫端重置、需要更前面的 K 棒時回傳 None，呼叫端改給整段"""
+        with self.lock:
+            n = len(ts)
+            stale = self._stale(ts, prev_close, params)
+            nc = 0 if stale else self.n_committed
+            if start > nc: return None
+            if stale: self._reset(prev_close, params)
+
+            self._ensure_capacity(n)
+            self._ts[nc:n] = ts[nc:]
+            for k, col in enumerate((open_, high, low, close, volume)):
+                self._bars[nc:n, k] = col[nc - start:]
+
+            new_nc = max(nc, n - self.REVISE_WINDOW)
+            if stale:
+                self._committed = self._bootstrap(new_nc)
+                nc = new_nc
+            s = dict(self._committed)
+            for i in range(nc, n):
+                self._step(s, i)
+                if i == new_nc - 1: self._committed = dict(s)
+            self._tip = s
+            self.n, self.n_committed = n, new_nc
+            return self._evaluate(sentiment_score)
+
+    def _evaluate(self, sentiment_score):
+        n, s = self.n, self._tip
+        close = self._bars[:n, 3]
+        entry_idx, entry_price = NO_SIGNAL, None
+        exit_idx, exit_price = NO_SIGNAL, None
+        signal_status = "等待訊號"
+
+        current_price = close[-1]
+        pct_change = (current_price - self.prev_close) / self.prev_close
+
+        if strategy_mode(sentiment_score, self.params) == 'knife':
+            strategy_name = "🔥 左側接刀"
+            if pct_change <= self.params.knife_trigger:
+                entry_idx = s['knife_idx']
+                exit_idx, exit_price = s['knife_exit']
+            else:
+                signal_status = f"未達接刀點 ({self.params.knife_trigger:.0%})"
+        else:
+            strategy_name = "⚖️ 右側 VWAP"
+            entry_idx = s['vwap_idx']
+            exit_idx, exit_price = s['vwap_exit']
+
+        if entry_idx != NO_SIGNAL:
+            entry_price = close[entry_idx]
+            if exit_idx != NO_SIGNAL: signal_status = "已出場"
+            else: signal_status = f"持有中 {((current_price-entry_price)/entry_price)*100:.2f}%"
+
+        return {
+            "entry_idx": entry_idx, "entry_price": entry_price,
+            "exit_idx": exit_idx, "exit_price": exit_price,
+            "signal": signal_status, "signal_price": current_price,
+            "strategy_name": strategy_name, "pct_change": pct_change,
+            "segments": self.result_segments(),
+        }
+
+    def result_segments(self):
+        """((ts, K 棒區塊), ...)：已提交的是唯讀視圖，未提交的最後幾根複製一份 (緩衝區之後還會改寫它們)"""
+        n, nc = self.n, self.n_committed
+        head_ts, head = self._ts[:nc], self._block[:nc]
+        head_ts.flags.writeable = head.flags.writeable = False
+        return ((head_ts, head), (self._ts[nc:n].copy(), self._block[nc:n].copy()))
+
+_STATES = {}
+_STATES_LOCK = threading.Lock()
+
+def get_signal_state(symbol, timeframe):
+    """取得 (代號, 週期) 的串流狀態，整個行程共用"""
+    key = (symbol, timeframe)
+    with _STATES_LOCK:
+        state = _STATES.get(key)
+        if state is None:
+            state = _STATES[key] = SignalState(symbol, timeframe)
+        return state
@@ -0,0 +1,118 @@
+from dataclasses import dataclass, field, replace
+import numpy as np
+import pandas as pd
+import bar_store
+import signal_engine
+
+# --- 訊號結果：取代原本 df 加三個欄位 + stats dict + 另存一份 vwap Series ---
+# K 棒與 VWAP 放在 float32 (n, 6) 陣列，時間軸是 int64 (UTC ns)；VWAP 只是這塊陣列的欄位視圖。
+# 結果不可變，快照、觀察清單與畫面直接共用同一份，不必複製；要畫圖時 frame() 也是包住同一塊陣列。
+# 陣列以分段保存 (見 SignalState.result_segments)：前段共用狀態緩衝區，只有要整塊 (ts / bars) 時才接起來，
+# 最後一根、某一根的時間這類查詢直接看分段，每次刷新不必複製整天的 K 棒。
+
+COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume', 'VWAP')
+VWAP_COL = COLUMNS.index('VWAP')
+NO_SIGNAL = signal_engine.NO_SIGNAL
+
+@dataclass(frozen=True, slots=True, eq=False)
+class SignalResult:
+    symbol: str
+    timeframe: str
+    segments: tuple             # ((ts int64 UTC 奈秒, bars float32 (k, 6)), ...)，欄位見 COLUMNS
+    signal: str
+    signal_price: float
+    pct_change: float
+    strategy_name: str
+    entry_idx: int = NO_SIGNAL
+    entry_price: float = None
+    exit_idx: int = NO_SIGNAL
+    exit_price: float = None
+    source: str = "None"
+    trend: str = "Unknown"
+    fugle_error: str = None
+    _joined: dict = field(default_factory=dict, init=False, repr=False)
+
+    def __len__(self):
+        return sum(len(ts) for ts, _ in self.segments)
+
+    def _join(self):
+        if not self._joined:
+            parts = [seg for seg in self.segments if len(seg[0])]
+            if len(parts) == 1:
+                ts, bars = parts[0]
+            elif not parts:
+                ts, bars = np.empty(0, dtype=np.int64), np.empty((0, len(COLUMNS)), dtype=np.float32)
+            else:
+                ts = np.concatenate([t for t, _ in parts])
+                bars = np.concatenate([b for _, b in parts])
+                ts.flags.writeable = bars.flags.writeable = False
+            self._joined.update(ts=ts, bars=bars)
+        return self._joined
+
+    @property
+    def ts(self):
+        return self._join()['ts']
+
+    @property
+    def bars(self):
+        return self._join()['bars']
+
+    def _locate(self, i):
+        """第 i 根 (可為負) 所在的分段與段內位置，不接整塊"""
+        if i < 0: i += len(self)
+        for ts, bars in self.segments:
+            if i < len(ts): return ts, bars, i
+            i -= len(ts)
+        raise IndexError("K 棒索引超出範圍")
+
+    def ts_at(self, i):
+        ts, _, k = self._locate(i)
+        return int(ts[k])
+
+    @property
+    def vwap(self):
+        return self.bars[:, VWAP_COL]
+
+    @property
+    def last_vwap(self):
+        if not len(self): return 0.0
+        _, bars, k = self._locate(-1)
+        return float(bars[k, VWAP_COL])
+
+    @property
+    def index(self):
+        index = pd.DatetimeIndex(self.ts.view('M8[ns]')).tz_localize('UTC').tz_convert(bar_store.TZ)
+        index.name = 'Date'
+        return index
+
+    def _time(self, i):
+        return pd.Timestamp(self.ts_at(i), tz='UTC').tz_convert(bar_store.TZ) if i != NO_SIGNAL else None
+
+    @property
+    def entry_time(self):
+        return self._time(self.entry_idx)
+
+    @property
+    def exit_time(self):
+        return self._time(self.exit_idx)
+
+    @property
+    def updated_at(self):
+        return self._time(len(self) - 1) if len(self) else None
+
+    @property
+    def is_realtime(self):
+        return self.source == "Fugle (真即時 API)"
+
+    @property
+    def nbytes(self):
+        return sum(ts.nbytes + bars.nbytes for ts, bars in self.segments)
+
+    def frame(self):
+        """畫圖用的 DataFrame (含 VWAP 欄)；包住同一塊陣列不複製，呼叫端不可修改"""
+        return pd.DataFrame(self.bars, index=self.index, columns=list(COLUMNS), copy=False)
+
+    def without_signal(self, signal, strategy_name):
+        """拿掉進出場點、換掉狀態文字 (例如尚未做 AI 分析時)，K 棒共用"""
+        return replace(self, entry_idx=NO_SIGNAL, entry_price=None, exit_idx=NO_SIGNAL, exit_price=None,
+                       signal=signal, strategy_name=strategy_name)
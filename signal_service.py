@@ -0,0 +1,243 @@
+import os
+import sys
+import json
+import time
+import socket
+import threading
+import multiprocessing as mp
+import queue as queue_mod
+import signal_engine
+import signal_result
+
+# --- 無頭訊號服務：不開 Streamlit，上市櫃全市場分給幾個 worker 行程，每分鐘跑一輪 VWAP / 接刀判斷 ---
+# 每個 worker 負責一份代號：Yahoo 批次下載分 K 進倉庫 → 各檔 build_signals (增量狀態，只算新 K 棒) → 只回報狀態有轉變的。
+# 富果 REST 額度每分鐘約 60 次，撐不起全市場，所以這裡一律走 Yahoo 批次 (analyzer._refresh_intraday)；單檔畫面照舊富果優先。
+# 主行程收集事件，一行一筆 JSON 寫到 stdout / 檔案，或廣播給連上本機 socket 的客戶端；每輪各 worker 的耗時寫到 stderr。
+# upstream 的限速是行程內的，每個 worker 開頭先 share_budget(worker 數)，合計速率才不會變成 worker 數倍。
+#   python signal_service.py                              # 全市場，每 60 秒一輪
+#   python signal_service.py --workers 6 --socket /tmp/vwap.sock
+#   python signal_service.py --symbols 2330,2317,8069 --once
+
+INTERVAL_SECONDS = 60
+TICK_OFFSET_SECONDS = 5     # 整分後再等幾秒，讓上一分鐘的 K 棒在上游定案
+WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+SOURCE = "Yahoo (批次)"
+STRATEGIES = ('vwap', 'knife')
+
+def strategy_score(strategy, params=signal_engine.DEFAULT_PARAMS):
+    """build_signals 用 AI 分數選策略 (signal_engine.strategy_mode)；給一個落在該策略區間的分數"""
+    return params.knife_sentiment + 1 if strategy == 'knife' else 50
+
+def phase(result):
+    if result.entry_idx == signal_result.NO_SIGNAL: return "waiting"
+    return "exited" if result.exit_idx != signal_result.NO_SIGNAL else "holding"
+
+def _iso(ts):
+    return ts.isoformat() if ts is not None else None
+
+def transition_event(result, strategy, prev):
+    return {
+        "type": "signal", "at": time.time(), "symbol": result.symbol, "strategy": strategy,
+        "phase": phase(result), "from": prev, "signal": result.signal,
+        "price": result.signal_price, "pct_change": round(result.pct_change * 100, 3),
+        "vwap": round(result.last_vwap, 4), "bar_time": _iso(result.updated_at),
+        "entry_time": _iso(result.entry_time), "entry_price": result.entry_price,
+        "exit_time": _iso(result.exit_time), "exit_price": result.exit_price,
+    }
+
+class TransitionTracker:
+    """記住每個 (代號, 策略) 上次的狀態；進場、出場或當日訊號被重置 (換日/資料修正) 才算轉變"""
+    def __init__(self):
+        self._last = {}
+
+    def observe(self, result, strategy):
+        key = (result.symbol, strategy)
+        state = (phase(result), result.ts_at(result.entry_idx) if result.entry_idx != signal_result.NO_SIGNAL else None,
+                 result.ts_at(result.exit_idx) if result.exit_idx != signal_result.NO_SIGNAL else None)
+        prev = self._last.get(key)
+        self._last[key] = state
+        if prev == state: return None
+        # 第一次看到且還在等訊號的不報，免得開機就噴出上千行
+        if prev is None and state[0] == "waiting": return None
+        return transition_event(result, strategy, prev[0] if prev else None)
+
+# --- worker 行程 ---
+def _next_tick(interval, offset=TICK_OFFSET_SECONDS):
+    now = time.time()
+    return (now - offset) // interval * interval + interval + offset
+
+def run_shard(shard_id, symbols, out, stop, interval=INTERVAL_SECONDS, timeframe='1T', strategies=STRATEGIES,
+              sentiments=None, params=None, once=False, workers=1):
+    """一個 worker：對自己那份代號反覆 抓分K → 算訊號 → 回報轉變。out 是 multiprocessing.Queue；workers 是總 worker 數"""
+    try:
+        _run_shard(shard_id, symbols, out, stop, interval, timeframe, strategies, sentiments, params, once, workers)
+    except KeyboardInterrupt:
+        pass
+
+def _run_shard(shard_id, symbols, out, stop, interval, timeframe, strategies, sentiments, params, once, workers):
+    import analyzer         # 子行程裡才 import (spawn)，不經 Streamlit
+    import bar_store
+    import upstream
+    upstream.share_budget(workers)
+    params = params or signal_engine.DEFAULT_PARAMS
+    store = bar_store.get_store()
+    tracker = TransitionTracker()
+    batch = analyzer.INTRADAY_BATCH
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        stats = {"shard": shard_id, "symbols": len(symbols), "downloaded": 0, "evaluated": 0, "events": 0, "errors": 0}
+        # 昨收 / MA5 一天算一次：當天還沒有 context 的先批次補日 K，否則 get_daily_context 會一檔一檔打 Yahoo
+        missing = [s for s in symbols if store.get_context(s) is None]
+        try:
+            for i in range(0, len(missing), batch): analyzer._refresh_daily(missing[i:i + batch])
+        except Exception as e:
+            stats["errors"] += 1
+            out.put(("error", shard_id, f"日 K 下載失敗: {e}"))
+        try:
+            stats["downloaded"] = analyzer._refresh_intraday(symbols, batch)
+        except Exception as e:
+            stats["errors"] += 1
+            out.put(("error", shard_id, f"分 K 下載失敗: {e}"))
+        stats["fetch_ms"] = (time.perf_counter() - t0) * 1000
+
+        events = []
+        # 只評估今天的分 K：盤前或今天還沒成交的代號，倉庫裡最新的是上一個交易日，拿來算會噴出過期的「新訊號」
+        today = bar_store.today_str()
+        for symbol in symbols:
+            try:
+                df = store.read_intraday(symbol, today)
+                if df is None or df.empty: continue
+                if sentiments is not None:
+                    score = sentiments.get(symbol.split('.')[0])
+                    if score is None: continue
+                    todo = [(signal_engine.strategy_mode(score, params), score)]
+                else:
+                    todo = [(s, strategy_score(s, params)) for s in strategies]
+                for strategy, score in todo:
+                    result = analyzer.build_signals(symbol, df, SOURCE, None, timeframe, score, params)
+                    event = tracker.observe(result, strategy)
+                    if event is not None: events.append(event)
+                stats["evaluated"] += 1
+            except Exception:
+                stats["errors"] += 1
+        stats["events"] = len(events)
+        stats["tick_ms"] = (time.perf_counter() - t0) * 1000
+        if events: out.put(("events", shard_id, events))
+        out.put(("tick", shard_id, stats))
+        if once: break
+        stop.wait(max(0.0, _next_tick(interval) - time.time()))
+
+# --- 輸出 ---
+class LineBroadcaster:
+    """本機 socket 伺服器：每個連上的客戶端都收到全部事件 (JSON lines)；慢的或斷線的客戶端直接踢掉"""
+    def __init__(self, path=None, port=None, host="127.0.0.1"):
+        if path:
+            if os.path.exists(path): os.unlink(path)
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server.bind(path)
+        else:
+            self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.server.bind((host, port))
+        self.server.listen()
+        self.path = path
+        self._clients = []
+        self._lock = threading.Lock()
+        threading.Thread(target=self._accept, name="signal-accept", daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try: conn, _ = self.server.accept()
+            except OSError: return
+            conn.settimeout(1.0)
+            with self._lock: self._clients.append(conn)
+
+    def write(self, line):
+        data = line.encode("utf-8")
+        with self._lock:
+            for conn in list(self._clients):
+                try: conn.sendall(data)
+                except OSError:
+                    self._clients.remove(conn)
+                    conn.close()
+
+    def flush(self): pass
+
+    def close(self):
+        self.server.close()
+        with self._lock:
+            for conn in self._clients: conn.close()
+            self._clients.clear()
+        if self.path and os.path.exists(self.path): os.unlink(self.path)
+
+def shard(symbols, n):
+    """輪流分配：上市、上櫃與各產業代號段平均分到每個 worker"""
+    return [symbols[i::n] for i in range(n)] if symbols else []
+
+def serve(symbols, sink, workers=WORKERS, interval=INTERVAL_SECONDS, timeframe='1T', strategies=STRATEGIES,
+          sentiments=None, params=None, once=False, log=sys.stderr):
+    ctx = mp.get_context("spawn")
+    out, stop = ctx.Queue(), ctx.Event()
+    shards = [s for s in shard(symbols, max(1, min(workers, len(symbols)))) if s]
+    procs = [ctx.Process(target=run_shard, name=f"signal-shard-{i}", daemon=True,
+                         args=(i, s, out, stop, interval, timeframe, strategies, sentiments, params, once, len(shards)))
+             for i, s in enumerate(shards)]
+    for p in procs: p.start()
+    rounds = {}   # shard -> 已完成輪數
+    try:
+        while any(p.is_alive() for p in procs) or not out.empty():
+            try: kind, shard_id, payload = out.get(timeout=1.0)
+            except queue_mod.Empty: continue
+            if kind == "events":
+                for event in payload: sink.write(json.dumps(event, ensure_ascii=False, default=float) + "\n")
+                sink.flush()
+            elif kind == "tick":
+                rounds[shard_id] = rounds.get(shard_id, 0) + 1
+                late = " (跟不上)" if payload["tick_ms"] > interval * 1000 else ""
+                print(f"[shard {shard_id} #{rounds[shard_id]}] {payload['evaluated']}/{payload['symbols']} 檔 "
+                      f"下載 {payload['downloaded']} 檔 {payload['fetch_ms']:.0f}ms | 全輪 {payload['tick_ms']:.0f}ms | "
+                      f"轉變 {payload['events']} | 錯誤 {payload['errors']}{late}", file=log, flush=True)
+            else:
+                print(f"[shard {shard_id}] {payload}", file=log, flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for p in procs: p.join(timeout=interval)
+    return rounds
+
+if __name__ == "__main__":
+    import argparse
+    import bar_pyramid
+    import symbol_resolver
+    parser = argparse.ArgumentParser(description="無頭訊號服務：全市場 VWAP / 接刀訊號轉變輸出成 JSON lines")
+    parser.add_argument("--symbols", help="逗號分隔的代號；沒給就是上市櫃全部普通股")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--interval", type=float, default=INTERVAL_SECONDS, help="每輪間隔秒數")
+    parser.add_argument("--timeframe", default="1T", choices=["1T", *bar_pyramid.TIMEFRAMES])
+    parser.add_argument("--strategies", default=",".join(STRATEGIES), help="要評估的策略 (vwap,knife)")
+    parser.add_argument("--sentiment", help="AI 分數 JSON {代號: 分數}；給了就只評估分數對應的策略，沒分數的代號跳過")
+    parser.add_argument("--out", default="-", help="事件輸出檔 (- 為 stdout)")
+    parser.add_argument("--socket", help="改為在這個 Unix socket 路徑廣播事件")
+    parser.add_argument("--port", type=int, help="改為在 127.0.0.1:PORT 廣播事件")
+    parser.add_argument("--once", action="store_true", help="只跑一輪就結束")
+    args = parser.parse_args()
+
+    if args.symbols:
+        symbols = [symbol_resolver.yahoo_symbol(s.strip()) for s in args.symbols.split(",") if s.strip()]
+    else:
+        symbols = symbol_resolver.universe()
+    sentiments = None
+    if args.sentiment:
+        with open(args.sentiment, encoding="utf-8") as f: sentiments = {str(k).split('.')[0]: v for k, v in json.load(f).items()}
+    strategies = tuple(s for s in args.strategies.split(",") if s in STRATEGIES)
+
+    if args.socket or args.port:
+        sink = LineBroadcaster(path=args.socket, port=args.port)
+    else:
+        sink = sys.stdout if args.out == "-" else open(args.out, "a", encoding="utf-8")
+    print(f"{len(symbols)} 檔，{args.workers} 個 worker，每 {args.interval:.0f} 秒一輪", file=sys.stderr, flush=True)
+    try:
+        serve(symbols, sink, args.workers, args.interval, args.timeframe, strategies, sentiments, once=args.once)
+    finally:
+        if sink is not sys.stdout: sink.close()
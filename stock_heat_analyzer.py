@@ -1,29 +1,84 @@
-import asyncio
-from playwright.async_api import async_playwright
 import time
+_IMPORT_T0 = time.perf_counter()     # 放第一行：IMPORT_SECONDS 要包含下面所有 import
+import asyncio
 import random
 import sys
 import xml.etree.ElementTree as ET
 import os
+import json
+import threading
 import subprocess
+import importlib.util
+import importlib.metadata
 import re
-from datetime import datetime, timedelta
+from datetime import datetime
 import email.utils
+from concurrent.futures import ThreadPoolExecutor
+import sentiment_cache
+import news_feed
+import lexicon
 
-# 自動安裝依賴
-try:
-    import requests
-    import google.generativeai as genai
-except ImportError:
-    subprocess.run([sys.executable, "-m", "pip", "install", "requests", "google-generativeai"], check=True)
-    import requests
+# --- 延遲初始化 ---
+# import 本模組不做任何安裝或下載；依賴與 Chromium 在第一次用到時才檢查，
+# 成功結果寫進標記檔，之後的行程 (同一個 Python / Playwright 版本) 直接略過。
+RUNTIME_MARKER = os.environ.get("HEAT_RUNTIME_MARKER", ".heat_runtime.json")
+_RUNTIME = {}
+_RUNTIME_LOCK = threading.Lock()
+_BROWSER_POOL = None
+_HTTP_POOL = None
+_NEWS = None
+
+def _runtime_key():
+    try: playwright_version = importlib.metadata.version("playwright")
+    except importlib.metadata.PackageNotFoundError: playwright_version = None
+    return {"python": sys.executable, "playwright": playwright_version}
+
+def _read_marker():
+    try:
+        with open(RUNTIME_MARKER, encoding="utf-8") as f: return json.load(f)
+    except (OSError, ValueError): return {}
+
+def _write_marker(marker):
+    try:
+        with open(RUNTIME_MARKER, "w", encoding="utf-8") as f: json.dump(marker, f)
+    except OSError: pass
+
+def ensure_runtime(chromium=True):
+    """檢查 (必要時安裝) Python 依賴與 Chromium；每個行程最多做一次"""
+    with _RUNTIME_LOCK:
+        if _RUNTIME.get("deps") and (_RUNTIME.get("chromium") or not chromium): return dict(_RUNTIME)
+        marker = _read_marker()
+        key = _runtime_key()
+        if marker.get("key") != key: marker = {"key": key}
+        if not marker.get("deps"):
+            # 自動安裝依賴
+            missing = [pkg for mod, pkg in (("google.generativeai", "google-generativeai"), ("httpx", "httpx[http2]"))
+                       if importlib.util.find_spec(mod) is None]
+            if missing: subprocess.run([sys.executable, "-m", "pip", "install", *missing], check=True)
+            marker["deps"] = True
+        _RUNTIME["deps"] = True
+        if chromium and not _RUNTIME.get("chromium"):
+            # 雲端環境安裝 Chromium (失敗時本行程不再重試，爬蟲自己回空結果)
+            if not marker.get("chromium"):
+                try:
+                    subprocess.run(["playwright", "install", "chromium"], check=True)
+                    marker["chromium"] = True
+                except Exception:
+                    pass
+            _RUNTIME["chromium"] = True
+        _write_marker(marker)
+        return dict(_RUNTIME)
+
+def _genai():
+    ensure_runtime(chromium=False)
     import google.generativeai as genai
+    return genai
 
-# 雲端環境安裝 Chromium
-try:
-    subprocess.run(["playwright", "install", "chromium"], check=True)
-except Exception:
-    pass
+def _configure(genai, api_key):
+    if GEMINI_API_ENDPOINT:
+        genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+    else:
+        genai.configure(api_key=api_key)
 
 # Windows 系統修復
 if sys.platform.startswith("win"):
@@ -35,147 +90,370 @@ USER_AGENTS = [
 ]
 def get_ua(): return random.choice(USER_AGENTS)
 
+# 上游位址 (可用環境變數指向 stub_upstream.py 的本地假伺服器做離線基準測試)
+GOOGLE_NEWS_URL = os.environ.get("GOOGLE_NEWS_URL", "https://news.google.com")
+ANUE_API_URL = os.environ.get("ANUE_API_URL", "https://ess.api.cnyes.com")
+YAHOO_NEWS_URL = os.environ.get("YAHOO_NEWS_URL", "https://tw.stock.yahoo.com")
+GEMINI_API_ENDPOINT = os.environ.get("GEMINI_API_ENDPOINT")
+
 def is_within_3_days(date_obj):
     if not date_obj: return True
     if date_obj.tzinfo is not None: date_obj = date_obj.replace(tzinfo=None)
     return (datetime.now() - date_obj).days <= 3
 
-# RSS 抓取
-async def fetch_google_rss(stock_code, site_domain, source_name):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(user_agent=get_ua())
-        page = await context.new_page()
+# 共用瀏覽器池 (整個行程一個 Chromium，context 重複使用)；只有需要渲染 DOM 的 Yahoo 用得到
+def heat_browser_pool():
+    global _BROWSER_POOL
+    if _BROWSER_POOL is None:
+        ensure_runtime()
+        import browser_pool
+        _BROWSER_POOL = browser_pool.get_pool(max_contexts=3, idle_seconds=120, user_agent=get_ua)
+    return _BROWSER_POOL
+
+# 共用 HTTP 連線池 (keep-alive / HTTP/2)，RSS 與 JSON 來源不開瀏覽器
+def heat_http_pool():
+    global _HTTP_POOL
+    if _HTTP_POOL is None:
+        ensure_runtime(chromium=False)
+        import http_pool
+        _HTTP_POOL = http_pool.get_pool(timeout=10)
+    return _HTTP_POOL
+
+def pool_stats():
+    """已建立的連線池統計；還沒用到的回傳 None (不會因此載入 Playwright / httpx)"""
+    return {"browser": _BROWSER_POOL.snapshot_stats() if _BROWSER_POOL else None,
+            "http": _HTTP_POOL.snapshot_stats() if _HTTP_POOL else None,
+            "news": _NEWS.snapshot_stats() if _NEWS else None}
+
+def warmup(browser=False):
+    """預先完成依賴檢查與延遲載入 (可丟到背景執行緒)；browser=True 連 Chromium 也先啟動。回傳耗時秒數"""
+    t0 = time.perf_counter()
+    _genai()
+    heat_http_pool()
+    pool = heat_browser_pool()
+    if browser: pool.start()
+    return time.perf_counter() - t0
+
+def parse_rss_item(item, source_name):
+    """RSS <item> → 新聞 dict；過舊或標題太短回傳 None"""
+    title = item.findtext('title') or ""
+    link = item.findtext('link')
+    pub = item.findtext('pubDate')
+    if pub:
         try:
-            rss_url = f"https://news.google.com/rss/search?q={stock_code}+site:{site_domain}&hl=zh-TW&gl=TW&ceid=TW:zh-Hant"
-            response = await page.goto(rss_url, timeout=20000, wait_until="commit")
-            xml_content = await response.text()
-            root = ET.fromstring(xml_content)
-            data = []
-            for item in root.findall('.//item'):
-                title = item.find('title').text
-                link = item.find('link').text
-                pub = item.find('pubDate').text
-                is_fresh = True
-                if pub:
-                    try:
-                        pd = email.utils.parsedate_to_datetime(pub)
-                        if not is_within_3_days(pd): is_fresh = False
-                    except: pass
-                if is_fresh:
-                    clean_title = title.split(" - ")[0]
-                    if len(clean_title) > 4:
-                        desc = item.find('description').text or ""
-                        clean_desc = re.sub(r'<[^>]+>', '', desc)
-                        data.append({"title": clean_title, "snippet": clean_desc[:200], "source": source_name, "link": link})
-            return data[:3]
-        except: return []
-        finally: await browser.close()
+            pd = email.utils.parsedate_to_datetime(pub)
+            if not is_within_3_days(pd): return None
+        except: pass
+    clean_title = title.split(" - ")[0]
+    if len(clean_title) <= 4: return None
+    desc = item.findtext('description') or ""
+    clean_desc = re.sub(r'<[^>]+>', '', desc)
+    return {"title": clean_title, "snippet": clean_desc[:200], "source": source_name, "link": link}
+
+# 條件請求：帶上次的 ETag / Last-Modified，沒變時伺服器回 304
+def conditional_headers(validators):
+    headers = {"User-Agent": get_ua()}
+    if validators.get("etag"): headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"): headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+def response_validators(response):
+    return {"etag": response.headers.get("etag"), "last_modified": response.headers.get("last-modified")}
+
+# RSS 抓取 (邊下載邊解析，湊滿 3 則就中斷下載)
+async def fetch_google_rss_conditional(stock_code, site_domain, source_name, validators=None, limit=3):
+    """回傳 (新聞 list 或 news_feed.NOT_MODIFIED, validators)；失敗時拋出例外"""
+    rss_url = f"{GOOGLE_NEWS_URL}/rss/search?q={stock_code}+site:{site_domain}&hl=zh-TW&gl=TW&ceid=TW:zh-Hant"
+
+    async def parse(response):
+        if response.status_code == 304: return news_feed.NOT_MODIFIED, validators
+        parser = ET.XMLPullParser(events=("end",))
+        data = []
+        async for chunk in response.aiter_bytes():
+            parser.feed(chunk)
+            for _, el in parser.read_events():
+                if el.tag != 'item': continue
+                news = parse_rss_item(el, source_name)
+                el.clear()
+                if news: data.append(news)
+                if len(data) >= limit: return data, response_validators(response)
+        return data, response_validators(response)
+
+    return await heat_http_pool().stream(rss_url, parse, headers=conditional_headers(validators or {}), timeout=20)
+
+async def fetch_google_rss(stock_code, site_domain, source_name, limit=3):
+    try: return (await fetch_google_rss_conditional(stock_code, site_domain, source_name, limit=limit))[0]
+    except: return []
 
 # 媒體爬蟲
+async def fetch_anue_conditional(stock_code, validators=None):
+    url = f"{ANUE_API_URL}/ess/api/v1/news/keyword?q={stock_code}&limit=10&page=1"
+
+    async def read(response):
+        if response.status_code == 304: return news_feed.NOT_MODIFIED, validators
+        body = json.loads(await response.aread())
+        items = body.get('data', {}).get('items', [])
+        result = []
+        limit_ts = int(time.time()) - (3 * 86400)
+        for item in items:
+            if item.get('publishAt', 0) >= limit_ts:
+                result.append({"title": item['title'], "snippet": item.get('summary', ''), "source": "鉅亨網", "link": f"https://news.cnyes.com/news/id/{item['newsId']}"})
+        return result[:3], response_validators(response)
+
+    return await heat_http_pool().stream(url, read, headers=conditional_headers(validators or {}), timeout=5)
+
 async def scrape_anue(stock_code):
-    try:
-        url = f"https://ess.api.cnyes.com/ess/api/v1/news/keyword?q={stock_code}&limit=10&page=1"
-        res = requests.get(url, headers={"User-Agent": get_ua()}, timeout=5)
-        if res.status_code == 200:
-            items = res.json().get('data', {}).get('items', [])
-            result = []
-            limit_ts = int(time.time()) - (3 * 86400)
-            for item in items:
-                if item.get('publishAt', 0) >= limit_ts:
-                    result.append({"title": item['title'], "snippet": item.get('summary', ''), "source": "鉅亨網", "link": f"https://news.cnyes.com/news/id/{item['newsId']}"})
-            return result[:3]
+    try: return (await fetch_anue_conditional(stock_code))[0]
     except: pass
     return []
 
+async def scrape_yahoo_page(stock_code):
+    """Yahoo 新聞頁要渲染 DOM 才有內容，只能走瀏覽器 (沒有條件請求)；失敗時拋出例外"""
+    pool = heat_browser_pool()
+
+    async def scrape(page):
+        await pool.goto(page, f"{YAHOO_NEWS_URL}/quote/{stock_code}.TW/news", timeout=20000)
+        data = []
+        els = await page.locator('#main-2-QuoteNews-Proxy a[href*="/news/"]').all()
+        seen = set()
+        for el in els[:3]:
+            t = await el.inner_text()
+            h = await el.get_attribute("href")
+            title = max(t.split('\n'), key=len) if t else ""
+            if len(title) > 5 and title not in seen:
+                seen.add(title)
+                data.append({"title": title, "snippet": "Yahoo 焦點", "source": "Yahoo", "link": h})
+        return data
+
+    return await pool.run(scrape)
+
 async def scrape_yahoo(stock_code):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(user_agent=get_ua())
-        page = await context.new_page()
-        try:
-            await page.goto(f"https://tw.stock.yahoo.com/quote/{stock_code}.TW/news", timeout=20000)
-            data = []
-            els = await page.locator('#main-2-QuoteNews-Proxy a[href*="/news/"]').all()
-            seen = set()
-            for el in els[:3]:
-                t = await el.inner_text()
-                h = await el.get_attribute("href")
-                title = max(t.split('\n'), key=len) if t else ""
-                if len(title) > 5 and title not in seen:
-                    seen.add(title)
-                    data.append({"title": title, "snippet": "Yahoo 焦點", "source": "Yahoo", "link": h})
-            return data
-        except: return []
-        finally: await browser.close()
-
-# 整合執行
-async def run_analysis(stock_code):
-    tasks = [
-        scrape_anue(stock_code), scrape_yahoo(stock_code),
-        fetch_google_rss(stock_code, "money.udn.com", "經濟日報"),
-        fetch_google_rss(stock_code, "ec.ltn.com.tw", "自由財經"),
-        fetch_google_rss(stock_code, "ctee.com.tw", "工商時報")
-    ]
-    return await asyncio.gather(*tasks)
-
-# 關鍵字備用評分
+    try: return await scrape_yahoo_page(stock_code)
+    except: return []
+
+# 整合執行：各來源各自快取 (TTL 依更新頻率)，先到先交付，超過期限就用已到的新聞
+def _rss_source(site_domain, source_name, ttl):
+    async def fetch(code, validators):
+        return await fetch_google_rss_conditional(code, site_domain, source_name, validators)
+    return news_feed.NewsSource(source_name, fetch, ttl)
+
+async def _fetch_yahoo(code, validators):
+    return await scrape_yahoo_page(code), {}
+
+NEWS_SOURCES = [
+    news_feed.NewsSource("鉅亨網", fetch_anue_conditional, ttl=120),
+    news_feed.NewsSource("Yahoo", _fetch_yahoo, ttl=300),
+    _rss_source("money.udn.com", "經濟日報", ttl=600),
+    _rss_source("ec.ltn.com.tw", "自由財經", ttl=600),
+    _rss_source("ctee.com.tw", "工商時報", ttl=600),
+]
+
+def heat_news():
+    global _NEWS
+    if _NEWS is None: _NEWS = news_feed.NewsAggregator(NEWS_SOURCES)
+    return _NEWS
+
+def stream_news(stock_code, deadline=None):
+    """async generator：依完成先後 yield (來源名稱, 去重後的新聞 list)"""
+    return heat_news().stream(stock_code, deadline)
+
+async def run_analysis(stock_code, deadline=None, status=None):
+    """每個來源一個新聞 list (跨來源依連結去重)；期限內沒回來的來源不等。status 見 news_feed.stream"""
+    return list((await heat_news().collect(stock_code, deadline, status)).values())
+
+# 關鍵字備用評分 (詞庫與權重見 lexicon.py，可用 LEXICON_PATH 換成自己的詞庫檔)
 def calculate_score_keyword_fallback(news_list):
-    if not news_list: return 50
-    pos = ["上漲", "飆", "創高", "買超", "強勢", "利多", "成長", "漲停", "旺", "攻頂", "受惠", "看好", "翻紅", "驚艷", "AI", "擴產", "獲利", "大漲"]
-    neg = ["下跌", "賣", "砍", "觀望", "保守", "重挫", "外資賣", "縮減", "崩", "跌停", "疲軟", "利空", "修正", "衰退", "翻黑", "示警", "虧損", "大跌"]
-    score = 50
-    for n in news_list:
-        txt = n['title'] + str(n.get('snippet', ''))
-        for w in pos: 
-            if w in txt: score += 5
-        for w in neg: 
-            if w in txt: score -= 5
-    return max(0, min(100, score))
+    return lexicon.get_lexicon().score(news_list)
 
-# AI 評分 (🔥 終極版：自動尋找可用模型)
-def analyze_with_gemini_requests(api_key, stock_name, news_data):
-    txt = "\n".join([f"{i+1}. [{n['source']}] {n['title']}" for i, n in enumerate(news_data)])
-    prompt = f"分析「{stock_name}」最新新聞情緒(0-100分)。新聞：\n{txt}\n\n格式：\nSCORE: [分數]\nSUMMARY: [簡短總結]"
-    
-    try:
-        # 設定 Key
-        genai.configure(api_key=api_key)
-        
-        # 🔥 關鍵步驟：自動詢問 Google 有哪些模型可用
-        target_model_name = None
+# --- Gemini 模型解析快取 ---
+# list_models() 是一次網路往返，解析結果與 GenerativeModel 物件依 API Key 快取，
+# 超過 MODEL_REFRESH_SECONDS 重新解析；生成時回報模型不存在就作廢重找一次。
+MODEL_REFRESH_SECONDS = 3600
+_MODELS = {}   # api_key -> (model_name, GenerativeModel, resolved_at)
+_MODELS_LOCK = threading.Lock()
+LAST_GEMINI_TIMINGS = {}
+
+def _pick_model(genai):
+    """優先 Flash，其次 Pro，都沒有就拿第一個支援生成的"""
+    first_pro = first_any = None
+    for m in genai.list_models():
+        if 'generateContent' not in m.supported_generation_methods: continue
+        if 'flash' in m.name: return m.name
+        if 'pro' in m.name and not first_pro: first_pro = m.name
+        if not first_any: first_any = m.name
+    return first_pro or first_any
+
+def resolve_model(api_key, force=False):
+    """回傳 (model_name, GenerativeModel)，沒有可用模型時 model_name 為 None"""
+    genai = _genai()
+    with _MODELS_LOCK:
+        cached = _MODELS.get(api_key)
+        if cached and not force and time.time() - cached[2] < MODEL_REFRESH_SECONDS:
+            return cached[0], cached[1]
+        _configure(genai, api_key)
+        name = _pick_model(genai)
+        if not name: return None, None
+        model = genai.GenerativeModel(name)
+        _MODELS[api_key] = (name, model, time.time())
+        return name, model
+
+def invalidate_model(api_key):
+    with _MODELS_LOCK: _MODELS.pop(api_key, None)
+
+def _is_model_missing(e):
+    from google.api_core import exceptions as google_exceptions
+    return isinstance(e, google_exceptions.NotFound)
+
+class ModelUnavailable(Exception):
+    """列不出模型清單或沒有可用的文字生成模型"""
+
+def _generate(api_key, prompt, timings):
+    """用快取的模型生成，回傳 (response, model_name)；模型被下架時作廢快取重找一次"""
+    genai = _genai()
+    for attempt in range(2):
+        # 🔥 關鍵步驟：自動詢問 Google 有哪些模型可用 (有快取就不用再問)
+        t0 = time.perf_counter()
         try:
-            # 遍歷所有可用模型，優先找 Flash 或 Pro
-            for m in genai.list_models():
-                if 'generateContent' in m.supported_generation_methods:
-                    if 'flash' in m.name:
-                        target_model_name = m.name
-                        break
-                    elif 'pro' in m.name and not target_model_name:
-                        target_model_name = m.name
-            
-            # 如果都沒找到，隨便拿第一個支援生成的
-            if not target_model_name:
-                for m in genai.list_models():
-                    if 'generateContent' in m.supported_generation_methods:
-                        target_model_name = m.name
-                        break
+            target_model_name, model = resolve_model(api_key, force=attempt > 0)
         except Exception as e:
-            # 萬一連 listing 都失敗，只能盲猜一個最舊的
-            return None, f"無法列出模型清單: {str(e)}", "error"
+            # 萬一連 listing 都失敗，只能放棄
+            raise ModelUnavailable(f"無法列出模型清單: {str(e)}")
+        finally:
+            timings["discovery"] += time.perf_counter() - t0
 
         if not target_model_name:
-            return None, "您的 API Key 下沒有任何可用的文字生成模型", "error"
+            raise ModelUnavailable("您的 API Key 下沒有任何可用的文字生成模型")
 
         # 開始生成
-        model = genai.GenerativeModel(target_model_name)
-        response = model.generate_content(prompt)
-            
+        t0 = time.perf_counter()
+        try:
+            _configure(genai, api_key)
+            return model.generate_content(prompt), target_model_name
+        except Exception as e:
+            if attempt == 0 and _is_model_missing(e):
+                invalidate_model(api_key)
+                continue
+            raise
+        finally:
+            timings["generation"] += time.perf_counter() - t0
+
+# AI 評分 (🔥 終極版：自動尋找可用模型)
+def analyze_with_gemini_requests(api_key, stock_name, news_data):
+    txt = "\n".join([f"{i+1}. [{n['source']}] {n['title']}" for i, n in enumerate(news_data)])
+    prompt = f"分析「{stock_name}」最新新聞情緒(0-100分)。新聞：\n{txt}\n\n格式：\nSCORE: [分數]\nSUMMARY: [簡短總結]"
+    timings = {"discovery": 0.0, "generation": 0.0}
+    LAST_GEMINI_TIMINGS.clear()
+
+    try:
+        response, target_model_name = _generate(api_key, prompt, timings)
         content = response.text
         match = re.search(r"SCORE:\s*(\d+)", content)
         score = int(match.group(1)) if match else 50
-        
+
         return score, content, target_model_name
 
+    except ModelUnavailable as e:
+        return None, str(e), "error"
     except Exception as e:
-        return None, f"SDK Error: {str(e)}", "error"
\ No newline at end of file
+        return None, f"SDK Error: {str(e)}", "error"
+    finally:
+        LAST_GEMINI_TIMINGS.update(timings)
+
+# --- 多檔批次評分 (掃描結果一次全部打分) ---
+BATCH_NEWS_CONCURRENCY = 4     # 同時爬幾檔的新聞
+GEMINI_BATCH_SIZE = 5          # 一個 Gemini prompt 塞幾檔
+GEMINI_BATCH_WORKERS = 3
+LAST_BATCH_STATS = {}
+
+async def gather_news_batch(stock_codes, concurrency=BATCH_NEWS_CONCURRENCY, delivered=None):
+    """{代號: [新聞...]}，最多同時 concurrency 檔在跑 run_analysis；delivered 給 dict 時填入 {代號: {來源: 新聞}} (準時交付的來源)"""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(code):
+        status = {}
+        async with sem:
+            try: results = await run_analysis(code, status=status)
+            except Exception: results = []
+        if delivered is not None: delivered[code] = status.get("delivered", {})
+        return code, [n for res in results if isinstance(res, list) for n in res]
+
+    return dict(await asyncio.gather(*[one(c) for c in stock_codes]))
+
+def _symbol_key(symbol):
+    """模型回的代號不一定照抄：'2330.TW'、'2330'、' 2330.tw ' 都對到同一檔"""
+    return str(symbol).strip().split('.')[0].strip().upper()
+
+def analyze_batch_with_gemini(api_key, news_by_symbol, names=None, timings=None):
+    """一個 prompt 評多檔，回傳 ({代號: (分數, 總結)}, model_name)；沒解析到的代號不在結果裡"""
+    names = names or {}
+    timings = timings if timings is not None else {"discovery": 0.0, "generation": 0.0}
+    blocks = []
+    for symbol, news in news_by_symbol.items():
+        txt = "\n".join([f"{i+1}. [{n['source']}] {n['title']}" for i, n in enumerate(news)])
+        blocks.append(f"### {symbol} {names.get(symbol, '')}\n{txt}")
+    prompt = ("分別分析下列每檔股票最新新聞情緒(0-100分)。\n\n" + "\n\n".join(blocks) +
+              '\n\n只回覆 JSON，格式：{"代號": {"score": 分數, "summary": "簡短總結"}, ...}')
+    response, model_name = _generate(api_key, prompt, timings)
+    content = response.text
+    try:
+        parsed = json.loads(content[content.index("{"):content.rindex("}") + 1])
+    except ValueError:
+        return {}, model_name
+    parsed = {_symbol_key(k): v for k, v in parsed.items()}
+    result = {}
+    for symbol in news_by_symbol:
+        item = parsed.get(_symbol_key(symbol))
+        if not isinstance(item, dict): continue
+        try: score = max(0, min(100, int(item.get("score"))))
+        except (TypeError, ValueError): continue
+        result[symbol] = (score, str(item.get("summary", "")))
+    return result, model_name
+
+def score_symbols(api_key, symbols, names=None, concurrency=BATCH_NEWS_CONCURRENCY, batch_size=GEMINI_BATCH_SIZE):
+    """批次評分 (symbols 如 '2330.TW')。新聞沒變的沿用情緒快取，其餘分批丟 Gemini，
+    失敗或沒有 Key 的改用關鍵字評分。回傳 {symbol: {'score', 'source', 'summary', 'news'}}"""
+    t0 = time.perf_counter()
+    codes = {s: s.split('.')[0] for s in symbols}
+    delivered = {}
+    news = asyncio.run(gather_news_batch(list(dict.fromkeys(codes.values())), concurrency, delivered))
+    t_news = time.perf_counter() - t0
+    cache = sentiment_cache.get_cache()
+    results, pending = {}, {}
+    for symbol, code in codes.items():
+        items = news.get(code, [])
+        # 只對準時交付的來源算指紋，逾時或失敗的來源不影響比對
+        fingerprint = sentiment_cache.source_fingerprints(delivered.get(code, {}))
+        cached = cache.get(symbol, fingerprint) if items else None
+        if cached is not None:
+            results[symbol] = {"score": cached["score"], "source": "cache", "summary": cached["summary"], "news": len(items)}
+        elif items and api_key:
+            pending[symbol] = (items, fingerprint)
+
+    timings = {"discovery": 0.0, "generation": 0.0}
+    def run_batch(chunk):
+        t = {"discovery": 0.0, "generation": 0.0}
+        try: return (*analyze_batch_with_gemini(api_key, {s: pending[s][0] for s in chunk}, names, t), t)
+        except Exception: return {}, None, t
+
+    chunks = [list(pending)[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    if chunks:
+        with ThreadPoolExecutor(max_workers=min(GEMINI_BATCH_WORKERS, len(chunks))) as ex:
+            for scored, model_name, t in ex.map(run_batch, chunks):
+                for k in timings: timings[k] += t[k]
+                for symbol, (score, summary) in scored.items():
+                    cache.put(symbol, pending[symbol][1], score, summary, model_name)
+                    results[symbol] = {"score": score, "source": "ai", "summary": summary, "news": len(pending[symbol][0])}
+
+    # 備用：關鍵字評分，剩下的代號一次批次評完 (不寫入情緒快取，下次有 AI 時才會重評)
+    rest = [s for s in codes if s not in results]
+    rest_news = [news.get(codes[s], []) for s in rest]
+    for symbol, items, score in zip(rest, rest_news, lexicon.get_lexicon().score_batch(rest_news)):
+        results[symbol] = {"score": score, "source": "keyword", "summary": "", "news": len(items)}
+
+    LAST_BATCH_STATS.clear()
+    LAST_BATCH_STATS.update({"symbols": len(codes), "gemini_calls": len(chunks), "news": t_news,
+                             **timings, "total": time.perf_counter() - t0,
+                             **{k: sum(r["source"] == k for r in results.values()) for k in ("cache", "ai", "keyword")}})
+    return {s: results[s] for s in codes}
+
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_T0
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import threading
+import pandas as pd
+from fugle_marketdata import WebSocketClient
+import bar_store
+
+# --- WebSocket 串流接收：逐筆成交 → 本地 1 分 K ---
+# 收盤一根就寫進倉庫並通知 on_bar，訊號由新 K 棒觸發重算而不是靠計時器輪詢。
+# FUGLE_WS_URL 可指向 mock_feed.py 的本地回放伺服器做離線測試。
+
+FUGLE_WS_URL = os.environ.get("FUGLE_WS_URL")
+# 盤中超過這麼久沒收到任何訊息就視為斷線，改回 REST 輪詢
+STALE_SECONDS = 30
+MINUTE_US = 60_000_000
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+class MinuteBarBuilder:
+    """把同一分鐘內的成交聚合成一根 OHLCV"""
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.minute = None
+        self.bar = None
+        # 最後一根已寫出的 K 棒：別檔成交推進市場時鐘後才到的遲到成交要併進它，不能另開一根蓋掉
+        self.published = None
+        self.late_dropped = 0
+
+    @staticmethod
+    def _merge(bar, price, size):
+        if price > bar[1]: bar[1] = price
+        if price < bar[2]: bar[2] = price
+        bar[3] = price
+        bar[4] += size
+
+    def add_trade(self, time_us, price, size):
+        """回傳因為跨分鐘而收盤的 K 棒 (minute, [o,h,l,c,v])，或被遲到成交修正過的上一根；沒有則回傳 None"""
+        minute = time_us // MINUTE_US
+        if minute == self.minute:
+            self._merge(self.bar, price, size)
+            return None
+        if (self.minute is not None and minute < self.minute) or (self.published is not None and minute <= self.published[0]):
+            return self._late(minute, price, size)
+        closed = self.close()
+        self.minute = minute
+        self.bar = [price, price, price, price, size]
+        return closed
+
+    def _late(self, minute, price, size):
+        """上一根已寫出的分鐘：併進去後重寫 (倉庫最後幾根可覆寫)；更早的就丟掉"""
+        if self.published is None or minute != self.published[0]:
+            self.late_dropped += 1
+            return None
+        self._merge(self.published[1], price, size)
+        return (minute, list(self.published[1]))
+
+    def close(self):
+        if self.minute is None: return None
+        closed = (self.minute, self.bar)
+        self.published = (self.minute, list(self.bar))
+        self.minute, self.bar = None, None
+        return closed
+
+def bars_to_frame(bars):
+    """[(minute, [o,h,l,c,v]), ...] → 與 get_fugle_kline 相同形狀的 DataFrame"""
+    index = pd.to_datetime([m * MINUTE_US for m, _ in bars], unit='us', utc=True).tz_convert('Asia/Taipei')
+    index.name = 'Date'
+    return pd.DataFrame([b for _, b in bars], index=index, columns=COLUMNS, dtype=float)
+
+class StreamIngest:
+    def __init__(self, api_key, symbols, base_url=FUGLE_WS_URL, on_bar=None, record_path=None):
+        self.api_key = api_key.strip()
+        self.symbols = list(symbols)
+        self.base_url = base_url
+        self.on_bar = on_bar
+        self.record_path = record_path
+        self.store = bar_store.get_store()
+        self.builders = {s: MinuteBarBuilder(s) for s in self.symbols}
+        self.client = None
+        self.connected = False
+        self.last_message_at = 0.0
+        self.market_minute = None
+        self.stats = {"messages": 0, "trades": 0, "bars": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self._record = None
+
+    # --- 連線 ---
+    def start(self):
+        options = {"api_key": self.api_key}
+        if self.base_url: options["base_url"] = self.base_url
+        self.client = WebSocketClient(**options).stock
+        self.client.on("message", self._on_message)
+        self.client.on("disconnect", self._on_disconnect)
+        self.client.on("error", self._on_error)
+        if self.record_path: self._record = open(self.record_path, "a", encoding="utf-8")
+        self.client.connect()
+        self.connected = True
+        if self.symbols: self.client.subscribe({"channel": "trades", "symbols": self.symbols})
+        return self
+
+    def add_symbol(self, symbol):
+        """追加訂閱 (已訂閱則略過)"""
+        with self._lock:
+            if symbol in self.builders: return
+            self.builders[symbol] = MinuteBarBuilder(symbol)
+            self.symbols.append(symbol)
+        if self.connected: self.client.subscribe({"channel": "trades", "symbol": symbol})
+
+    def stop(self):
+        self.connected = False
+        if self.client is not None: self.client.disconnect()
+        self.flush()
+        if self._record: self._record.close(); self._record = None
+
+    def _on_disconnect(self, *args):
+        self.connected = False
+
+    def _on_error(self, error):
+        self.stats["errors"] += 1
+
+    def is_live(self, symbol=None):
+        """串流正常且 (盤中) 持續有訊息進來；symbol 需在訂閱清單中"""
+        if not self.connected: return False
+        if symbol is not None and symbol not in self.builders: return False
+        if bar_store.in_session() and time.time() - self.last_message_at > STALE_SECONDS: return False
+        return True
+
+    # --- 訊息處理 ---
+    def _on_message(self, raw):
+        self.last_message_at = time.time()
+        self.stats["messages"] += 1
+        if self._record: self._record.write(raw if isinstance(raw, str) else raw.decode("utf-8")); self._record.write("\n")
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            self.stats["errors"] += 1
+            return
+        if message.get("event") != "data" or message.get("channel") != "trades": return
+        data = message.get("data") or {}
+        if "price" not in data or "time" not in data: return
+        self.on_trade(data["symbol"], int(data["time"]), float(data["price"]), float(data.get("size", 0)))
+
+    def on_trade(self, symbol, time_us, price, size):
+        builder = self.builders.get(symbol)
+        if builder is None: return
+        closed = []
+        with self._lock:
+            self.stats["trades"] += 1
+            bar = builder.add_trade(time_us, price, size)
+            if bar: closed.append((symbol, bar))
+            # 以行情時間推進市場時鐘，冷門股沒有新成交也能準時收 K
+            minute = time_us // MINUTE_US
+            if self.market_minute is None or minute > self.market_minute:
+                self.market_minute = minute
+                for s, b in self.builders.items():
+                    if b.minute is not None and b.minute < minute:
+                        closed.append((s, b.close()))
+        for s, bar in closed: self._publish(s, [bar])
+
+    def flush(self):
+        with self._lock:
+            closed = [(s, b.close()) for s, b in self.builders.items() if b.minute is not None]
+        for s, bar in closed: self._publish(s, [bar])
+
+    def _publish(self, symbol, bars):
+        self.store.write_intraday(symbol, bars_to_frame(bars))
+        self.stats["bars"] += len(bars)
+        if self.on_bar:
+            try: self.on_bar(symbol)
+            except Exception: self.stats["errors"] += 1
+
+    # --- 讀取 ---
+    def frame(self, symbol):
+        """倉庫中已收盤的 K 棒，加上正在形成中的那一根 (只取形成中那根所屬的交易日)"""
+        day, df = self.store.latest_intraday(symbol)
+        with self._lock:
+            builder = self.builders.get(symbol)
+            forming = (builder.minute, list(builder.bar)) if builder and builder.minute is not None else None
+        if forming is None: return df
+        tail = bars_to_frame([forming])
+        forming_day = bar_store.day_of(tail.index[0])
+        # 形成中的是舊日殘留就不接；今天第一根還沒寫進倉庫時，最新一天是昨天，不能把兩天接在一起算 VWAP
+        if day is not None and day > forming_day: return df
+        if day != forming_day or df is None or df.empty: return tail
+        if tail.index[0] <= df.index[-1]: return df
+        return pd.concat([df, tail])
+
+_ACTIVE = None
+
+def set_active(ingest):
+    global _ACTIVE
+    _ACTIVE = ingest
+
+def get_active():
+    """目前行程中運作的串流 (沒有則為 None，呼叫端退回輪詢)"""
+    return _ACTIVE
@@ -0,0 +1,217 @@
+import json
+import time
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from xml.sax.saxutils import escape
+import numpy as np
+import pandas as pd
+import requests
+import synthetic_market
+
+# --- 本地假上游：以錄製好的回應代替 Yahoo / 富果 REST / Google News RSS / 鉅亨 / Yahoo 新聞頁 / Gemini ---
+# 回應存成 {路徑: {status, headers, body}}，可存檔、載入；預設由 synthetic_market 產生。
+# 每條路由可設固定延遲模擬網路，支援 ETag / If-None-Match (304)。
+# 以 env() 的環境變數啟動 app 或 bench.py，所有上游都打到本機：
+#   FUGLE_REST_URL / GOOGLE_NEWS_URL / ANUE_API_URL / YAHOO_NEWS_URL / GEMINI_API_ENDPOINT
+# yfinance 的網址寫死在套件裡無法改，改用 YahooStub 取代 analyzer.yf (同樣經由本伺服器取資料)。
+
+GEMINI_MODEL = "models/gemini-1.5-flash"
+NEWS_SITES = {"money.udn.com": "經濟日報", "ec.ltn.com.tw": "自由財經", "ctee.com.tw": "工商時報"}
+
+def route_key(path, query):
+    """錄製檔的 key：路徑加上會影響回應的查詢參數"""
+    q = parse_qs(query)
+    if path.startswith("/yahoo/v8/finance/chart/"): return f"{path}?interval={q.get('interval', ['1m'])[0]}"
+    if path.startswith("/gnews/") or path.startswith("/anue/"): return f"{path}?q={q.get('q', [''])[0]}"
+    return path
+
+def _json(body):
+    return {"status": 200, "headers": {"Content-Type": "application/json"}, "body": json.dumps(body, ensure_ascii=False)}
+
+# --- 錄製檔 ---
+def fugle_candles(symbol, df):
+    return _json({"symbol": symbol, "type": "EQUITY", "timeframe": "1", "data": [
+        {"date": ts.isoformat(), "open": r.Open, "high": r.High, "low": r.Low, "close": r.Close, "volume": int(r.Volume)}
+        for ts, r in zip(df.index, df.itertuples())]})
+
+def yahoo_chart(symbol, df):
+    ts = [int(t.timestamp()) for t in df.index]
+    quote = {k.lower(): df[k].round(4).tolist() for k in synthetic_market.COLUMNS}
+    return _json({"chart": {"result": [{"meta": {"symbol": symbol, "regularMarketPrice": float(df['Close'].iloc[-1])},
+                                        "timestamp": ts, "indicators": {"quote": [quote]}}], "error": None}})
+
+def rss_feed(news):
+    items = "".join(f"<item><title>{escape(n['title'])} - {escape(n['source'])}</title><link>{escape(n['link'])}</link>"
+                    f"<pubDate>{pd.Timestamp.now(tz='UTC').strftime('%a, %d %b %Y %H:%M:%S GMT')}</pubDate>"
+                    f"<description>{escape(n['snippet'])}</description></item>" for n in news)
+    body = f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>stub</title>{items}</channel></rss>'
+    return {"status": 200, "headers": {"Content-Type": "application/rss+xml; charset=UTF-8"}, "body": body}
+
+def anue_news(news):
+    now = int(time.time())
+    return _json({"data": {"items": [{"newsId": 1000 + i, "title": n['title'], "summary": n['snippet'], "publishAt": now - 600}
+                                     for i, n in enumerate(news)]}})
+
+def yahoo_news_page(news):
+    links = "".join(f'<li><a href="/news/stub-{i}.html">{escape(n["title"])}</a></li>' for i, n in enumerate(news))
+    return {"status": 200, "headers": {"Content-Type": "text/html; charset=utf-8"},
+            "body": f'<html><body><div id="main-2-QuoteNews-Proxy"><ul>{links}</ul></div></body></html>'}
+
+def gemini_models():
+    return _json({"models": [{"name": GEMINI_MODEL, "displayName": "Gemini Flash (stub)", "version": "001",
+                              "supportedGenerationMethods": ["generateContent", "countTokens"],
+                              "inputTokenLimit": 1048576, "outputTokenLimit": 8192}]})
+
+def gemini_reply(text):
+    return _json({"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP", "index": 0}],
+                  "usageMetadata": {"promptTokenCount": 100, "candidatesTokenCount": 20, "totalTokenCount": 120}})
+
+def synthetic_recording(symbols, seed=0, day='2026-10-16', minutes=synthetic_market.SESSION_MINUTES):
+    """symbols 為純代號 (如 '2330')；每檔盤型依序輪替，新聞也是合成的"""
+    rec = {}
+    for k, code in enumerate(symbols):
+        kind = synthetic_market.KINDS[k % len(synthetic_market.KINDS)]
+        session = synthetic_market.make_session(kind, minutes, seed + k, day)
+        daily = synthetic_market.make_daily(70, seed + k, day)
+        rec[f"/fugle/intraday/candles/{code}"] = fugle_candles(code, session)
+        for suffix in (".TW", ".TWO"):
+            rec[f"/yahoo/v8/finance/chart/{code}{suffix}?interval=1m"] = yahoo_chart(code + suffix, session)
+            rec[f"/yahoo/v8/finance/chart/{code}{suffix}?interval=1d"] = yahoo_chart(code + suffix, daily)
+        news = synthetic_market.make_headlines(12, seed + k)
+        for j, (site, name) in enumerate(NEWS_SITES.items()):
+            rec[f"/gnews/rss/search?q={code} site:{site}"] = rss_feed([{**n, "source": name} for n in news[3 * j:3 * j + 3]])
+        rec[f"/anue/ess/api/v1/news/keyword?q={code}"] = anue_news(news[9:12])
+        rec[f"/tw-yahoo/quote/{code}.TW/news"] = yahoo_news_page(news[:3])
+    rec["/v1beta/models"] = gemini_models()
+    rec[f"/v1beta/{GEMINI_MODEL}:generateContent"] = gemini_reply("SCORE: 72\nSUMMARY: 合成新聞偏多，法人買超")
+    return rec
+
+def save_recording(rec, path):
+    with open(path, "w", encoding="utf-8") as f: json.dump(rec, f, ensure_ascii=False)
+
+def load_recording(path):
+    with open(path, encoding="utf-8") as f: return json.load(f)
+
+# --- 伺服器 ---
+class StubUpstream:
+    def __init__(self, recording, latency=None, host="127.0.0.1", port=0):
+        self.recording = recording
+        self.latency = latency or {}     # 路徑前綴 -> 秒
+        self.hits = {}
+        self.not_modified = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            def log_message(self, *args): pass
+            def do_GET(self): stub._serve(self)
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                stub._serve(self)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """讓 fugle_client / stock_heat_analyzer 改打本機的環境變數 (需在 import 前設定)"""
+        return {"FUGLE_REST_URL": f"{self.url}/fugle", "GOOGLE_NEWS_URL": f"{self.url}/gnews",
+                "ANUE_API_URL": f"{self.url}/anue", "YAHOO_NEWS_URL": f"{self.url}/tw-yahoo",
+                "GEMINI_API_ENDPOINT": self.url}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="stub-upstream", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _serve(self, req):
+        parts = urlsplit(req.path)
+        key = route_key(parts.path, parts.query)
+        prefix = "/" + parts.path.split("/")[1]
+        with self._lock: self.hits[prefix] = self.hits.get(prefix, 0) + 1
+        delay = self.latency.get(prefix, 0)
+        if delay: time.sleep(delay)
+        entry = self.recording.get(key)
+        if entry is None:
+            body, status, headers = b'{"message": "not recorded"}', 404, {"Content-Type": "application/json"}
+        else:
+            body, status, headers = entry["body"].encode("utf-8"), entry["status"], entry["headers"]
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        if status == 200 and req.headers.get("If-None-Match") == etag:
+            with self._lock: self.not_modified += 1
+            req.send_response(304)
+            req.send_header("ETag", etag)
+            req.send_header("Content-Length", "0")
+            req.end_headers()
+            return
+        req.send_response(status)
+        for k, v in headers.items(): req.send_header(k, v)
+        req.send_header("ETag", etag)
+        req.send_header("Content-Length", str(len(body)))
+        req.end_headers()
+        req.wfile.write(body)
+
+# --- yfinance 替身 (只實作 analyzer 用到的介面) ---
+def _chart_frame(body, tz=synthetic_market.TZ):
+    result = body["chart"]["result"][0]
+    quote = result["indicators"]["quote"][0]
+    index = pd.to_datetime(np.array(result["timestamp"], dtype=np.int64), unit="s", utc=True).tz_convert(tz)
+    return pd.DataFrame({k: quote[k.lower()] for k in synthetic_market.COLUMNS}, index=pd.DatetimeIndex(index, name="Date"), dtype=float)
+
+class YahooStub:
+    def __init__(self, base_url, timeout=5):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.timeout = timeout
+
+    def _chart(self, symbol, interval):
+        res = self.session.get(f"{self.base_url}/yahoo/v8/finance/chart/{symbol}", params={"interval": interval}, timeout=self.timeout)
+        if res.status_code != 200: return pd.DataFrame(columns=synthetic_market.COLUMNS)
+        return _chart_frame(res.json())
+
+    def download(self, tickers, interval="1d", group_by="column", **kwargs):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        frames = {t: self._chart(t, interval) for t in tickers}
+        if len(tickers) == 1 and group_by != "ticker": return frames[tickers[0]]
+        return pd.concat(frames, axis=1)
+
+    def Ticker(self, symbol):
+        stub = self
+
+        class _FastInfo:
+            @property
+            def last_price(self):
+                df = stub._chart(symbol, "1m")
+                return float(df['Close'].iloc[-1]) if len(df) else float('nan')
+
+        class _Ticker:
+            fast_info = _FastInfo()
+            def history(self, interval="1d", **kwargs): return stub._chart(symbol, interval)
+
+        return _Ticker()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="本地假上游 (錄製回應)")
+    parser.add_argument("--recording", help="錄製檔 JSON；沒給就用合成資料")
+    parser.add_argument("--symbols", default="2330,2317,2454", help="合成資料的代號")
+    parser.add_argument("--save", help="把合成錄製檔存到這裡")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+    rec = load_recording(args.recording) if args.recording else synthetic_recording(args.symbols.split(","))
+    if args.save: save_recording(rec, args.save)
+    stub = StubUpstream(rec, port=args.port).start()
+    for k, v in stub.env().items(): print(f"{k}={v}")
+    threading.Event().wait()
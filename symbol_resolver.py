@@ -0,0 +1,156 @@
+import threading
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+import twstock
+
+# --- 代號 / 名稱索引 ---
+# 啟動時建一次：代號與完整名稱 O(1) 查表、前綴樹 (每個節點預存前幾名)、
+# 名稱 n-gram 倒排索引做模糊搜尋。上市 (含創新板) 用 .TW，上櫃用 .TWO。
+# 名稱與查詢字串一律先 _normalize (NFKC + 大寫)：全形「Ｆ-」、「-KY」、大小寫混用的英文名才對得上。
+
+SUGGEST_LIMIT = 8
+# 建議清單只收這些類別，權證有好幾萬檔會把真正的股票擠掉 (代號仍可直接查)
+SEARCHABLE_TYPES = {'股票', 'ETF', '創新板', '特別股', '臺灣存託憑證(TDR)', 'ETN', '受益證券-不動產投資信託'}
+TYPE_RANK = {'股票': 0, 'ETF': 1, '創新板': 1}
+# 全市場掃描的範圍 (無頭訊號服務)
+UNIVERSE_MARKETS = ('上市', '上櫃')
+UNIVERSE_TYPES = ('股票',)
+
+@dataclass(frozen=True)
+class SymbolInfo:
+    code: str
+    name: str
+    market: str
+    type: str
+
+    @property
+    def suffix(self):
+        return '.TWO' if self.market == '上櫃' else '.TW'
+
+    @property
+    def symbol(self):
+        return f"{self.code}{self.suffix}"
+
+def _normalize(text):
+    return unicodedata.normalize('NFKC', str(text)).strip().upper()
+
+def _ngrams(text, n=2):
+    text = _normalize(text)
+    if len(text) < n: return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+def _edit_distance(a, b):
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+class SymbolResolver:
+    def __init__(self, codes=None):
+        codes = twstock.codes if codes is None else codes
+        self.by_code = {}
+        self.by_name = {}
+        self._trie = {}
+        self._grams = defaultdict(set)
+        self._searchable = []
+        for code, info in codes.items():
+            entry = SymbolInfo(code, info.name, info.market, info.type)
+            self.by_code[code] = entry
+            if info.type in SEARCHABLE_TYPES: self._searchable.append(entry)
+        # 依排名順序插入，前綴樹每個節點的前 SUGGEST_LIMIT 個就是最好的建議
+        self._searchable.sort(key=self._rank)
+        for entry in self._searchable:
+            self.by_name.setdefault(_normalize(entry.name), entry)
+            for key in (entry.code, _normalize(entry.name)):
+                node = self._trie
+                for ch in key:
+                    node = node.setdefault(ch, {})
+                    top = node.setdefault('', [])
+                    if len(top) < SUGGEST_LIMIT and entry not in top: top.append(entry)
+            for gram in _ngrams(entry.name) | _ngrams(entry.name, 1) | _ngrams(entry.code):
+                self._grams[gram].add(entry)
+
+    @staticmethod
+    def _rank(entry):
+        return (TYPE_RANK.get(entry.type, 2), len(entry.name), entry.code)
+
+    # --- 精確查詢 ---
+    def lookup(self, code):
+        return self.by_code.get(code)
+
+    def yahoo_symbol(self, symbol):
+        """'8069' / '8069.TW' → '8069.TWO'；不認得的代號預設上市"""
+        code = symbol.split('.')[0]
+        entry = self.by_code.get(code)
+        return entry.symbol if entry else f"{code}.TW"
+
+    def resolve(self, user_input):
+        """代號或完整名稱 → (Yahoo 代號, 名稱)；查不到回傳 (None, None)"""
+        s = _normalize(user_input)
+        code = s.split('.')[0]
+        entry = self.by_code.get(code) or self.by_name.get(s)
+        if entry: return entry.symbol, entry.name
+        # 不在清單上的數字代號照舊放行 (新上市股票 twstock 還沒更新)
+        if code.isdigit(): return f"{code}.TW", code
+        return None, None
+
+    def universe(self, markets=UNIVERSE_MARKETS, types=UNIVERSE_TYPES):
+        """全市場 (預設上市 + 上櫃普通股) 的 Yahoo 代號，依代號排序"""
+        return sorted(e.symbol for e in self.by_code.values() if e.market in markets and e.type in types)
+
+    # --- 建議 ---
+    def prefix(self, text, limit=SUGGEST_LIMIT):
+        node = self._trie
+        for ch in _normalize(text):
+            node = node.get(ch)
+            if node is None: return []
+        return node.get('', [])[:limit]
+
+    def fuzzy(self, text, limit=SUGGEST_LIMIT):
+        """n-gram 重疊 (Dice) 先篩候選，再用編輯距離排序"""
+        q = _normalize(text)
+        grams = _ngrams(q) or set()
+        if len(q) >= 2: grams |= _ngrams(q, 1)
+        counts = defaultdict(int)
+        for g in grams:
+            for entry in self._grams.get(g, ()): counts[entry] += 1
+        if not counts: return []
+        candidates = sorted(counts, key=lambda e: (-counts[e], self._rank(e)))[:limit * 10]
+        scored = []
+        for e in candidates:
+            target = _normalize(e.name) if not q.isdigit() else e.code
+            dice = 2 * counts[e] / (len(grams) + len(_ngrams(target)) + len(_ngrams(target, 1)))
+            scored.append((_edit_distance(q, target) - dice, self._rank(e), e))
+        scored.sort(key=lambda x: (x[0], x[1]))
+        return [e for _, _, e in scored[:limit]]
+
+    def suggest(self, text, limit=SUGGEST_LIMIT):
+        """前綴命中優先，不足再補模糊結果"""
+        text = str(text).strip()
+        if not text: return []
+        results = list(self.prefix(text, limit))
+        if len(results) < limit:
+            for e in self.fuzzy(text, limit):
+                if e not in results: results.append(e)
+                if len(results) >= limit: break
+        return results
+
+_RESOLVER = None
+_RESOLVER_LOCK = threading.Lock()
+
+def get_resolver():
+    """行程層級單例 (第一次呼叫時建索引)"""
+    global _RESOLVER
+    with _RESOLVER_LOCK:
+        if _RESOLVER is None: _RESOLVER = SymbolResolver()
+        return _RESOLVER
+
+def yahoo_symbol(symbol):
+    return get_resolver().yahoo_symbol(symbol)
+
+def universe(markets=UNIVERSE_MARKETS, types=UNIVERSE_TYPES):
+    return get_resolver().universe(markets, types)
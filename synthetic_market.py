@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import bar_store
+
+# --- 合成行情 (固定亂數種子，可重現) ---
+# 給基準測試與離線驗證用：三種盤型對應策略的三條路徑
+#   trend   開高走高、盤中回測 VWAP 再上 (右側 VWAP 進場)
+#   crash   早盤急殺超過 -3% 後小幅反彈 (左側接刀)
+#   choppy  在昨收附近來回震盪 (多半不出訊號)
+# 產出的 DataFrame 與 get_fugle_kline 同形 (台北時區、Open/High/Low/Close/Volume)。
+
+KINDS = ('trend', 'crash', 'choppy')
+SESSION_MINUTES = 270       # 09:00 ~ 13:30
+TZ = bar_store.TZ
+COLUMNS = bar_store.COLUMNS
+
+def _path(kind, minutes, rng):
+    """各盤型的對數報酬路徑 (相對昨收)"""
+    t = np.linspace(0.0, 1.0, minutes)
+    noise = np.cumsum(rng.normal(0, 0.0012, minutes))
+    if kind == 'trend':
+        # 前 40% 拉到 +2.5%，中段回落到均價附近，尾盤再攻
+        base = 0.025 * np.minimum(t / 0.4, 1.0) - 0.012 * np.clip((t - 0.4) / 0.2, 0, 1) + 0.02 * np.clip((t - 0.6) / 0.4, 0, 1)
+        return 0.005 + base + noise * 0.5
+    if kind == 'crash':
+        # 前 30% 殺到 -6%，之後反彈到 -4% 附近 (收盤仍在接刀門檻之下)
+        base = -0.06 * np.minimum(t / 0.3, 1.0) + 0.02 * np.clip((t - 0.3) / 0.7, 0, 1)
+        return base + noise * 0.5
+    if kind == 'choppy':
+        x = np.empty(minutes)
+        level = 0.0
+        for i, e in enumerate(rng.normal(0, 0.0015, minutes)):
+            level = 0.9 * level + e
+            x[i] = level
+        return 0.002 + x
+    raise ValueError(f"unknown session kind: {kind}")
+
+def make_session(kind='trend', minutes=SESSION_MINUTES, seed=0, day='2026-10-16', prev_close=100.0):
+    """單日 1 分 K"""
+    rng = np.random.default_rng(seed)
+    close = prev_close * np.exp(_path(kind, minutes, rng))
+    open_ = np.concatenate(([prev_close * (1 + rng.normal(0, 0.002))], close[:-1]))
+    wick = np.abs(rng.normal(0, 0.0008, (2, minutes)))
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    # 開收盤量大、午盤量小的 U 型成交量
+    t = np.linspace(-1.0, 1.0, minutes)
+    volume = np.round(rng.lognormal(3.0, 0.6, minutes) * (1 + 2 * t ** 2))
+    start = pd.Timestamp(day, tz=TZ).normalize() + pd.Timedelta(hours=9)
+    index = pd.date_range(start, periods=minutes, freq='1min', name='Date')
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}, index=index)
+
+def make_sessions(n_days=20, seed=0, end_day='2026-10-16', kinds=KINDS, minutes=SESSION_MINUTES, start_price=100.0):
+    """連續 n_days 個交易日，盤型依序輪替；每天的昨收接前一天收盤。回傳 [(YYYYMMDD, df), ...]"""
+    days = pd.bdate_range(end=pd.Timestamp(end_day), periods=n_days)
+    out, prev_close = [], start_price
+    for i, day in enumerate(days):
+        df = make_session(kinds[i % len(kinds)], minutes, seed + i, day.strftime('%Y-%m-%d'), prev_close)
+        out.append((day.strftime('%Y%m%d'), df))
+        prev_close = float(df['Close'].iloc[-1])
+    return out
+
+def make_daily(n_days=70, seed=0, end_day='2026-10-16', start_price=100.0, drift=0.001, vol=0.02):
+    """日 K (幾何隨機漫步，振幅約 vol)"""
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range(end=pd.Timestamp(end_day), periods=n_days, tz=TZ)
+    close = start_price * np.exp(np.cumsum(rng.normal(drift, vol / 2, n_days)))
+    open_ = close * (1 + rng.normal(0, vol / 4, n_days))
+    spread = np.abs(rng.normal(vol / 2, vol / 4, n_days))
+    high = np.maximum(open_, close) * (1 + spread / 2)
+    low = np.minimum(open_, close) * (1 - spread / 2)
+    volume = np.round(rng.lognormal(9, 0.5, n_days))
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+                        index=pd.DatetimeIndex(days, name='Date'))
+
+def fill_store(store, symbols, n_days=20, seed=0, end_day='2026-10-16'):
+    """把合成分 K 與日 K 寫進倉庫 (回測 / 參數掃描的離線資料)"""
+    for k, symbol in enumerate(symbols):
+        sessions = make_sessions(n_days, seed + 1000 * k, end_day)
+        for _, df in sessions:
+            store.write_intraday(symbol, df)
+        store.write_daily(symbol, make_daily(n_days + 50, seed + 1000 * k, end_day))
+    return store
+
+# --- 新聞標題 ---
+_SUBJECTS = ["台積電", "鴻海", "聯發科", "廣達", "長榮", "緯創", "世芯", "華碩"]
+_POSITIVE = ["營收創高", "外資買超", "法說會利多", "AI 訂單強勢成長", "漲停鎖死", "擴產受惠", "獲利大漲"]
+_NEGATIVE = ["外資賣超", "股價重挫", "跌停", "需求疲軟", "營收衰退", "法人示警", "虧損擴大"]
+_NEUTRAL = ["董事會通過配息", "股東會紀念品出爐", "參加國際展覽", "發布永續報告", "人事異動"]
+
+def make_headlines(n=100, seed=0):
+    """n 則合成新聞 (與爬蟲回傳同形)，正負中性混合"""
+    rng = np.random.default_rng(seed)
+    pools = (_POSITIVE, _NEGATIVE, _NEUTRAL)
+    news = []
+    for i in range(n):
+        pool = pools[rng.integers(3)]
+        title = f"{_SUBJECTS[rng.integers(len(_SUBJECTS))]}{pool[rng.integers(len(pool))]}"
+        snippet = f"{title}，市場{'看好' if pool is _POSITIVE else '觀望' if pool is _NEGATIVE else '反應平淡'}"
+        news.append({"title": title, "snippet": snippet, "source": "合成", "link": f"https://example.invalid/news/{seed}/{i}"})
+    return news
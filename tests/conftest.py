@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 測試直接 import 專案根目錄的平面模組
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
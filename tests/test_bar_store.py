@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import bar_store
+
+# 上游回空表 / 整列 NaN (限流、該檔沒成交) 時不能記成已抓過，否則 is_current 會一直擋住重抓
+
+def frame(closes, start="2026-10-16 09:00"):
+    index = pd.date_range(pd.Timestamp(start, tz=bar_store.TZ), periods=len(closes), freq="1min", name="Date")
+    return pd.DataFrame({c: np.asarray(closes, dtype=float) for c in bar_store.COLUMNS}, index=index)
+
+def test_empty_upstream_response_is_not_a_fetch(tmp_path):
+    store = bar_store.BarStore(str(tmp_path))
+    assert store.write_intraday("2330", frame([])) == 0
+    assert store.write_intraday("2330", frame([np.nan, np.nan])) == 0
+    assert store.write_daily("2330.TW", frame([np.nan])) == 0
+    assert store.fetched_at("2330", "1m") == 0.0
+    assert store.fetched_at("2330.TW", "1d") == 0.0
+
+def test_rows_are_a_fetch_even_when_nothing_new(tmp_path):
+    store = bar_store.BarStore(str(tmp_path))
+    df = frame([100.0, 101.0, np.nan, 102.0])
+    assert store.write_intraday("2330", df) == 3
+    first = store.fetched_at("2330", "1m")
+    assert first > 0
+    assert store.write_intraday("2330", df.iloc[:1]) == 0     # 比倉庫舊，沒寫入但上游確實有回資料
+    assert store.fetched_at("2330", "1m") >= first
+    assert store.read_intraday("2330", "20261016")["Close"].tolist() == [100.0, 101.0, 102.0]
+
+def test_session_intraday_ignores_previous_session_during_trading_hours(tmp_path):
+    store = bar_store.BarStore(str(tmp_path))
+    store.write_intraday("2330", frame([100.0, 101.0], start="2026-10-15 09:00"))
+    in_session = pd.Timestamp("2026-10-16 09:00:30", tz=bar_store.TZ)
+    assert store.session_intraday("2330", in_session) == ("20261016", None)
+    day, df = store.session_intraday("2330", pd.Timestamp("2026-10-16 08:30", tz=bar_store.TZ))   # 盤前看昨天
+    assert day == "20261015" and len(df) == 2
+    store.write_intraday("2330", frame([102.0], start="2026-10-16 09:00"))
+    day, df = store.session_intraday("2330", in_session)
+    assert day == "20261016" and df["Close"].tolist() == [102.0]
@@ -0,0 +1,20 @@
+import json
+import types
+import stock_heat_analyzer as heat
+
+# 模型回的 JSON key 不一定照抄 prompt 裡的代號：去掉市場後綴、大小寫、空白後再比對
+
+NEWS = [{"source": "test", "title": "營收創新高", "link": "https://example.invalid/a"}]
+
+def fake_generate(reply):
+    def generate(api_key, prompt, timings):
+        return types.SimpleNamespace(text=reply), "model"
+    return generate
+
+def test_bare_codes_in_reply_are_matched(monkeypatch):
+    reply = "```json\n" + json.dumps({"2330": {"score": 81, "summary": "強"}, " 6488.two ": {"score": 140, "summary": ""},
+                                      "8069.tw": {"score": 35}}) + "\n```"
+    monkeypatch.setattr(heat, "_generate", fake_generate(reply))
+    scored, model = heat.analyze_batch_with_gemini("key", {"2330.TW": NEWS, "6488.TWO": NEWS, "8069.TWO": NEWS, "2317.TW": NEWS})
+    assert scored == {"2330.TW": (81, "強"), "6488.TWO": (100, ""), "8069.TWO": (35, "")}
+    assert model == "model"
@@ -0,0 +1,25 @@
+import types
+import numpy as np
+import pandas as pd
+import analyzer
+import bar_pyramid
+import bench
+import synthetic_market
+
+# 基準測試的 pandas 重取樣是 bar_pyramid 的對照組，必須真的跑出數字
+
+def test_resample_data_accepts_minute_aliases():
+    df = synthetic_market.make_session("trend", synthetic_market.SESSION_MINUTES, bench.SEED)
+    out = analyzer.resample_data(df, "5T")
+    assert len(out) == synthetic_market.SESSION_MINUTES // 5
+    assert out["Volume"].sum() == df["Volume"].sum()
+    pd.testing.assert_frame_equal(out, analyzer.resample_data(df, "5min"))
+
+def test_resample_group_produces_numbers():
+    env = types.SimpleNamespace(analyzer=analyzer, seed=bench.SEED)
+    results, skipped, errors = bench.run(env, ["resample"], repeat=2, log=lambda *a: None)
+    assert not errors and not skipped
+    pandas_cases = [c for c in results if c.startswith("resample.pandas/")]
+    assert sorted(pandas_cases) == sorted(f"resample.pandas/{tf}" for tf in bar_pyramid.TIMEFRAMES)
+    for r in results.values():
+        assert np.isfinite(r["p50_ms"]) and r["p50_ms"] > 0 and r["throughput"] > 0
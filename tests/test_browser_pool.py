@@ -0,0 +1,54 @@
+import asyncio
+import pytest
+
+pytest.importorskip("playwright")
+import browser_pool
+from playwright.async_api import Error as PlaywrightError
+
+# 取用 context 途中瀏覽器被關掉 (閒置回收或崩潰)，要換新的瀏覽器再開，不能拿已關閉的那個
+
+class FakeContext:
+    async def new_page(self): raise AssertionError("not used")
+    async def close(self): pass
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.handlers = []
+    def is_connected(self): return self.connected
+    def on(self, event, fn): self.handlers.append(fn)
+    async def new_context(self, **kwargs):
+        if not self.connected: raise PlaywrightError("Target page, context or browser has been closed")
+        return FakeContext()
+    async def close(self):
+        self.connected = False
+        for fn in self.handlers: fn(self)
+
+class FakePlaywright:
+    def __init__(self):
+        self.launched = []
+        self.chromium = self
+    async def start(self): return self
+    async def launch(self, **kwargs):
+        self.launched.append(FakeBrowser())
+        return self.launched[-1]
+
+def test_context_opened_after_browser_closed_while_waiting(monkeypatch):
+    pw = FakePlaywright()
+    monkeypatch.setattr(browser_pool, "async_playwright", lambda: pw)
+    pool = browser_pool.BrowserPool(max_contexts=1, idle_seconds=60)
+
+    async def scenario():
+        held = await pool._acquire()
+        waiter = asyncio.ensure_future(pool._acquire())   # 等名額
+        await asyncio.sleep(0)
+        assert pool._leases == 1
+        await pw.launched[0].close()                      # 等待期間瀏覽器被關掉
+        await pool._release(held, broken=False)
+        context = await waiter
+        await pool._release(context, broken=False)
+        pool._reaper.cancel()
+        return context
+
+    assert isinstance(asyncio.run(scenario()), FakeContext)
+    assert len(pw.launched) == 2 and pool._leases == 0 and pool._active == 0
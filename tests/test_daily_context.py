@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+import analyzer
+import bar_store
+
+# 昨收要以分 K 所屬的交易日為準：週末、假日、盤前倉庫裡最新的是上一個交易日，不能用今天的日期切日 K
+
+SYMBOL = "9901"
+SYMBOL_TW = "9901.TW"
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    s = bar_store.BarStore(str(tmp_path))
+    monkeypatch.setattr(bar_store, "_STORE", s)
+    monkeypatch.setattr(analyzer, "_refresh_daily", lambda symbols, period="3mo": 0)   # 不打 Yahoo
+    days = pd.bdate_range("2026-10-05", "2026-10-16", tz=bar_store.TZ, name="Date")
+    close = np.linspace(100.0, 109.0, len(days))
+    close[-2] = 108.0
+    s.write_daily(SYMBOL_TW, pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close,
+                                           "Volume": 1000.0}, index=days))
+    return s
+
+def session(day, closes):
+    index = pd.date_range(pd.Timestamp(day, tz=bar_store.TZ) + pd.Timedelta(hours=9), periods=len(closes), freq="1min", name="Date")
+    closes = np.asarray(closes, dtype=float)
+    return pd.DataFrame({"Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": 10.0}, index=index)
+
+def test_prev_close_is_before_the_session_day(store):
+    assert analyzer.get_daily_context(SYMBOL_TW, "20261016")[0] == 108.0
+    assert store.get_context(SYMBOL_TW, day="20261016")["prev_close"] == 108.0
+    # 換一個交易日不會拿到舊日子的 context
+    assert analyzer.get_daily_context(SYMBOL_TW, "20261019")[0] == 109.0
+    assert store.get_context(SYMBOL_TW, day="20261016") is None
+
+def test_off_session_knife_uses_previous_close(store):
+    """週六看 10/16 的 K 棒：跌幅對 10/15 收盤算，接刀照常觸發"""
+    df = session("2026-10-16", [107.5, 106.0, 104.5, 104.0])
+    result = analyzer.build_signals(SYMBOL, df, "test", sentiment_score=90)
+    assert result.pct_change == pytest.approx(104.0 / 108.0 - 1)
+    assert result.entry_time == df.index[2]
+    assert store.get_context(SYMBOL_TW, day="20261016")["prev_close"] == 108.0
+
+def test_stale_daily_after_failed_refresh_is_not_cached(store, monkeypatch):
+    """日 K 更新失敗、倉庫只到 10/16：10/21 的昨收先拿 10/16 用，但不寫進 context，下次要再抓"""
+    calls = []
+    def failing(symbols, period="3mo"):
+        calls.append(symbols)
+        raise RuntimeError("yahoo down")
+    monkeypatch.setattr(analyzer, "_refresh_daily", failing)
+    meta = store._load_meta(SYMBOL_TW)
+    meta["1d_fetched_at"] = 0.0     # 倉庫的日 K 很久沒更新
+    store._save_meta(SYMBOL_TW, meta)
+    assert analyzer.get_daily_context(SYMBOL_TW, "20261021")[0] == 109.0
+    assert store.get_context(SYMBOL_TW, day="20261021") is None
+    analyzer.get_daily_context(SYMBOL_TW, "20261021")
+    assert len(calls) == 2
+
+    # 倉庫已有前一個交易日 (週五 10/16 → 週一 10/19) 就算更新失敗也能存
+    assert analyzer.get_daily_context(SYMBOL_TW, "20261019")[0] == 109.0
+    assert store.get_context(SYMBOL_TW, day="20261019")["prev_close"] == 109.0
@@ -0,0 +1,64 @@
+import asyncio
+import news_feed
+import sentiment_cache
+import stock_heat_analyzer as heat
+
+# 期限內沒到齊的來源要標成不完整，情緒快取才不會拿不穩定的指紋比對或寫入
+
+def source(name, items, delay=0.0, error=None):
+    async def fetch(code, validators):
+        await asyncio.sleep(delay)
+        if error: raise error
+        return [dict(n, source=name) for n in items], {}
+    return news_feed.NewsSource(name, fetch, ttl=300)
+
+FAST = [{"title": "快訊", "link": "https://example.invalid/fast"}]
+SLOW = [{"title": "慢訊", "link": "https://example.invalid/slow"}]
+
+def collect(agg, deadline):
+    status = {}
+    got = asyncio.run(agg.collect("2330", deadline, status))
+    return got, status["complete"]
+
+def test_late_source_marks_partial_then_completes_from_cache():
+    agg = news_feed.NewsAggregator([source("fast", FAST), source("slow", SLOW, delay=0.3)])
+    got, complete = collect(agg, 0.1)
+    assert list(got) == ["fast"] and not complete
+    assert agg.stats["late"] == 1
+    asyncio.run(asyncio.sleep(0.4))     # 慢的來源在背景寫進快取
+    got, complete = collect(agg, 0.1)
+    assert set(got) == {"fast", "slow"} and complete
+
+def test_failed_source_with_stale_fallback_is_partial():
+    agg = news_feed.NewsAggregator([source("fast", FAST), source("bad", SLOW, error=ConnectionError("boom"))])
+    got, complete = collect(agg, 1.0)
+    assert not complete and agg.stats["errors"] == 1
+
+def test_delivered_lists_only_sources_that_made_the_deadline():
+    agg = news_feed.NewsAggregator([source("fast", FAST), source("bad", SLOW, error=ConnectionError("boom"))])
+    status = {}
+    asyncio.run(agg.collect("2330", 1.0, status))
+    assert list(status["delivered"]) == ["fast"]
+
+def test_source_that_always_times_out_still_hits_sentiment_cache(tmp_path, monkeypatch):
+    """Yahoo 頁面每次都趕不上期限：準時的來源沒變，第二次就該命中快取，不再呼叫 Gemini"""
+    agg = news_feed.NewsAggregator([source("fast", FAST), source("hung", SLOW, delay=60)], deadline=0.1)
+    monkeypatch.setattr(heat, "_NEWS", agg)
+    monkeypatch.setattr(sentiment_cache, "_CACHE", sentiment_cache.SentimentCache(str(tmp_path / "cache.json")))
+    calls = []
+    def gemini(api_key, news_by_symbol, names=None, timings=None):
+        calls.append(list(news_by_symbol))
+        return {s: (70, "ok") for s in news_by_symbol}, "model"
+    monkeypatch.setattr(heat, "analyze_batch_with_gemini", gemini)
+
+    first = heat.score_symbols("key", ["2330.TW"])
+    second = heat.score_symbols("key", ["2330.TW"])
+    assert first["2330.TW"]["source"] == "ai" and second["2330.TW"]["source"] == "cache"
+    assert second["2330.TW"]["score"] == 70 and len(calls) == 1
+    assert agg.stats["late"] == 2
+
+def test_cache_misses_when_a_delivered_source_changes():
+    cache_fp = sentiment_cache.source_fingerprints({"fast": FAST, "slow": SLOW})
+    assert sentiment_cache._matches(cache_fp, sentiment_cache.source_fingerprints({"fast": FAST}))
+    assert not sentiment_cache._matches(cache_fp, sentiment_cache.source_fingerprints({"fast": SLOW}))
+    assert not sentiment_cache._matches(sentiment_cache.source_fingerprints({"fast": FAST}), cache_fp)
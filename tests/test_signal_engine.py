@@ -0,0 +1,198 @@
+import numpy as np
+import pandas as pd
+import pytest
+import signal_engine
+import signal_result
+import synthetic_market
+from signal_engine import NO_SIGNAL, StrategyParams
+
+# 向量化引擎 / 增量狀態 vs. 原本 get_orb_signals 的 iterrows 迴圈 (reference 照搬原始寫法，只把門檻換成參數)
+
+def reference_signals(df, prev_close, sentiment_score=50, p=signal_engine.DEFAULT_PARAMS):
+    df = df.copy()
+    df['Cum_Vol'] = df['Volume'].cumsum()
+    df['Cum_Vol_Price'] = (df['Close'] * df['Volume']).cumsum()
+    df['VWAP'] = df['Cum_Vol_Price'] / df['Cum_Vol']
+
+    entry_time, entry_price = None, None
+    exit_time, exit_price = None, None
+    signal_status = "等待訊號"
+    current_price = df['Close'].iloc[-1]
+    pct_change = (current_price - prev_close) / prev_close
+
+    if sentiment_score > p.knife_sentiment:
+        strategy_name = "🔥 左側接刀"
+        if pct_change <= p.knife_trigger:
+            for t, row in df.iterrows():
+                if (row['Close'] - prev_close) / prev_close <= p.knife_trigger:
+                    entry_time = t
+                    entry_price = row['Close']
+                    break
+        else:
+            signal_status = f"未達接刀點 ({p.knife_trigger:.0%})"
+    else:
+        strategy_name = "⚖️ 右側 VWAP"
+        max_dev = 0.0
+        high_h = 0.0
+        for t, row in df.iterrows():
+            if pd.isna(row['VWAP']): continue
+            if row['High'] > high_h: high_h = row['High']
+            dev = (row['Close'] - row['VWAP']) / row['VWAP']
+            if dev > max_dev: max_dev = dev
+            if not entry_time:
+                if max_dev >= p.max_dev:
+                    if high_h > 0 and row['Close'] < high_h * p.pullback:
+                        if row['Low'] <= row['VWAP'] * p.vwap_proximity:
+                            if row['Close'] > row['Open'] and row['Close'] >= row['VWAP']:
+                                entry_time = t
+                                entry_price = row['Close']
+
+    if entry_time:
+        for t, row in df[df.index > entry_time].iterrows():
+            if row['High'] >= entry_price * p.take_profit:
+                exit_time = t; exit_price = entry_price * p.take_profit; break
+            if row['Low'] <= entry_price * p.stop_loss:
+                exit_time = t; exit_price = entry_price * p.stop_loss; break
+        if exit_time: signal_status = "已出場"
+        else: signal_status = f"持有中 {((current_price-entry_price)/entry_price)*100:.2f}%"
+
+    return {"entry_time": entry_time, "entry_price": entry_price, "exit_time": exit_time, "exit_price": exit_price,
+            "signal": signal_status, "signal_price": current_price, "strategy_name": strategy_name,
+            "pct_change": pct_change, "vwap": df['VWAP'].to_numpy()}
+
+def random_case(seed):
+    """合成盤 + 隨機截斷、開盤零量、隨機昨收與門檻"""
+    rng = np.random.default_rng(seed)
+    kind = synthetic_market.KINDS[seed % len(synthetic_market.KINDS)]
+    df = synthetic_market.make_session(kind, minutes=int(rng.integers(5, 271)), seed=seed)
+    if rng.random() < 0.3:
+        df.iloc[:int(rng.integers(1, 4)), df.columns.get_loc('Volume')] = 0.0
+    prev_close = 100.0 * (1 + rng.normal(0, 0.01))
+    params = StrategyParams(max_dev=float(rng.uniform(0.002, 0.01)), pullback=float(rng.uniform(0.99, 0.999)),
+                            take_profit=float(rng.uniform(1.005, 1.03)), stop_loss=float(rng.uniform(0.97, 0.995)),
+                            knife_trigger=float(rng.uniform(-0.05, -0.01)))
+    return df, prev_close, params
+
+def arrays(df):
+    return (df.index.as_unit('ns').asi8, *(df[c].to_numpy(dtype=float) for c in ('Open', 'High', 'Low', 'Close', 'Volume')))
+
+def assert_same(got, ref, index):
+    def at(i): return index[i] if i != NO_SIGNAL else None
+    assert at(got['entry_idx']) == ref['entry_time']
+    assert at(got['exit_idx']) == ref['exit_time']
+    assert got['entry_price'] == pytest.approx(ref['entry_price'])
+    assert got['exit_price'] == pytest.approx(ref['exit_price'])
+    assert got['signal'] == ref['signal']
+    assert got['strategy_name'] == ref['strategy_name']
+    assert got['signal_price'] == ref['signal_price']
+    assert got['pct_change'] == pytest.approx(ref['pct_change'])
+
+SEEDS = range(120)
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("sentiment", [50, 90])
+def test_evaluate_signals_matches_iterrows(seed, sentiment):
+    df, prev_close, params = random_case(seed)
+    ts, o, h, l, c, v = arrays(df)
+    _, _, vwap = signal_engine.compute_vwap(c, v)
+    ref = reference_signals(df, prev_close, sentiment, params)
+    np.testing.assert_allclose(vwap, ref['vwap'], equal_nan=True)
+    got = signal_engine.evaluate_signals(ts, o, h, l, c, vwap, prev_close, sentiment, params)
+    assert_same(got, ref, df.index)
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_scans_match_iterrows(seed):
+    df, prev_close, params = random_case(seed)
+    ts, o, h, l, c, v = arrays(df)
+    _, _, vwap = signal_engine.compute_vwap(c, v)
+
+    # 接刀：不管收盤是否達標，都掃一次
+    knife = next((i for i, x in enumerate(c) if (x - prev_close) / prev_close <= params.knife_trigger), NO_SIGNAL)
+    assert signal_engine.scan_knife_entry(c, prev_close, params) == knife
+
+    ref = reference_signals(df, prev_close, 50, params)
+    entry = signal_engine.scan_vwap_entry(o, h, l, c, vwap, params)
+    assert (df.index[entry] if entry != NO_SIGNAL else None) == ref['entry_time']
+
+    for start in {0, len(df) // 2, len(df) - 1}:
+        exit_idx, exit_price = signal_engine.scan_exit(ts, h, l, start, c[start], params)
+        take, stop = c[start] * params.take_profit, c[start] * params.stop_loss
+        want = next((i for i in range(start + 1, len(df)) if h[i] >= take or l[i] <= stop), NO_SIGNAL)
+        assert exit_idx == want
+        if want != NO_SIGNAL: assert exit_price == pytest.approx(take if h[want] >= take else stop)
+
+def test_cases_cover_every_path():
+    """確認隨機案例真的走到進場與出場，不是全部 "等待訊號" 的空測試"""
+    seen = set()
+    for seed in SEEDS:
+        df, prev_close, params = random_case(seed)
+        for sentiment in (50, 90):
+            ref = reference_signals(df, prev_close, sentiment, params)
+            seen.add((ref['strategy_name'], ref['entry_time'] is not None, ref['exit_time'] is not None))
+    for name in ("🔥 左側接刀", "⚖️ 右側 VWAP"):
+        assert {(name, False, False), (name, True, False), (name, True, True)} <= seen
+
+@pytest.mark.parametrize("seed", range(60))
+def test_signal_state_revisions_match_full_recompute(seed):
+    """逐段餵入 K 棒，且每次都原地改寫最後 REVISE_WINDOW 根 (上游修正)，結果須與整段重算相同"""
+    df, prev_close, params = random_case(seed + 1000)
+    ts, o, h, l, c, v = arrays(df)
+    rng = np.random.default_rng(seed)
+    state = signal_engine.SignalState("TEST", "1T")
+    sentiment = 90 if seed % 2 else 50
+    cols = [a.copy() for a in (o, h, l, c, v)]
+    handed = []
+    n = 0
+    while n < len(ts):
+        n = min(len(ts), n + int(rng.integers(1, 8)))
+        # 修正最後幾根：收盤與量變動，高低點跟著包住
+        for i in range(max(0, n - signal_engine.SignalState.REVISE_WINDOW), n):
+            if rng.random() < 0.5:
+                cols[3][i] *= 1 + rng.normal(0, 0.003)
+                cols[4][i] = max(0.0, cols[4][i] + rng.integers(-5, 20))
+                cols[1][i] = max(cols[1][i], cols[0][i], cols[3][i])
+                cols[2][i] = min(cols[2][i], cols[0][i], cols[3][i])
+        # 呼叫端只給提交點之後的 OHLCV (analyzer 的做法)；每三個 seed 有一個照舊給整段
+        start = 0 if seed % 3 == 0 else state.resume_at(ts[:n], prev_close, params)
+        got = state.update(ts[:n], *(a[start:n] for a in cols), prev_close, sentiment, params, start=start)
+        result = signal_result.SignalResult("TEST", "1T", got["segments"], got["signal"], got["signal_price"],
+                                            got["pct_change"], got["strategy_name"])
+        handed.append((result, result.ts.copy(), result.bars.copy()))
+
+        full = [a[:n].copy() for a in cols]
+        _, _, vwap = signal_engine.compute_vwap(full[3], full[4])
+        want = signal_engine.evaluate_signals(ts[:n], *full[:4], vwap, prev_close, sentiment, params)
+        for key in ("entry_idx", "exit_idx", "signal", "strategy_name"):
+            assert got[key] == want[key], (n, key)
+        for key in ("entry_price", "exit_price", "signal_price", "pct_change"):
+            assert got[key] == pytest.approx(want[key]), (n, key)
+        np.testing.assert_array_equal(result.ts, ts[:n])
+        np.testing.assert_allclose(result.bars[:, 5], vwap.astype(np.float32), rtol=1e-6, equal_nan=True)
+        np.testing.assert_allclose(result.bars[:, 3], full[3].astype(np.float32))
+        assert result.ts_at(-1) == ts[n - 1] and result.last_vwap == pytest.approx(vwap[-1], rel=1e-6, nan_ok=True)
+
+    # 先前交出去的結果共用狀態緩衝區，之後的更新與修正不能改到它們
+    for result, ts_then, bars_then in handed:
+        result._joined.clear()
+        np.testing.assert_array_equal(result.ts, ts_then)
+        np.testing.assert_array_equal(result.bars, bars_then)
+
+def test_refresh_converts_only_rows_after_the_commit_point(monkeypatch):
+    import analyzer
+    df = synthetic_market.make_session("trend", 120, 3)
+    starts = []
+    columns_from = analyzer._columns_from
+    monkeypatch.setattr(analyzer, "_columns_from", lambda d, start: starts.append(start) or columns_from(d, start))
+    analyzer._update_signal_state("TAILONLY", "1T", df.iloc[:100], 100.0, 50)
+    analyzer._update_signal_state("TAILONLY", "1T", df.iloc[:101], 100.0, 50)
+    assert starts == [0, 100 - signal_engine.SignalState.REVISE_WINDOW]
+
+def test_update_asks_for_full_frame_after_concurrent_reset():
+    df, prev_close, params = random_case(7)
+    ts, *cols = arrays(df)
+    state = signal_engine.SignalState("TEST", "1T")
+    state.update(ts, *cols, prev_close, 50, params)
+    start = state.resume_at(ts, prev_close, params)
+    assert start == len(ts) - signal_engine.SignalState.REVISE_WINDOW
+    state.update(ts, *cols, prev_close, 50, signal_engine.DEFAULT_PARAMS)   # 別的呼叫端換了參數，狀態重建
+    assert state.update(ts, *(a[start:] for a in cols), prev_close, 50, params, start=start) is None
@@ -0,0 +1,47 @@
+import queue
+import threading
+import pandas as pd
+import pytest
+import analyzer
+import bar_store
+import signal_service
+import synthetic_market
+import upstream
+
+# 無頭服務只評估今天的分 K：盤前 / 今天還沒成交時，不能拿上一個交易日的 K 棒噴出過期的「新訊號」
+
+SYMBOL = "9903.TW"
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    s = bar_store.BarStore(str(tmp_path))
+    monkeypatch.setattr(bar_store, "_STORE", s)
+    monkeypatch.setattr(analyzer, "_refresh_daily", lambda symbols, period="3mo": 0)
+    monkeypatch.setattr(analyzer, "_refresh_intraday", lambda symbols, batch_size=0: 0)
+    monkeypatch.setattr(upstream, "PROVIDERS", dict(upstream.PROVIDERS))
+    monkeypatch.setattr(upstream, "share_budget", lambda n: None)
+    today = pd.Timestamp.now(tz=bar_store.TZ).normalize()
+    s.write_daily(SYMBOL, synthetic_market.make_daily(end_day=(today - pd.Timedelta(days=1)).strftime("%Y-%m-%d")))
+    return s
+
+def run_once(strategies=("knife",)):
+    out = queue.Queue()
+    signal_service.run_shard(0, [SYMBOL], out, threading.Event(), strategies=strategies, once=True)
+    msgs = [out.get_nowait() for _ in range(out.qsize())]
+    events = [e for kind, _, payload in msgs if kind == "events" for e in payload]
+    stats = next(payload for kind, _, payload in msgs if kind == "tick")
+    return events, stats
+
+def test_previous_session_is_not_evaluated(store):
+    yesterday = pd.Timestamp.now(tz=bar_store.TZ).normalize() - pd.Timedelta(days=1)
+    store.write_intraday(SYMBOL, synthetic_market.make_session("crash", day=yesterday.strftime("%Y-%m-%d")))
+    events, stats = run_once()
+    assert events == [] and stats["evaluated"] == 0
+
+def test_today_session_is_evaluated(store):
+    today = pd.Timestamp.now(tz=bar_store.TZ).normalize()
+    prev_close = float(store.read_daily(SYMBOL)["Close"].iloc[-1])
+    store.write_intraday(SYMBOL, synthetic_market.make_session("crash", day=today.strftime("%Y-%m-%d"), prev_close=prev_close))
+    events, stats = run_once()
+    assert stats["evaluated"] == 1
+    assert len(events) == 1 and events[0]["phase"] in ("holding", "exited")
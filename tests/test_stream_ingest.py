@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+import bar_store
+import stream_ingest
+import synthetic_market
+
+# 串流畫面的 K 棒只能有形成中那根所屬的交易日：今天第一根還沒寫進倉庫時不能接上昨天的資料
+
+def micros(ts):
+    return int(pd.Timestamp(ts, tz=bar_store.TZ).value // 1000)
+
+@pytest.fixture
+def ingest(tmp_path, monkeypatch):
+    store = bar_store.BarStore(str(tmp_path))
+    monkeypatch.setattr(bar_store, "_STORE", store)
+    store.write_intraday("2330", synthetic_market.make_session(day="2026-10-15"))
+    return stream_ingest.StreamIngest("key", ["2330"])
+
+def test_first_forming_bar_does_not_join_previous_session(ingest):
+    ingest.on_trade("2330", micros("2026-10-16 09:00:10"), 100.0, 5)
+    df = ingest.frame("2330")
+    assert len(df) == 1 and bar_store.day_of(df.index[0]) == "20261016"
+
+    ingest.on_trade("2330", micros("2026-10-16 09:01:05"), 101.0, 3)   # 第一根收盤寫進倉庫
+    df = ingest.frame("2330")
+    assert df["Close"].tolist() == [100.0, 101.0]
+    assert {bar_store.day_of(t) for t in df.index} == {"20261016"}
+
+def test_stale_forming_bar_is_dropped(ingest):
+    ingest.builders["2330"].add_trade(micros("2026-10-14 13:29:00"), 99.0, 1)
+    df = ingest.frame("2330")
+    assert len(df) == synthetic_market.SESSION_MINUTES
+    assert bar_store.day_of(df.index[-1]) == "20261015"
+
+def test_late_trade_after_market_clock_merges_into_stored_bar(tmp_path, monkeypatch):
+    store = bar_store.BarStore(str(tmp_path))
+    monkeypatch.setattr(bar_store, "_STORE", store)
+    ingest = stream_ingest.StreamIngest("key", ["A", "B"])
+    ingest.on_trade("B", micros("2026-10-16 09:00:05"), 100.0, 10)
+    ingest.on_trade("B", micros("2026-10-16 09:00:30"), 105.0, 10)
+    ingest.on_trade("A", micros("2026-10-16 09:01:00.1"), 50.0, 1)    # A 推進市場時鐘，B 的 09:00 收盤
+    ingest.on_trade("B", micros("2026-10-16 09:00:59.9"), 101.0, 1)   # 遲到的 09:00 成交
+
+    df = store.read_intraday("B", "20261016")
+    assert len(df) == 1
+    assert df.iloc[0].tolist() == [100.0, 105.0, 100.0, 101.0, 21.0]
+    assert ingest.builders["B"].minute is None   # 沒有另開一根
+
+    ingest.on_trade("B", micros("2026-10-16 08:59:59"), 1.0, 1)       # 更早的分鐘直接丟掉
+    assert store.read_intraday("B", "20261016").iloc[0].tolist() == [100.0, 105.0, 100.0, 101.0, 21.0]
+    assert ingest.builders["B"].late_dropped == 1
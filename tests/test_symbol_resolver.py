@@ -0,0 +1,37 @@
+import types
+import symbol_resolver
+
+# 名稱索引與查詢要用同一套正規化 (NFKC + 大寫)，大小寫混用或全形英文的名稱才查得到
+
+def info(name, market="上市", type="股票"):
+    return types.SimpleNamespace(name=name, market=market, type=type)
+
+CODES = {
+    "2330": info("台積電"),
+    "6550": info("北極星藥業-KY", "上櫃"),
+    "4147": info("中裕"),
+    "6598": info("ＡＢＣ-KY", "上櫃"),
+    "6589": info("台康生技"),
+    "7777": info("bioTech"),
+}
+
+def resolver():
+    return symbol_resolver.SymbolResolver(CODES)
+
+def test_mixed_case_name_resolves_exactly():
+    r = resolver()
+    assert r.resolve("bioTech") == ("7777.TW", "bioTech")
+    assert r.resolve("BIOTECH") == ("7777.TW", "bioTech")
+    assert r.resolve(" biotech ") == ("7777.TW", "bioTech")
+
+def test_full_width_and_ky_names():
+    r = resolver()
+    assert r.resolve("北極星藥業-ky") == ("6550.TWO", "北極星藥業-KY")
+    assert r.resolve("ABC-KY") == ("6598.TWO", "ＡＢＣ-KY")
+    assert r.resolve("２３３０") == ("2330.TW", "台積電")
+
+def test_prefix_uses_the_same_normalisation():
+    r = resolver()
+    assert [e.code for e in r.prefix("bio")] == ["7777"]
+    assert [e.code for e in r.prefix("ａｂ")] == ["6598"]
+    assert r.suggest("台積")[0].code == "2330"
@@ -0,0 +1,50 @@
+import types
+import pandas as pd
+import pytest
+import analyzer
+import upstream
+
+# yfinance 被限流時不拋例外、回空表：要經 require_rows 變成暫時性失敗，閘道才會重試、計數、斷路
+
+def provider():
+    return upstream.Provider("test", rate=1000, burst=1000, max_retries=2, base_delay=0.0, failure_threshold=2)
+
+def test_empty_frame_is_retried_then_counted():
+    p = provider()
+    frames = iter([pd.DataFrame(), pd.DataFrame({"Close": [float("nan")]}), pd.DataFrame({"Close": [1.0]})])
+    df = p.call(upstream.require_rows, lambda: next(frames))
+    assert df["Close"].tolist() == [1.0]
+    stats = p.snapshot_stats()
+    assert stats["retries"] == 2 and stats["errors"] == 2 and stats["ok"] == 1
+
+def test_persistent_empty_result_trips_the_breaker():
+    p = provider()
+    for _ in range(2):
+        with pytest.raises(upstream.EmptyResult):
+            p.call(upstream.require_rows, pd.DataFrame)
+    assert p.snapshot_stats()["state"] == "open"
+    with pytest.raises(upstream.CircuitOpen):
+        p.call(upstream.require_rows, pd.DataFrame)
+
+def test_share_budget_splits_rate_across_processes(monkeypatch):
+    monkeypatch.setattr(upstream, "PROVIDERS", {n: upstream.Provider(n, r, b) for n, (r, b) in upstream.LIMITS.items()})
+    upstream.share_budget(4)
+    for name, (rate, burst) in upstream.LIMITS.items():
+        assert upstream.get(name).bucket.rate == rate / 4
+        assert upstream.get(name).bucket.burst == max(1.0, burst / 4)
+
+def test_single_symbol_empty_download_is_not_a_failure(monkeypatch):
+    """下市、停牌、還沒成交的個股回空表是正常結果：不重試、不算進斷路器"""
+    p = provider()
+    monkeypatch.setitem(upstream.PROVIDERS, "yahoo", p)
+    calls = []
+    monkeypatch.setattr(analyzer, "yf", types.SimpleNamespace(download=lambda symbols, **kw: calls.append(symbols) or pd.DataFrame()))
+    for _ in range(3):
+        assert analyzer._yahoo_download(["9999.TW"], interval="1d").empty
+    stats = p.snapshot_stats()
+    assert len(calls) == 3 and stats["retries"] == 0 and stats["errors"] == 0 and stats["state"] == "closed"
+
+    # 多檔全部空白才是被限流
+    with pytest.raises(upstream.EmptyResult):
+        analyzer._yahoo_download(["9999.TW", "9998.TW"], interval="1d")
+    assert p.snapshot_stats()["retries"] == 2
@@ -0,0 +1,44 @@
+import pytest
+import analyzer
+import bar_store
+import market_poller
+import synthetic_market
+import watchlist
+
+# 兩個 session 對同一檔給不同的 AI 分數：各自拿到自己策略的結果，不會每輪互相蓋掉
+
+SYMBOL = "9902.TW"
+
+@pytest.fixture
+def scheduler(tmp_path, monkeypatch):
+    store = bar_store.BarStore(str(tmp_path))
+    monkeypatch.setattr(bar_store, "_STORE", store)
+    monkeypatch.setattr(analyzer, "_refresh_daily", lambda symbols, period="3mo": 0)
+    store.write_daily(SYMBOL, synthetic_market.make_daily(end_day="2026-10-15"))
+    session = synthetic_market.make_session("crash", day="2026-10-16")
+    monkeypatch.setattr(analyzer, "load_bars", lambda symbol, key=None: (session, "test", None))
+    return watchlist.WatchlistScheduler(stagger_seconds=0)
+
+def test_sessions_with_different_scores_keep_their_own_strategy(scheduler):
+    assert scheduler.watch([SYMBOL], {SYMBOL: 50})
+    assert scheduler.watch([SYMBOL], {SYMBOL: 90})
+    assert not scheduler.watch([SYMBOL], {SYMBOL: 95})      # 同一策略，不必重算
+    scheduler.tick()
+    for _ in range(3):
+        assert "VWAP" in scheduler.get(SYMBOL, sentiment=50).strategy_name
+        assert "接刀" in scheduler.get(SYMBOL, sentiment=90).strategy_name
+        assert scheduler.get(SYMBOL, sentiment=None) is None
+        scheduler.tick()
+    assert scheduler.stats["recomputed"] == 2
+
+def test_snapshot_lookup_and_table_use_the_session_score(scheduler):
+    scheduler.watch([SYMBOL], {SYMBOL: 90})
+    scheduler.watch([SYMBOL], {})
+    scheduler.tick()
+    poller = market_poller.MarketPoller(scheduler)
+    poller._publish()
+    snap = poller.latest()
+    assert snap.get(SYMBOL, "1T", 90).entry_idx != -1
+    assert snap.get(SYMBOL, "1T", 10) is None and snap.has_bars(SYMBOL)
+    assert [r["strategy"] for r in snap.table([SYMBOL], "1T", {SYMBOL: 90})] == ["🔥 左側接刀"]
+    assert [r["strategy"] for r in snap.table([SYMBOL], "1T")] == ["未分析"]
@@ -0,0 +1,142 @@
+import os
+import time
+import json
+import threading
+import contextvars
+from collections import deque
+import numpy as np
+
+# --- 輕量追蹤：每個階段一個 span，記錄耗時與屬性 (來源、代號、週期、快取命中、錯誤) ---
+# 各階段保留最近 HISTORY 筆耗時，統計時才算 p50/p95/p99；另留最近 RECENT 筆明細可匯出 JSON lines。
+# 關閉時 span() 直接回傳共用的空物件，不計時也不配置記憶體。
+
+ENABLED = os.environ.get("TRACING", "1") != "0"
+HISTORY = 1000
+RECENT = 2000
+
+_CURRENT = contextvars.ContextVar("trace_current", default=None)
+
+class Span:
+    __slots__ = ("name", "attrs", "parent", "started_at", "duration", "error", "_t0", "_token")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.error = False
+
+    def set(self, **attrs):
+        """補上執行中才知道的屬性，例如 cache='hit' / source='Yahoo'"""
+        self.attrs.update(attrs)
+        return self
+
+    def fail(self, exc=None):
+        """標記錯誤 (用在被吞掉、不會往外拋的例外)"""
+        self.error = True
+        if exc is not None: self.attrs["error_msg"] = f"{type(exc).__name__}: {exc}"[:200]
+        return self
+
+    def __enter__(self):
+        self.parent = _CURRENT.get()
+        self._token = _CURRENT.set(self.name)
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._t0
+        _CURRENT.reset(self._token)
+        if exc_type is not None: self.fail(exc)
+        _TRACER.record(self)
+        return False
+
+class _NoopSpan:
+    __slots__ = ()
+    def set(self, **attrs): return self
+    def fail(self, exc=None): return self
+    def __enter__(self): return self
+    def __exit__(self, exc_type, exc, tb): return False
+
+NOOP = _NoopSpan()
+
+def span(name, **attrs):
+    """with tracing.span('fugle', symbol=..., timeframe=...) as sp: ..."""
+    if not ENABLED: return NOOP
+    return Span(name, attrs)
+
+def set_enabled(enabled):
+    global ENABLED
+    ENABLED = bool(enabled)
+
+class Tracer:
+    def __init__(self, history=HISTORY, recent=RECENT):
+        self.history = history
+        self._lock = threading.Lock()
+        self._durations = {}    # 階段 -> deque(秒)
+        self._counters = {}     # 階段 -> {count, errors, total, hits, misses}
+        self.recent = deque(maxlen=recent)
+
+    def record(self, span):
+        with self._lock:
+            d = self._durations.get(span.name)
+            if d is None:
+                d = self._durations[span.name] = deque(maxlen=self.history)
+                self._counters[span.name] = {"count": 0, "errors": 0, "total": 0.0, "hits": 0, "misses": 0}
+            d.append(span.duration)
+            c = self._counters[span.name]
+            c["count"] += 1
+            c["total"] += span.duration
+            if span.error: c["errors"] += 1
+            cache = span.attrs.get("cache")
+            if cache == "hit": c["hits"] += 1
+            elif cache == "miss": c["misses"] += 1
+            self.recent.append((span.name, span.parent, span.started_at, span.duration, span.error, dict(span.attrs)))
+
+    def snapshot(self):
+        """{階段: {count, errors, error_rate, hit_rate, mean_ms, p50_ms, p95_ms, p99_ms}}，依累計耗時排序"""
+        with self._lock:
+            data = {name: (np.array(d), dict(self._counters[name])) for name, d in self._durations.items()}
+        out = {}
+        for name, (lat, c) in sorted(data.items(), key=lambda kv: -kv[1][1]["total"]):
+            p50, p95, p99 = (np.percentile(lat, [50, 95, 99]) * 1000) if len(lat) else (0.0, 0.0, 0.0)
+            lookups = c["hits"] + c["misses"]
+            out[name] = {**c, "error_rate": c["errors"] / c["count"] if c["count"] else 0.0,
+                         "hit_rate": c["hits"] / lookups if lookups else None,
+                         "mean_ms": c["total"] / c["count"] * 1000 if c["count"] else 0.0,
+                         "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+        return out
+
+    def export_jsonl(self):
+        """最近的 span 明細，一行一筆 JSON"""
+        with self._lock:
+            rows = list(self.recent)
+        return "".join(json.dumps({"name": name, "parent": parent, "ts": ts, "ms": round(duration * 1000, 3),
+                                   "error": error, **attrs}, ensure_ascii=False, default=str) + "\n"
+                       for name, parent, ts, duration, error, attrs in rows)
+
+    def prometheus_text(self, prefix="vwap"):
+        """Prometheus text exposition：每階段一組 summary (分位數以秒為單位) 加錯誤與快取計數"""
+        seconds = [f"# TYPE {prefix}_stage_seconds summary"]
+        errors = [f"# TYPE {prefix}_stage_errors_total counter"]
+        cache = [f"# TYPE {prefix}_stage_cache_total counter"]
+        for name, s in self.snapshot().items():
+            label = f'stage="{name}"'
+            for q, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                seconds.append(f'{prefix}_stage_seconds{{{label},quantile="{q}"}} {s[key] / 1000:.6f}')
+            seconds.append(f"{prefix}_stage_seconds_sum{{{label}}} {s['total']:.6f}")
+            seconds.append(f"{prefix}_stage_seconds_count{{{label}}} {s['count']}")
+            errors.append(f"{prefix}_stage_errors_total{{{label}}} {s['errors']}")
+            if s["hit_rate"] is not None:
+                cache.append(f'{prefix}_stage_cache_total{{{label},result="hit"}} {s["hits"]}')
+                cache.append(f'{prefix}_stage_cache_total{{{label},result="miss"}} {s["misses"]}')
+        return "\n".join(seconds + errors + cache) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._counters.clear()
+            self.recent.clear()
+
+_TRACER = Tracer()
+
+def get_tracer():
+    return _TRACER
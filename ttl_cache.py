@@ -0,0 +1,53 @@
+import time
+import threading
+import functools
+
+# --- 快取裝飾器：在 Streamlit 裡用 st.cache_data / st.cache_resource，其他地方 (無頭服務、回測、bench) 用行程內 TTL 快取 ---
+# 讓 analyzer 不必裝 Streamlit 也能 import；在 streamlit run 底下行為與原本完全相同。
+
+MAX_ENTRIES = 4096
+
+def _streamlit():
+    """有裝 Streamlit 且正在 streamlit run 底下才回傳 st，否則 None"""
+    try:
+        import streamlit as st
+        from streamlit import runtime
+    except ImportError:
+        return None
+    return st if runtime.exists() else None
+
+def memoize(ttl=None, max_entries=MAX_ENTRIES):
+    """以參數為 key 的 TTL 快取 (參數需可 hash)；和 st.cache_* 一樣提供 .clear()"""
+    def decorator(fn):
+        entries = {}
+        lock = threading.Lock()
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            with lock:
+                hit = entries.get(key)
+                if hit is not None and (ttl is None or now - hit[0] < ttl): return hit[1]
+            value = fn(*args, **kwargs)
+            with lock:
+                if len(entries) >= max_entries:
+                    for k in [k for k, (t, _) in entries.items() if ttl is None or now - t >= ttl] or list(entries)[:max_entries // 4]:
+                        del entries[k]
+                entries[key] = (now, value)
+            return value
+
+        def clear():
+            with lock: entries.clear()
+
+        wrapper.clear = clear
+        return wrapper
+    return decorator
+
+def cache_data(ttl=None, **kwargs):
+    st = _streamlit()
+    return st.cache_data(ttl=ttl, **kwargs) if st else memoize(ttl)
+
+def cache_resource(ttl=None, **kwargs):
+    st = _streamlit()
+    return st.cache_resource(ttl=ttl, **kwargs) if st else memoize(ttl)
@@ -0,0 +1,190 @@
+import time
+import random
+import threading
+from collections import deque
+
+# --- 上游閘道：每個資料源一個 token bucket + 重試退避 + 斷路器 ---
+# 1. token bucket 控制每秒請求數，超過就排隊等 token 而不是直接打爆上游
+# 2. 429 / 5xx / 連線逾時用帶抖動的指數退避重試
+# 3. 連續失敗達門檻就斷路 (open)，冷卻後放一個試探請求 (half_open)，
+#    斷路期間呼叫端直接拿到 CircuitOpen，改用另一個資料源 (富果 ↔ Yahoo)
+
+class UpstreamError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+class CircuitOpen(UpstreamError):
+    """斷路中，沒有打上游"""
+
+class EmptyResult(UpstreamError):
+    """上游沒拋例外但回了空表 (yfinance 被限流時就是這樣)，當成暫時性失敗"""
+
+def require_rows(fn, *args, **kwargs):
+    """包住回 DataFrame 的呼叫：空表或整表 NaN 改拋 EmptyResult，閘道才會計數、退避重試。
+    只給多檔批次用 (全部空白才是限流)；單檔空白可能是該檔真的沒資料，不能算進斷路器"""
+    df = fn(*args, **kwargs)
+    if df is None or df.empty or df.isna().all().all(): raise EmptyResult("上游回傳空資料")
+    return df
+
+def status_of(error):
+    """盡量從各家例外取出 HTTP 狀態碼；限流類例外視為 429"""
+    status = getattr(error, "status", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    if status is None and "RateLimit" in type(error).__name__: status = 429
+    return status
+
+def is_transient(error):
+    """值得重試、也算進斷路器的失敗：429、5xx、逾時與連線錯誤"""
+    if isinstance(error, CircuitOpen): return False
+    if isinstance(error, EmptyResult): return True
+    status = status_of(error)
+    if status is not None: return status == 429 or status >= 500
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取一個 token，必要時睡到有為止；回傳等待秒數"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_seconds=30):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probe = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed": return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._probe = False
+            if self.state == "half_open" and not self._probe:
+                self._probe = True   # 只放一個試探請求
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state, self.failures, self._probe = "closed", 0, False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open": self.trips += 1
+                self.state, self.opened_at, self._probe = "open", time.monotonic(), False
+
+    def is_open(self):
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self.opened_at < self.reset_seconds
+
+class Provider:
+    def __init__(self, name, rate, burst, max_retries=3, base_delay=0.5, max_delay=8.0,
+                 failure_threshold=5, reset_seconds=30, window=60):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.window = window
+        self._events = deque()   # (時間, 是否成功)，只保留 window 秒內
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "ok": 0, "errors": 0, "retries": 0, "rejected": 0, "throttled_s": 0.0}
+
+    def _record(self, ok):
+        now = time.monotonic()
+        with self._lock:
+            self.counters["ok" if ok else "errors"] += 1
+            self._events.append((now, ok))
+            while self._events and now - self._events[0][0] > self.window: self._events.popleft()
+
+    def backoff(self, attempt):
+        """full jitter：0 ~ min(max_delay, base * 2^attempt)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, fn, *args, **kwargs):
+        if not self.breaker.allow():
+            with self._lock: self.counters["rejected"] += 1
+            raise CircuitOpen(f"{self.name} 斷路中", status=None)
+        for attempt in range(self.max_retries + 1):
+            waited = self.bucket.acquire()
+            with self._lock:
+                self.counters["calls"] += 1
+                self.counters["throttled_s"] += waited
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self._record(False)
+                if not is_transient(e):
+                    self.breaker.record_success()   # 上游有回應，只是這個請求本身有問題
+                    raise
+                if attempt < self.max_retries and self.breaker.state != "half_open":
+                    with self._lock: self.counters["retries"] += 1
+                    time.sleep(self.backoff(attempt))
+                    continue
+                self.breaker.record_failure()
+                raise
+            self._record(True)
+            self.breaker.record_success()
+            return result
+
+    def available(self):
+        return not self.breaker.is_open()
+
+    def snapshot_stats(self):
+        now = time.monotonic()
+        with self._lock:
+            recent = [ok for t, ok in self._events if now - t <= self.window]
+            counters = dict(self.counters)
+        errors = recent.count(False)
+        return {**counters, "state": self.breaker.state, "trips": self.breaker.trips,
+                "per_min": len(recent) * 60 / self.window,
+                "error_rate": errors / len(recent) if recent else 0.0}
+
+# 富果免費方案約每分鐘 60 次；Yahoo 沒有公開額度，保守一點
+# token bucket 是行程內的：多個行程一起打同一個上游 (signal_service 的 worker) 時，各自要先 share_budget(n) 分掉額度，
+# 否則實際速率會是這裡的 n 倍。
+LIMITS = {"fugle": (1.0, 5), "yahoo": (2.0, 6)}   # 每秒請求數, burst
+PROVIDERS = {name: Provider(name, rate=rate, burst=burst) for name, (rate, burst) in LIMITS.items()}
+
+def share_budget(n):
+    """這個行程只用 1/n 的額度 (n 個行程共用同一組上游限制時，每個行程各呼叫一次)"""
+    for name, (rate, burst) in LIMITS.items():
+        PROVIDERS[name].bucket = TokenBucket(rate / n, max(1.0, burst / n))
+
+def get(name):
+    return PROVIDERS[name]
+
+def call(name, fn, *args, **kwargs):
+    return PROVIDERS[name].call(fn, *args, **kwargs)
+
+def snapshot_stats():
+    return {name: p.snapshot_stats() for name, p in PROVIDERS.items()}
@@ -0,0 +1,160 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import analyzer
+import signal_engine
+import tracing
+
+# --- 多檔觀察清單：一個排程器替所有觀看者抓資料 ---
+# 每次 tick 把清單切成小批次、批次之間錯開，K 棒沒變 (且 AI 分數沒變) 的代號不重算訊號。
+# 由 market_poller 在背景執行緒驅動，多個 session 共用同一個排程器，看的人再多，每檔每個週期也只抓一次。
+# 抓資料與週期無關：有人看過的週期都從同一份 1 分 K 的金字塔算出來，切換週期直接讀現成結果。
+# 各 session 的 AI 分數不同，結果以 (代號, 週期, 策略) 為 key：分數只用來選策略，同策略的結果相同，
+# 不同 session 要的策略各算一份，不會互相蓋掉。
+
+WATCH_EXPIRE_SECONDS = 60   # 沒有任何 session 再要求的代號，超過這麼久就移出清單
+UNSCORED = 'unscored'       # 尚未做 AI 分析 (照右側 VWAP 算，畫面上不顯示訊號)
+
+def mode_of(score, params=signal_engine.DEFAULT_PARAMS):
+    """AI 分數 → 結果的策略 key ('vwap' / 'knife' / UNSCORED)"""
+    return UNSCORED if score is None else signal_engine.strategy_mode(score, params)
+
+def mode_score(mode, params=signal_engine.DEFAULT_PARAMS):
+    """策略 key → 一個落在該策略區間的分數，給 build_signals 選策略用"""
+    return params.knife_sentiment + 1 if mode == 'knife' else 50
+
+class WatchlistScheduler:
+    def __init__(self, fugle_api_key=None, timeframe='1T', batch_size=4, stagger_seconds=0.25, workers=4):
+        self.fugle_api_key = fugle_api_key
+        self.timeframe = timeframe      # 沒指定週期時的預設
+        self.batch_size = batch_size
+        self.stagger_seconds = stagger_seconds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="watchlist")
+        self._lock = threading.Lock()
+        self._watched = {}      # symbol -> 最後一次被要求的時間
+        self._timeframes = {timeframe: time.time()}  # 週期 -> 最後一次被要求的時間
+        self._modes = {}        # symbol -> {策略 key: 最後一次被要求的時間}
+        self._versions = {}     # (symbol, timeframe, 策略) -> 上次計算時的 K 棒指紋
+        self._results = {}      # (symbol, timeframe, 策略) -> SignalResult
+        self.rows = {}          # (symbol, timeframe, 策略) -> 精簡表格列
+        self.last_tick = 0.0
+        self.stats = {"ticks": 0, "fetches": 0, "recomputed": 0, "unchanged": 0, "errors": 0, "last_tick_ms": 0.0}
+
+    # --- 清單 ---
+    def watch(self, symbols, sentiments=None, timeframe=None):
+        """登記要看的代號 (如 '2330.TW') 與週期；sentiments 為 {symbol: 分數}。有新代號、新週期或新策略回傳 True"""
+        now = time.time()
+        changed = False
+        with self._lock:
+            tf = timeframe or self.timeframe
+            if tf not in self._timeframes: changed = True
+            self._timeframes[tf] = now
+            for s in symbols:
+                if s not in self._watched: changed = True
+                self._watched[s] = now
+                modes = self._modes.setdefault(s, {})
+                mode = mode_of(sentiments.get(s) if sentiments else None)
+                if mode not in modes: changed = True
+                modes[mode] = now
+        return changed
+
+    def symbols(self):
+        now = time.time()
+        with self._lock:
+            for s in [s for s, t in self._watched.items() if now - t > WATCH_EXPIRE_SECONDS]:
+                del self._watched[s]
+                self._modes.pop(s, None)
+            for tf in [tf for tf, t in self._timeframes.items() if now - t > WATCH_EXPIRE_SECONDS and tf != self.timeframe]:
+                del self._timeframes[tf]
+            for modes in self._modes.values():
+                for m in [m for m, t in modes.items() if now - t > WATCH_EXPIRE_SECONDS and len(modes) > 1]:
+                    del modes[m]
+            for key in [k for k in self._results.keys() | self.rows.keys()
+                        if k[0] not in self._watched or k[1] not in self._timeframes or k[2] not in self._modes.get(k[0], ())]:
+                self._versions.pop(key, None); self._results.pop(key, None); self.rows.pop(key, None)
+            return list(self._watched)
+
+    def modes(self, symbol):
+        with self._lock:
+            return list(self._modes.get(symbol, ()))
+
+    def timeframes(self):
+        with self._lock:
+            return list(self._timeframes)
+
+    # --- 排程 ---
+    def tick(self):
+        t0 = time.perf_counter()
+        symbols = self.symbols()
+        timeframes = self.timeframes()
+        changed = []
+        with tracing.span("watchlist.tick", symbols=len(symbols), timeframes=len(timeframes)) as sp:
+            for i in range(0, len(symbols), self.batch_size):
+                if i: time.sleep(self.stagger_seconds)
+                batch = symbols[i:i + self.batch_size]
+                for symbol, loaded in zip(batch, self._executor.map(self._load, batch)):
+                    if self._apply(symbol, loaded, timeframes): changed.append(symbol)
+            sp.set(changed=len(changed))
+        self.last_tick = time.time()
+        self.stats["ticks"] += 1
+        self.stats["last_tick_ms"] = (time.perf_counter() - t0) * 1000
+        return changed
+
+    def _load(self, symbol):
+        try:
+            return analyzer.load_bars(symbol, self.fugle_api_key)
+        except Exception as e:
+            return None, "None", str(e)
+
+    @staticmethod
+    def _fingerprint(df):
+        """最後兩根 (可能還會被修正) 加上根數，足以判斷這次抓到的 K 棒有沒有變"""
+        tail = df[['Open', 'High', 'Low', 'Close', 'Volume']].to_numpy()[-2:]
+        return len(df), int(df.index[-1].value), tail.tobytes()
+
+    def _apply(self, symbol, loaded, timeframes):
+        df, source, fugle_error = loaded
+        self.stats["fetches"] += 1
+        modes = self.modes(symbol)
+        if df is None:
+            self.stats["errors"] += 1
+            for tf in timeframes:
+                for mode in modes: self.rows[(symbol, tf, mode)] = {"symbol": symbol, "error": fugle_error or "無法取得數據"}
+            return False
+        version = self._fingerprint(df)
+        changed = False
+        for tf in timeframes:
+            for mode in modes:
+                key = (symbol, tf, mode)
+                if self._versions.get(key) == version:
+                    self.stats["unchanged"] += 1
+                    continue
+                result = analyzer.build_signals(symbol, df, source, fugle_error, tf, mode_score(mode))
+                price, vwap = result.signal_price, result.last_vwap
+                self._versions[key] = version
+                self._results[key] = result
+                self.rows[key] = {
+                    "symbol": symbol, "price": price, "pct_change": result.pct_change * 100,
+                    "vwap_dist": (price - vwap) / vwap * 100 if vwap else np.nan,
+                    "strategy": result.strategy_name if mode != UNSCORED else "未分析",
+                    "signal": result.signal, "mode": mode,
+                    "source": result.source, "updated_at": result.updated_at,
+                }
+                self.stats["recomputed"] += 1
+                changed = True
+        return changed
+
+    # --- 讀取 ---
+    def get(self, symbol, timeframe=None, sentiment=None):
+        """以該 AI 分數的策略算出的最近一次 SignalResult，沒有則 None"""
+        return self._results.get((symbol, timeframe or self.timeframe, mode_of(sentiment)))
+
+    def results(self):
+        return dict(self._results)
+
+    def table(self, symbols=None, timeframe=None, sentiments=None):
+        tf = timeframe or self.timeframe
+        order = symbols if symbols is not None else list(dict.fromkeys(k[0] for k in self.rows if k[1] == tf))
+        keys = [(s, tf, mode_of(sentiments.get(s) if sentiments else None)) for s in order]
+        return [self.rows[k] for k in keys if k in self.rows]